@@ -1,21 +1,24 @@
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
+
 # Delayed import inside function
 def get_websocket_application():
-    from chat.routing import websocket_urlpatterns
-    return AuthMiddlewareStack(
-        URLRouter(websocket_urlpatterns)
+    from chat.routing import websocket_urlpatterns as chat_patterns
+    from challenge.routing import websocket_urlpatterns as job_patterns
+    from core.websocket_auth import TokenAuthMiddlewareStack
+    return TokenAuthMiddlewareStack(
+        URLRouter(chat_patterns + job_patterns)
     )
 
+
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AllowedHostsOriginValidator(
         get_websocket_application()
     ),
-})
\ No newline at end of file
+})
@@ -89,6 +89,21 @@ DATABASES = {
     }
 }
 
+# Server processes started with these settings (daphne or uvicorn workers).
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# Holds the audio feature cache and admission counters. The in-memory
+# default is per process, so it is only correct with one server process;
+# with several, CACHE_BACKEND and CACHE_LOCATION must name a shared cache
+# such as memcached (system check core.E001).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 # Channels
 ASGI_APPLICATION = 'app.asgi.application'
 
@@ -103,6 +118,81 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Chat persistence: 'sync' saves each message before broadcasting it,
+# 'write_behind' broadcasts first and bulk-inserts from a per-process
+# buffer every CHAT_WRITE_BATCH_SIZE messages or CHAT_WRITE_FLUSH_INTERVAL
+# seconds. Above CHAT_WRITE_MAX_PENDING buffered messages senders write
+# batches themselves.
+CHAT_PERSISTENCE_MODE = os.getenv('CHAT_PERSISTENCE_MODE', 'sync')
+CHAT_WRITE_BATCH_SIZE = int(os.getenv('CHAT_WRITE_BATCH_SIZE', '200'))
+CHAT_WRITE_FLUSH_INTERVAL = float(os.getenv('CHAT_WRITE_FLUSH_INTERVAL', '0.5'))
+CHAT_WRITE_MAX_PENDING = int(os.getenv('CHAT_WRITE_MAX_PENDING', '10000'))
+
+# Messages per page of room history unless ?page_size= asks otherwise.
+CHAT_MESSAGE_PAGE_SIZE = int(os.getenv('CHAT_MESSAGE_PAGE_SIZE', '50'))
+
+# Newest messages embedded in a room's detail representation.
+CHAT_ROOM_RECENT_MESSAGES = int(os.getenv('CHAT_ROOM_RECENT_MESSAGES', '20'))
+
+# Ring of the last CHAT_HISTORY_SIZE messages per room replayed to sockets
+# on join: 'memory' keeps it per process (single node), 'redis' shares it.
+CHAT_HISTORY_BACKEND = os.getenv('CHAT_HISTORY_BACKEND', 'memory')
+CHAT_HISTORY_SIZE = int(os.getenv('CHAT_HISTORY_SIZE', '50'))
+
+# Audio scoring
+# 'sync' extracts features on the request thread; 'async' queues the work
+# to a process pool and answers 202 with a job id to poll.
+AUDIO_SCORING_MODE = os.getenv('AUDIO_SCORING_MODE', 'sync')
+AUDIO_SCORING_WORKERS = int(os.getenv('AUDIO_SCORING_WORKERS', '2'))
+# Threads recording finished pool work (job rows, attempts, notifications).
+AUDIO_RESULT_WORKERS = int(os.getenv('AUDIO_RESULT_WORKERS', '2'))
+
+# Challenge leaderboards: 'db' ranks from indexed columns, 'redis' mirrors
+# them into sorted sets for O(log n) rank lookups.
+LEADERBOARD_BACKEND = os.getenv('LEADERBOARD_BACKEND', 'db')
+
+# Seconds before a process rebuilds its challenge similarity index from
+# the database to pick up challenges written by other processes.
+CHALLENGE_INDEX_MAX_AGE = int(os.getenv('CHALLENGE_INDEX_MAX_AGE', '300'))
+
+# Sampling rate all audio is downmixed and resampled to before analysis.
+AUDIO_CANONICAL_RATE = int(os.getenv('AUDIO_CANONICAL_RATE', '16000'))
+
+# Number of waveform peaks stored per SoundPack sound for rendering.
+SOUND_PACK_PEAK_COUNT = 200
+
+# Feature vectors cached by audio content hash: a per-process LRU of
+# AUDIO_FEATURE_CACHE_SIZE entries in front of the named Django cache.
+AUDIO_FEATURE_CACHE_SIZE = int(os.getenv('AUDIO_FEATURE_CACHE_SIZE', '1024'))
+AUDIO_FEATURE_CACHE_ALIAS = os.getenv('AUDIO_FEATURE_CACHE_ALIAS', 'default')
+AUDIO_FEATURE_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Directory under MEDIA_ROOT holding the memory-mapped per-frame feature
+# matrices of challenge recordings.
+AUDIO_FRAME_STORE_DIR = os.getenv('AUDIO_FRAME_STORE_DIR', 'features')
+
+# Largest WAV accepted per upload field; WavUploadHandler rejects bigger
+# files while they stream in.
+AUDIO_UPLOAD_MAX_BYTES = int(os.getenv('AUDIO_UPLOAD_MAX_BYTES', str(50 * 1024 * 1024)))
+
+# Most takes accepted by one batch scoring request; they are extracted in
+# parallel on the scoring pool.
+AUDIO_BATCH_MAX_TAKES = int(os.getenv('AUDIO_BATCH_MAX_TAKES', '8'))
+
+# Admission control for audio endpoints, counted in the named Django cache.
+# Each user may hold AUDIO_ADMISSION_MAX_PER_USER slots and all users
+# together AUDIO_ADMISSION_MAX_IN_FLIGHT; requests past either cap get 429
+# with Retry-After: AUDIO_ADMISSION_RETRY_AFTER at once.
+AUDIO_ADMISSION_CACHE_ALIAS = os.getenv('AUDIO_ADMISSION_CACHE_ALIAS', 'default')
+AUDIO_ADMISSION_MAX_IN_FLIGHT = int(os.getenv('AUDIO_ADMISSION_MAX_IN_FLIGHT', str(2 * AUDIO_SCORING_WORKERS)))
+AUDIO_ADMISSION_MAX_PER_USER = int(os.getenv('AUDIO_ADMISSION_MAX_PER_USER', '2'))
+AUDIO_ADMISSION_RETRY_AFTER = int(os.getenv('AUDIO_ADMISSION_RETRY_AFTER', '5'))
+
+# Fraction of audio requests whose pipeline stages are timed into the
+# metrics histograms; AUDIO_METRICS_LOG also logs each sampled request.
+AUDIO_METRICS_SAMPLE_RATE = float(os.getenv('AUDIO_METRICS_SAMPLE_RATE', '1.0'))
+AUDIO_METRICS_LOG = os.getenv('AUDIO_METRICS_LOG') == '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -0,0 +1,33 @@
+"""
+Shared audio analysis engine used by challenges, voice scoring and
+sound packs.
+"""
+from .features import ( # noqa
+    FEATURE_NAMES,
+    FEATURE_SCHEMA_VERSION,
+    extract_features,
+    frame_features,
+    summarize_features,
+)
+from . import metrics # noqa
+from .align import alignment_similarity, banded_dtw # noqa
+from .cache import FeatureCache, content_hash, get_feature_cache # noqa
+from .fingerprint import FingerprintIndex, landmark_hashes # noqa
+from .frames import FrameStore, get_frame_store # noqa
+from .normalize import load_audio, resample # noqa
+from .pitch import pitch_contour, pitch_similarity # noqa
+from .prescreen import ClipRejected, prescreen, trim_silence # noqa
+from .vector import ( # noqa
+    VECTOR_BYTES,
+    VECTOR_SIZE,
+    flatten_features,
+    nest_features,
+    pack_features,
+    unpack_features,
+)
+from .wav import ( # noqa
+    WavFormatError,
+    parse_header,
+    read_wav,
+    read_wav_mono,
+)
@@ -0,0 +1,112 @@
+"""
+Banded dynamic time warping over frame feature sequences.
+
+Two MFCC frame sequences are aligned under a Sakoe-Chiba band that
+follows the straight line between their ends, so a uniformly slower or
+faster take still aligns and only local timing drift uses the band. The
+band has a fixed width in frames, which keeps time and memory linear in
+clip length. Local cost is the cosine distance between frames, computed
+a block of rows at a time. Each row of the accumulated cost is resolved
+with vectorized operations: vertical and diagonal steps come from the
+previous row, and the horizontal recurrence is a running minimum over
+prefix sums. Steps use symmetric weights (diagonal 2, others 1) and the
+start cell weighs 1, so every path from the first frames to the last
+weighs ``n + m - 1`` and the total cost divided by that is the mean
+cosine distance along the best path.
+"""
+import numpy as np
+
+# Frames either side of the diagonal; about one second at 25 ms steps
+BAND_FRAMES = 40
+# Rows whose local costs are computed per step; bounds the temporary
+ROW_BLOCK = 1024
+# MFCCs 2-13 of a (frames, features) matrix; the first coefficient
+# mostly tracks loudness and would make every frame look alike
+MFCC_COLUMNS = slice(5, None)
+
+_EPS = 1e-12
+
+
+def _unit_rows(frames):
+    frames = np.asarray(frames, dtype=np.float64)
+    norms = np.linalg.norm(frames, axis=1, keepdims=True)
+    return frames / np.maximum(norms, _EPS)
+
+
+def _band_costs(rows, cols, columns):
+    """Return (len(rows), len(columns[0])) cosine distances in the band"""
+    valid = (columns >= 0) & (columns < len(cols))
+    gathered = cols[np.clip(columns, 0, len(cols) - 1)]
+    costs = 1.0 - np.einsum("kd,kwd->kw", rows, gathered)
+    np.clip(costs, 0.0, 2.0, out=costs)
+    costs[~valid] = 0.0
+    return costs, valid
+
+
+def banded_dtw(reference, take, band=BAND_FRAMES):
+    """
+    Return the mean cosine distance along the best banded alignment.
+
+    ``reference`` and ``take`` are (frames, dims) arrays. The result is in
+    [0, 2]; 0 means the sequences match frame for frame after warping.
+    """
+    a, b = _unit_rows(reference), _unit_rows(take)
+    if len(a) < len(b):
+        # Rows walk the longer sequence so the band slope is at most 1
+        a, b = b, a
+    n, m = len(a), len(b)
+    if m == 0:
+        raise ValueError("Cannot align an empty sequence.")
+
+    band = max(int(band), 2)
+    offsets = np.arange(-band, band + 1)
+    centers = np.rint(np.arange(n) * ((m - 1) / max(n - 1, 1))).astype(int)
+
+    previous = None
+    for start in range(0, n, ROW_BLOCK):
+        stop = min(start + ROW_BLOCK, n)
+        columns = centers[start:stop, None] + offsets
+        costs, valid = _band_costs(a[start:stop], b, columns)
+
+        for k, i in enumerate(range(start, stop)):
+            cost = costs[k]
+            if previous is None:
+                # Paths start at (0, 0)
+                arrival = np.full(len(offsets), np.inf)
+                arrival[band] = cost[band]
+            elif centers[i] == centers[i - 1]:
+                # Same band position: vertical from j, diagonal from j - 1
+                arrival = previous + cost
+                np.minimum(arrival[1:], previous[:-1] + 2.0 * cost[1:],
+                           out=arrival[1:])
+            else:
+                # Band moved right by one column
+                arrival = previous + 2.0 * cost
+                np.minimum(arrival[:-1], previous[1:] + cost[:-1],
+                           out=arrival[:-1])
+
+            # row[j] = min over l <= j of arrival[l] + cost[l+1..j]
+            prefix = np.cumsum(cost)
+            row = prefix + np.minimum.accumulate(arrival - prefix)
+            row[~valid[k]] = np.inf
+            previous = row
+
+    total = previous[band + (m - 1) - centers[-1]]
+    return float(total / (n + m - 1))
+
+
+def alignment_similarity(reference, take, band=BAND_FRAMES):
+    """
+    Return a [0, 1] similarity of two (frames, features) matrices.
+
+    Only MFCCs 2-13 are aligned, after subtracting each sequence's
+    mean so a different microphone or level does not dominate the cosine.
+    1 means identical spectral shape frame by frame once timing is warped
+    within ``band`` frames.
+    """
+    reference = np.asarray(reference, dtype=np.float64)[:, MFCC_COLUMNS]
+    take = np.asarray(take, dtype=np.float64)[:, MFCC_COLUMNS]
+    reference = reference - reference.mean(axis=0)
+    take = take - take.mean(axis=0)
+    distance = banded_dtw(reference, take, band)
+    return max(0.0, min(1.0, 1.0 - distance))
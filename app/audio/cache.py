@@ -0,0 +1,146 @@
+"""
+Content-addressed cache for extracted feature vectors.
+
+Entries are keyed by the SHA-256 of the audio bytes plus the feature
+schema version, so identical audio is analysed once and a schema bump
+invalidates everything. Lookups go through a bounded in-process LRU first
+and then a shared Django cache (Redis in deployments that configure it).
+
+``kind`` separates what is cached for the same audio: a recording's
+feature vector, or everything a scored take yields.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+from .features import FEATURE_SCHEMA_VERSION
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(source):
+    """Return the hex SHA-256 of a WAV path, upload or file object"""
+    # Uploads through WavUploadHandler were hashed while streaming in
+    precomputed = getattr(source, "content_hash", None)
+    if precomputed is not None:
+        return precomputed
+
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    fileobj = getattr(source, "file", source)
+    getbuffer = getattr(fileobj, "getbuffer", None)
+    if getbuffer is not None:
+        digest.update(getbuffer())
+        return digest.hexdigest()
+
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Two-tier LRU + shared cache of feature vectors by content hash"""
+
+    def __init__(self, max_entries=1024, alias="default", timeout=None):
+        self.max_entries = max_entries
+        self.alias = alias
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ["local_hits", "shared_hits", "misses", "evictions"], 0)
+
+    @staticmethod
+    def key(digest, kind="features"):
+        return f"audio-{kind}:v{FEATURE_SCHEMA_VERSION}:{digest}"
+
+    def _store_local(self, key, features):
+        with self._lock:
+            self._local[key] = features
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get(self, digest, kind="features"):
+        """Return cached features for ``digest`` or None"""
+        key = self.key(digest, kind)
+        with self._lock:
+            features = self._local.get(key)
+            if features is not None:
+                self._local.move_to_end(key)
+                self._counters["local_hits"] += 1
+                return features
+
+        features = caches[self.alias].get(key) if self.alias else None
+        with self._lock:
+            self._counters[
+                "shared_hits" if features is not None else "misses"] += 1
+        if features is not None:
+            self._store_local(key, features)
+        return features
+
+    def set(self, digest, features, kind="features"):
+        """Store features in both tiers"""
+        key = self.key(digest, kind)
+        self._store_local(key, features)
+        if self.alias:
+            caches[self.alias].set(key, features, self.timeout)
+
+    def get_or_compute(self, source, compute, digest=None, kind="features"):
+        """Return features for ``source``, calling ``compute`` on a miss"""
+        if digest is None:
+            with metrics.stage("hash"):
+                digest = content_hash(source)
+        with metrics.stage("cache"):
+            features = self.get(digest, kind)
+        if features is None:
+            features = compute(source)
+            self.set(digest, features, kind)
+        return features
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        """Return hit, miss and eviction counters for tuning"""
+        with self._lock:
+            lookups = sum(self._counters[k] for k in
+                          ("local_hits", "shared_hits", "misses"))
+            hits = self._counters["local_hits"] + self._counters["shared_hits"]
+            return dict(
+                self._counters,
+                size=len(self._local),
+                max_entries=self.max_entries,
+                hit_ratio=hits / lookups if lookups else 0.0,
+            )
+
+
+_feature_cache = None
+_feature_cache_lock = threading.Lock()
+
+
+def get_feature_cache():
+    """Return the process-wide feature cache configured from settings"""
+    global _feature_cache
+    with _feature_cache_lock:
+        if _feature_cache is None:
+            _feature_cache = FeatureCache(
+                max_entries=settings.AUDIO_FEATURE_CACHE_SIZE,
+                alias=settings.AUDIO_FEATURE_CACHE_ALIAS,
+                timeout=settings.AUDIO_FEATURE_CACHE_TIMEOUT,
+            )
+        return _feature_cache
@@ -0,0 +1,175 @@
+"""
+Vectorized short-term feature extraction.
+
+Computes only the features the scoring pipeline keeps from
+``pyAudioAnalysis.ShortTermFeatures.feature_extraction``: ZCR, energy,
+energy entropy (feature 2, which the API has always called "centroid"),
+spectral rolloff (feature 7, stored as "clarity") and MFCCs 1-13. Frames
+are built with stride tricks and analysed a block at a time with a single
+``rfft`` per block, so no Python code runs per frame.
+
+Results match pyAudioAnalysis on the same input samples to within
+``rtol=1e-6, atol=1e-6``; the absolute term covers MFCCs of silent frames,
+where both implementations only differ by FFT rounding.
+"""
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+FEATURE_SCHEMA_VERSION = 4
+
+WINDOW_SECONDS = 0.050
+STEP_SECONDS = 0.025
+NUM_MFCC = 13
+ROLLOFF_RATIO = 0.90
+ENERGY_ENTROPY_BLOCKS = 10
+
+# Frames analysed per rfft call; bounds the temporary spectrum size.
+FRAME_BLOCK_SIZE = 512
+
+FEATURE_NAMES = (
+    "zcr", "energy", "energy_entropy", "spectral_rolloff",
+) + tuple(f"mfcc_{i}" for i in range(1, NUM_MFCC + 1))
+
+_EPS = np.finfo(np.float64).eps
+
+
+@lru_cache(maxsize=16)
+def _mfcc_filter_bank(sampling_rate, num_fft, lowfreq=133.33,
+                      linc=200 / 3, logsc=1.0711703,
+                      num_lin_filt=13, num_log_filt=27):
+    """Return the triangular filterbank used by pyAudioAnalysis."""
+    num_filt_total = num_lin_filt + num_log_filt
+
+    frequencies = np.zeros(num_filt_total + 2)
+    frequencies[:num_lin_filt] = lowfreq + np.arange(num_lin_filt) * linc
+    frequencies[num_lin_filt:] = (
+        frequencies[num_lin_filt - 1] * logsc ** np.arange(1, num_log_filt + 3)
+    )
+    heights = 2. / (frequencies[2:] - frequencies[0:-2])
+
+    fbank = np.zeros((num_filt_total, num_fft))
+    nfreqs = np.arange(num_fft) / (1. * num_fft) * sampling_rate
+    edges = np.floor(frequencies * num_fft / sampling_rate).astype(int) + 1
+
+    for i in range(num_filt_total):
+        low, cent, high = frequencies[i:i + 3]
+        lid = np.arange(edges[i], edges[i + 1])
+        rid = np.arange(edges[i + 1], edges[i + 2])
+        fbank[i][lid] = heights[i] / (cent - low) * (nfreqs[lid] - low)
+        fbank[i][rid] = heights[i] / (high - cent) * (high - nfreqs[rid])
+
+    fbank.setflags(write=False)
+    return fbank
+
+
+@lru_cache(maxsize=4)
+def _dct_matrix(size, num_coeffs):
+    """Return the orthonormal DCT-II basis, shape (size, num_coeffs)."""
+    n = np.arange(size)
+    k = np.arange(num_coeffs)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * size)) * np.sqrt(2 / size)
+    basis[0] *= np.sqrt(0.5)
+    basis = np.ascontiguousarray(basis.T)
+    basis.setflags(write=False)
+    return basis
+
+
+def _frame_view(signal, window, step):
+    """Return a read-only (n_frames, window) view over ``signal``."""
+    n_frames = (len(signal) - window) // step + 1
+    stride = signal.strides[0]
+    return as_strided(signal, shape=(n_frames, window),
+                      strides=(step * stride, stride), writeable=False)
+
+
+def _block_features(frames, sampling_rate, num_fft, fbank, dct):
+    """Compute the retained features for a (n, window) block of frames."""
+    window = frames.shape[1]
+    out = np.empty((len(frames), len(FEATURE_NAMES)))
+
+    signs = np.sign(frames)
+    out[:, 0] = (np.abs(np.diff(signs, axis=1)).sum(axis=1) / 2
+                 / (window - 1.0))
+    energy = np.einsum("ij,ij->i", frames, frames)
+    out[:, 1] = energy / window
+
+    # Entropy of the energy split over ENERGY_ENTROPY_BLOCKS sub-frames;
+    # leftover samples count towards the frame energy only.
+    sub_window = window // ENERGY_ENTROPY_BLOCKS
+    sub_frames = frames[:, :sub_window * ENERGY_ENTROPY_BLOCKS].reshape(
+        len(frames), ENERGY_ENTROPY_BLOCKS, sub_window)
+    shares = (np.einsum("ijk,ijk->ij", sub_frames, sub_frames)
+              / (energy[:, None] + _EPS))
+    out[:, 2] = -(shares * np.log2(shares + _EPS)).sum(axis=1)
+
+    magnitude = np.abs(np.fft.rfft(frames, axis=1)[:, :num_fft])
+    magnitude /= num_fft
+
+    # Spectral rolloff: first bin where cumulative energy passes the ratio.
+    power = magnitude ** 2
+    cumulative = np.cumsum(power, axis=1)
+    threshold = ROLLOFF_RATIO * cumulative[:, -1:]
+    above = (cumulative + _EPS) > threshold
+    first = above.argmax(axis=1)
+    out[:, 3] = np.where(above.any(axis=1), first / float(num_fft), 0.0)
+
+    mel = np.log10(magnitude @ fbank.T + _EPS)
+    out[:, 4:] = mel @ dct
+    return out
+
+
+def frame_features(signal, sampling_rate, window=None, step=None):
+    """
+    Return the per-frame feature matrix, shape (len(FEATURE_NAMES), frames).
+
+    ``signal`` is a mono sample array in the int16 range (any dtype).
+    Raises ValueError when the signal is shorter than one window.
+    """
+    window = int(window or WINDOW_SECONDS * sampling_rate)
+    step = int(step or STEP_SECONDS * sampling_rate)
+    signal = np.asarray(signal)
+    if signal.ndim != 1:
+        raise ValueError("Expected a mono signal.")
+    if window < 2 or len(signal) < window:
+        raise ValueError("Audio is too short for feature extraction.")
+
+    # Same DC removal and peak normalization as pyAudioAnalysis, applied
+    # per block so the whole signal is never copied to float64.
+    offset = float(np.mean(signal, dtype=np.float64)) / 2.0 ** 15
+    peak = max(abs(float(signal.max()) / 2.0 ** 15 - offset),
+               abs(float(signal.min()) / 2.0 ** 15 - offset))
+    scale = 1.0 / (peak + 1e-10)
+
+    num_fft = window // 2
+    fbank = _mfcc_filter_bank(sampling_rate, num_fft)
+    dct = _dct_matrix(fbank.shape[0], NUM_MFCC)
+
+    frames = _frame_view(signal, window, step)
+    blocks = []
+    for start in range(0, len(frames), FRAME_BLOCK_SIZE):
+        block = frames[start:start + FRAME_BLOCK_SIZE].astype(np.float64)
+        block /= 2.0 ** 15
+        block -= offset
+        block *= scale
+        blocks.append(_block_features(block, sampling_rate, num_fft,
+                                      fbank, dct))
+    return np.concatenate(blocks).T
+
+
+def summarize_features(matrix):
+    """Collapse a frame feature matrix into the stored feature vector."""
+    means = matrix.mean(axis=1)
+    return [
+        float(means[0]),  # ZCR
+        float(means[1]),  # Energy
+        float(means[2]),  # Energy entropy, served as "centroid"
+        float(means[3]),  # Clarity
+        means[4:4 + NUM_MFCC].tolist(),  # MFCCs
+    ]
+
+
+def extract_features(signal, sampling_rate):
+    """Return ``[zcr, energy, centroid, clarity, [mfcc x 13]]``."""
+    return summarize_features(frame_features(signal, sampling_rate))
@@ -0,0 +1,233 @@
+"""
+Landmark audio fingerprints and an inverted index to look them up.
+
+A recording's spectrogram is reduced to a constellation of local
+magnitude peaks. Each peak is paired with the next few peaks inside a
+short target zone, and every pair becomes a 22-bit hash of (anchor bin,
+target bin, frame gap) stamped with the anchor's frame. The hashes
+survive gain changes, added noise and playback through a speaker, and
+do not depend on where a take starts.
+
+``FingerprintIndex`` keeps the postings of every catalogued recording in
+three parallel sorted integer arrays (hash, item, frame). A lookup is a
+``searchsorted`` per query hash, after which matching postings vote on
+an (item, time offset) histogram. A replay of a catalogued recording
+produces many votes at a single offset, while unrelated audio only
+produces scattered coincidences.
+"""
+import threading
+
+import numpy as np
+from scipy.fft import rfft
+from scipy.ndimage import maximum_filter
+
+FFT_SIZE = 512
+HOP_SIZE = 256
+# Only bins below this are used, so a bin fits in 8 bits
+MAX_BIN = 256
+# Peak neighbourhood in (bins, frames)
+PEAK_NEIGHBOURHOOD = (15, 9)
+# Peaks quieter than this below the loudest are ignored
+PEAK_FLOOR_DB = 50.0
+# Strongest peaks kept per segment of frames (about half a second)
+SEGMENT_FRAMES = 32
+PEAKS_PER_SEGMENT = 8
+# Targets paired with each anchor, and the target zone in frames
+FAN_OUT = 5
+MAX_FRAME_GAP = 63
+
+# Votes at one offset needed to call a take a replay
+MIN_MATCHES = 8
+# Hashes with more postings than this carry no information
+MAX_POSTINGS = 5000
+
+_FRAME_BITS = 6
+_BIN_BITS = 8
+
+
+def _spectrogram(signal):
+    """Return log magnitudes, shape (MAX_BIN, frames)"""
+    signal = np.asarray(signal, dtype=np.float32)
+    count = 1 + (len(signal) - FFT_SIZE) // HOP_SIZE
+    frames = np.lib.stride_tricks.as_strided(
+        signal, shape=(count, FFT_SIZE),
+        strides=(HOP_SIZE * signal.strides[0], signal.strides[0]),
+        writeable=False)
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    # scipy keeps float32 end to end, halving the work of numpy's rfft
+    spectrum = rfft(frames * window, axis=1)[:, :MAX_BIN]
+    power = spectrum.real * spectrum.real + spectrum.imag * spectrum.imag
+    return 10.0 * np.log10(power.T + np.float32(1e-12))
+
+
+def _peaks(spectrogram):
+    """Return (bins, frames) of the constellation, ordered by frame"""
+    local = maximum_filter(spectrogram, size=PEAK_NEIGHBOURHOOD,
+                           mode="constant", cval=-np.inf)
+    floor = spectrogram.max() - PEAK_FLOOR_DB
+    bins, frames = np.nonzero((spectrogram == local) & (spectrogram > floor))
+
+    # Keep the strongest peaks of each segment; they are the ones that
+    # survive noise, while weak ones change from recording to recording
+    segments = frames // SEGMENT_FRAMES
+    order = np.lexsort((-spectrogram[bins, frames], segments))
+    segments = segments[order]
+    first = np.searchsorted(segments, segments, side="left")
+    keep = order[np.arange(len(order)) - first < PEAKS_PER_SEGMENT]
+
+    order = keep[np.lexsort((bins[keep], frames[keep]))]
+    return bins[order], frames[order]
+
+
+def landmark_hashes(signal, sampling_rate):
+    """
+    Return ``(hashes, frames)`` uint32 landmark arrays for a mono signal.
+
+    ``signal`` should be at the canonical rate so hashes of different
+    recordings are comparable. Short or silent audio gives empty arrays.
+    """
+    empty = np.empty(0, dtype=np.uint32)
+    if len(signal) < FFT_SIZE:
+        return empty, empty
+    spectrogram = _spectrogram(signal)
+    if not np.isfinite(spectrogram).all() or spectrogram.max() <= -100:
+        return empty, empty
+
+    bins, frames = _peaks(spectrogram)
+    hashes, anchors = [], []
+    for k in range(1, FAN_OUT + 1):
+        gap = frames[k:] - frames[:-k]
+        pair = (gap > 0) & (gap <= MAX_FRAME_GAP)
+        hashes.append((bins[:-k][pair].astype(np.uint32)
+                       << (_BIN_BITS + _FRAME_BITS))
+                      | (bins[k:][pair].astype(np.uint32) << _FRAME_BITS)
+                      | gap[pair].astype(np.uint32))
+        anchors.append(frames[:-k][pair].astype(np.uint32))
+    if not hashes:
+        return empty, empty
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+class FingerprintIndex:
+    """Inverted index from landmark hashes to (item, frame) postings"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._hashes = np.empty(0, dtype=np.uint32)
+        self._items = np.empty(0, dtype=np.int32)
+        self._frames = np.empty(0, dtype=np.uint32)
+        self._keys = []
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def _row(self, key):
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._keys)
+            self._keys.append(key)
+        return row
+
+    def build(self, items):
+        """Replace the index with ``(key, hashes, frames)`` triples"""
+        with self._lock:
+            self._keys, self._rows = [], {}
+            hashes, rows, frames = [], [], []
+            for key, item_hashes, item_frames in items:
+                row = self._row(key)
+                hashes.append(np.asarray(item_hashes, dtype=np.uint32))
+                frames.append(np.asarray(item_frames, dtype=np.uint32))
+                rows.append(np.full(len(hashes[-1]), row, dtype=np.int32))
+            if not hashes:
+                hashes = rows = frames = [np.empty(0, dtype=np.uint32)]
+            self._set(np.concatenate(hashes), np.concatenate(rows),
+                      np.concatenate(frames))
+
+    def _set(self, hashes, rows, frames):
+        order = np.argsort(hashes, kind="stable")
+        self._hashes = hashes[order].astype(np.uint32)
+        self._items = rows[order].astype(np.int32)
+        self._frames = frames[order].astype(np.uint32)
+
+    def add(self, key, hashes, frames):
+        """Insert or replace the postings of one recording"""
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        with self._lock:
+            self.remove(key)
+            row = self._row(key)
+            order = np.argsort(hashes, kind="stable")
+            hashes = hashes[order]
+            at = np.searchsorted(self._hashes, hashes)
+            self._hashes = np.insert(self._hashes, at, hashes)
+            self._items = np.insert(self._items, at, np.int32(row))
+            self._frames = np.insert(
+                self._frames, at,
+                np.asarray(frames, dtype=np.uint32)[order])
+
+    def remove(self, key):
+        """Drop the postings of one recording"""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return
+            keep = self._items != row
+            self._hashes = self._hashes[keep]
+            self._items = self._items[keep]
+            self._frames = self._frames[keep]
+            # Rows stay allocated so existing postings keep their numbers
+            self._keys[row] = None
+
+    def match(self, hashes, frames, min_matches=MIN_MATCHES):
+        """
+        Return ``[(key, votes, offset)]`` for recordings the query matches.
+
+        ``votes`` counts distinct hashes agreeing on the best time offset
+        (in frames) of each recording; results are sorted best first.
+        """
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        frames = np.asarray(frames, dtype=np.int64)
+        with self._lock:
+            index_hashes = self._hashes
+            index_items = self._items
+            index_frames = self._frames
+            keys = list(self._keys)
+
+        lo = np.searchsorted(index_hashes, hashes, side="left")
+        hi = np.searchsorted(index_hashes, hashes, side="right")
+        counts = hi - lo
+        counts[counts > MAX_POSTINGS] = 0
+        total = int(counts.sum())
+        if total == 0:
+            return []
+
+        # Expand each query hash into the positions of its postings
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        positions = starts + np.arange(total)
+        items = index_items[positions].astype(np.int64)
+        offsets = index_frames[positions].astype(np.int64) \
+            - np.repeat(frames, counts)
+
+        # One vote per distinct hash in each (item, offset) cell, so a
+        # steady tone repeating one landmark cannot outvote a melody
+        cells = (items << 32) | ((offsets + (1 << 31)) & 0xFFFFFFFF)
+        query = np.repeat(hashes, counts)
+        order = np.lexsort((query, cells))
+        cells, query = cells[order], query[order]
+        distinct = np.ones(total, dtype=bool)
+        distinct[1:] = (cells[1:] != cells[:-1]) | (query[1:] != query[:-1])
+        cells, tallies = np.unique(cells[distinct], return_counts=True)
+        strong = tallies >= min_matches
+        best = {}
+        for cell, tally in zip(cells[strong], tallies[strong]):
+            item = int(cell >> 32)
+            if tally > best.get(item, (0, 0))[0]:
+                best[item] = (int(tally), int(cell & 0xFFFFFFFF) - (1 << 31))
+        matches = [(keys[item], tally, offset)
+                   for item, (tally, offset) in best.items()
+                   if keys[item] is not None]
+        matches.sort(key=lambda match: -match[1])
+        return matches
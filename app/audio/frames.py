@@ -0,0 +1,132 @@
+"""
+On-disk store of per-frame feature matrices.
+
+Challenge rows only keep feature means. The full frame matrix of a
+reference recording, shape (frames, len(FEATURE_NAMES)) in float32, is
+written once as an ``.npy`` file named by the audio's content hash under
+MEDIA_ROOT/AUDIO_FRAME_STORE_DIR, and opened with ``mmap_mode="r"`` at
+scoring time so concurrent scorers share its pages through the OS page
+cache instead of each holding a private copy. Melodic challenges also
+keep their f0 contour there, and every reference its landmark
+fingerprints for replay detection. Files are written under a temporary name
+and renamed into place, so readers never map a partial array, and the
+schema version is part of the path so a bump starts a fresh store.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .features import FEATURE_NAMES, FEATURE_SCHEMA_VERSION
+
+FRAME_DTYPE = np.dtype("<f4")
+# Pitch contours of melodic challenges sit next to their frames
+PITCH_SUFFIX = ".pitch"
+# Landmark fingerprints as (hashes, frames) uint32 columns
+PRINTS_SUFFIX = ".prints"
+
+
+class FrameStore:
+    """Content-addressed ``.npy`` frame matrices, memory-mapped on load"""
+
+    def __init__(self, root, max_open=256):
+        self.root = root
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, digest, suffix=""):
+        return os.path.join(self.root, f"v{FEATURE_SCHEMA_VERSION}",
+                            digest[:2], f"{digest}{suffix}.npy")
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def save(self, digest, matrix):
+        """Store a matrix as returned by ``frame_features``; return its path"""
+        frames = np.ascontiguousarray(np.asarray(matrix).T, dtype=FRAME_DTYPE)
+        if frames.ndim != 2 or frames.shape[1] != len(FEATURE_NAMES):
+            raise ValueError(f"Unexpected frame matrix shape {frames.shape}.")
+        return self._write(self.path(digest), frames)
+
+    def load(self, digest):
+        """Return the read-only mapped matrix for ``digest``, or None"""
+        return self._map(digest, self.path(digest))
+
+    def save_pitch(self, digest, f0):
+        """Store a ``pitch_contour`` f0 array next to the frames"""
+        return self._write(self.path(digest, PITCH_SUFFIX),
+                           np.asarray(f0, dtype=FRAME_DTYPE))
+
+    def load_pitch(self, digest):
+        """Return the read-only mapped f0 contour for ``digest``, or None"""
+        return self._map((digest, PITCH_SUFFIX),
+                         self.path(digest, PITCH_SUFFIX))
+
+    def save_prints(self, digest, hashes, frames):
+        """Store ``fingerprint`` output next to the frames"""
+        prints = np.stack([np.asarray(hashes, dtype="<u4"),
+                           np.asarray(frames, dtype="<u4")], axis=1)
+        return self._write(self.path(digest, PRINTS_SUFFIX), prints)
+
+    def load_prints(self, digest):
+        """Return mapped ``(hashes, frames)`` for ``digest``, or None"""
+        prints = self._map((digest, PRINTS_SUFFIX),
+                           self.path(digest, PRINTS_SUFFIX))
+        if prints is None:
+            return None
+        return prints[:, 0], prints[:, 1]
+
+    def _write(self, path, array):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return path
+
+    def _map(self, key, path):
+        with self._lock:
+            array = self._open.get(key)
+            if array is not None:
+                self._open.move_to_end(key)
+                return array
+
+        try:
+            array = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            self._open[key] = array
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return array
+
+    def clear(self):
+        """Drop the open mappings; the files stay on disk"""
+        with self._lock:
+            self._open.clear()
+
+
+_frame_store = None
+_frame_store_lock = threading.Lock()
+
+
+def get_frame_store():
+    """Return the process-wide frame store under MEDIA_ROOT"""
+    global _frame_store
+    root = os.path.join(settings.MEDIA_ROOT, settings.AUDIO_FRAME_STORE_DIR)
+    with _frame_store_lock:
+        if _frame_store is None or _frame_store.root != root:
+            _frame_store = FrameStore(root)
+        return _frame_store
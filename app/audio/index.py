@@ -0,0 +1,144 @@
+"""
+In-memory nearest-neighbour index over stored feature vectors.
+
+Vectors are flattened to 17 float32 values, standardized per dimension
+(energy and MFCC 0 live on very different scales) and L2-normalized into
+one contiguous matrix, so cosine top-k is a single matrix-vector product
+followed by ``argpartition``.
+"""
+import threading
+
+import numpy as np
+
+from .vector import VECTOR_SIZE, flatten_features
+
+
+class FeatureIndex:
+    """Cosine-similarity index with incremental add/remove"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._raw = np.empty((0, VECTOR_SIZE), dtype=np.float32)
+        self._unit = np.empty((0, VECTOR_SIZE), dtype=np.float32)
+        self._rows = {}
+        self._size = 0
+        self._mean = np.zeros(VECTOR_SIZE, dtype=np.float32)
+        self._scale = np.ones(VECTOR_SIZE, dtype=np.float32)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    def _normalize(self, vectors):
+        unit = (vectors - self._mean) / self._scale
+        norms = np.linalg.norm(unit, axis=-1, keepdims=True)
+        return unit / np.maximum(norms, 1e-12)
+
+    def _reserve(self, size):
+        capacity = len(self._ids)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 64)
+        for name in ("_raw", "_unit"):
+            grown = np.empty((capacity, VECTOR_SIZE), dtype=np.float32)
+            grown[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, grown)
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._ids = ids
+
+    def build(self, items):
+        """Replace the index with ``(id, features)`` pairs"""
+        ids, vectors = [], []
+        for item_id, features in items:
+            try:
+                vectors.append(flatten_features(features))
+            except (ValueError, TypeError, IndexError):
+                continue
+            ids.append(item_id)
+
+        raw = np.asarray(vectors, dtype=np.float32).reshape(-1, VECTOR_SIZE)
+        with self._lock:
+            self._size = 0
+            self._reserve(len(ids))
+            self._size = len(ids)
+            self._ids[:self._size] = ids
+            self._raw[:self._size] = raw
+            if len(raw):
+                self._mean = raw.mean(axis=0)
+                std = raw.std(axis=0)
+                self._scale = np.where(std > 0, std, 1).astype(np.float32)
+            self._unit[:self._size] = self._normalize(raw)
+            self._rows = {item_id: row for row, item_id in enumerate(ids)}
+
+    def add(self, item_id, features):
+        """Insert or replace one vector, keeping the current scaling"""
+        vector = flatten_features(features)
+        with self._lock:
+            row = self._rows.get(item_id)
+            if row is None:
+                self._reserve(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._rows[item_id] = row
+                self._ids[row] = item_id
+            self._raw[row] = vector
+            self._unit[row] = self._normalize(vector)
+
+    def remove(self, item_id):
+        """Drop one vector by moving the last row into its slot"""
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                moved = int(self._ids[last])
+                self._ids[row] = moved
+                self._raw[row] = self._raw[last]
+                self._unit[row] = self._unit[last]
+                self._rows[moved] = row
+            self._size = last
+
+    def search(self, features, k=10, exclude=None, include=None):
+        """Return up to ``k`` ``(id, similarity)`` pairs, best first
+
+        With ``include`` only those ids are candidates.
+        """
+        query = self._normalize(flatten_features(features))
+        with self._lock:
+            scores = self._unit[:self._size] @ query
+            ids = self._ids[:self._size].copy()
+        if exclude is not None and exclude in self._rows:
+            scores[ids == exclude] = -np.inf
+        if include is not None:
+            allowed = np.fromiter(include, dtype=np.int64)
+            scores[~np.isin(ids, allowed)] = -np.inf
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in top
+                if np.isfinite(scores[i])]
+
+    def duplicates(self, threshold=0.995, block_size=1024):
+        """Return ``(id_a, id_b, similarity)`` for near-identical pairs"""
+        with self._lock:
+            unit = self._unit[:self._size].copy()
+            ids = self._ids[:self._size].copy()
+        pairs = []
+        for start in range(0, len(unit), block_size):
+            block = unit[start:start + block_size] @ unit[start:].T
+            rows, cols = np.nonzero(block >= threshold)
+            cols = cols + start
+            rows = rows + start
+            keep = cols > rows
+            for a, b in zip(rows[keep], cols[keep]):
+                pairs.append((int(ids[a]), int(ids[b]),
+                              float(block[a - start, b - start])))
+        pairs.sort(key=lambda pair: -pair[2])
+        return pairs
@@ -0,0 +1,206 @@
+"""
+Per-stage timing of the audio scoring pipeline.
+
+Stages (hash, cache lookup, decode, feature extraction, similarity,
+attempt recording) are wrapped in ``stage()`` and feed process-local
+histograms of latency, audio duration and bytes processed, rendered in
+the Prometheus text format by ``render()``. A ``trace()`` around a whole
+request decides once whether it is sampled (AUDIO_METRICS_SAMPLE_RATE);
+unsampled requests only pay a context variable lookup per stage. With
+AUDIO_METRICS_LOG enabled each sampled request also logs one JSON line.
+
+Stages run inside process-pool workers are recorded in the worker, so in
+async mode the parent only sees the end-to-end ``job`` stage.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+DURATION_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+                    600.0)
+BYTES_BUCKETS = tuple(4 ** i * 1024 for i in range(2, 10))
+
+# None outside a trace; otherwise the trace's stage list, or False when
+# the trace was not sampled
+_current = ContextVar("audio_metrics_trace", default=None)
+
+
+class Histogram:
+    """Cumulative histogram with one series per label value"""
+
+    def __init__(self, name, documentation, label, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = \
+                    [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """Return ``{label value: (bucket counts, sum)}``"""
+        with self._lock:
+            return {label_value: (series[:-1], series[-1])
+                    for label_value, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total) in sorted(self.snapshot().items()):
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+STAGE_SECONDS = Histogram(
+    "audio_stage_seconds", "Latency of audio pipeline stages.",
+    "stage", LATENCY_BUCKETS)
+PIPELINE_SECONDS = Histogram(
+    "audio_pipeline_seconds", "End-to-end latency of sampled requests.",
+    "pipeline", LATENCY_BUCKETS)
+AUDIO_SECONDS = Histogram(
+    "audio_stage_audio_seconds", "Duration of audio processed per stage.",
+    "stage", DURATION_BUCKETS)
+AUDIO_BYTES = Histogram(
+    "audio_stage_bytes", "Bytes of audio processed per stage.",
+    "stage", BYTES_BUCKETS)
+HISTOGRAMS = (STAGE_SECONDS, PIPELINE_SECONDS, AUDIO_SECONDS, AUDIO_BYTES)
+
+
+class Sample:
+    """Measurements of one stage; set ``bytes``/``audio_seconds`` on it"""
+
+    __slots__ = ("stage", "seconds", "bytes", "audio_seconds")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.seconds = 0.0
+        self.bytes = None
+        self.audio_seconds = None
+
+    def as_dict(self):
+        entry = {"stage": self.stage, "ms": round(self.seconds * 1000, 3)}
+        if self.bytes is not None:
+            entry["bytes"] = self.bytes
+        if self.audio_seconds is not None:
+            entry["audio_seconds"] = round(self.audio_seconds, 3)
+        return entry
+
+
+class _Unsampled:
+    """Stand-in yielded by unsampled stages; discards measurements"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_UNSAMPLED = _Unsampled()
+
+
+def _sampled():
+    return random.random() < settings.AUDIO_METRICS_SAMPLE_RATE
+
+
+def observe(sample):
+    """Record a finished stage sample in the histograms"""
+    STAGE_SECONDS.observe(sample.stage, sample.seconds)
+    if sample.audio_seconds is not None:
+        AUDIO_SECONDS.observe(sample.stage, sample.audio_seconds)
+    if sample.bytes is not None:
+        AUDIO_BYTES.observe(sample.stage, sample.bytes)
+
+
+@contextmanager
+def trace(pipeline):
+    """Sample a whole request, logging its stages when configured"""
+    if _current.get() is not None:
+        # Nested pipelines are part of the outer request
+        yield
+        return
+    if not _sampled():
+        token = _current.set(False)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+        return
+
+    stages = []
+    token = _current.set(stages)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _current.reset(token)
+        PIPELINE_SECONDS.observe(pipeline, seconds)
+        if settings.AUDIO_METRICS_LOG:
+            logger.info(json.dumps({
+                "pipeline": pipeline,
+                "ms": round(seconds * 1000, 3),
+                "stages": [sample.as_dict() for sample in stages],
+            }))
+
+
+@contextmanager
+def stage(name):
+    """Time one pipeline stage; yields a sample to annotate"""
+    stages = _current.get()
+    if stages is False or (stages is None and not _sampled()):
+        yield _UNSAMPLED
+        return
+
+    sample = Sample(name)
+    started = time.perf_counter()
+    try:
+        yield sample
+    finally:
+        sample.seconds = time.perf_counter() - started
+        observe(sample)
+        if stages is not None:
+            stages.append(sample)
+
+
+def render():
+    """Return all histograms in the Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        histogram.reset()
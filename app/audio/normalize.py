@@ -0,0 +1,60 @@
+"""
+Canonical form of all audio entering the scoring pipeline.
+
+Challenge sounds, voice takes and SoundPack sounds are downmixed to mono
+in the int16 range and resampled to AUDIO_CANONICAL_RATE with a
+polyphase filter before analysis, so features from different sources are
+comparable and extraction cost depends only on the clip's duration.
+"""
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from scipy.signal import resample_poly
+
+from .wav import read_wav_mono
+
+
+# Largest up or down factor handed to the polyphase filter, whose length
+# and cost grow with it. 44100 Hz to 16000 Hz needs 160/441.
+MAX_RESAMPLE_FACTOR = 1000
+
+
+@lru_cache(maxsize=256)
+def _ratio(from_rate, to_rate):
+    """Return ``(up, down)``, approximated when the exact factors are huge"""
+    ratio = Fraction(to_rate, from_rate)
+    if max(ratio.numerator, ratio.denominator) > MAX_RESAMPLE_FACTOR:
+        # The nearest ratio with small factors; the pitch shift is far
+        # below anything the features resolve
+        inverted = ratio > 1
+        if inverted:
+            ratio = 1 / ratio
+        ratio = ratio.limit_denominator(MAX_RESAMPLE_FACTOR)
+        if not ratio:
+            raise ValueError(
+                f"Cannot resample from {from_rate} Hz to {to_rate} Hz.")
+        if inverted:
+            ratio = 1 / ratio
+    return ratio.numerator, ratio.denominator
+
+
+def resample(signal, from_rate, to_rate):
+    """Return ``signal`` resampled from ``from_rate`` to ``to_rate``"""
+    if from_rate == to_rate or len(signal) == 0:
+        return signal
+    up, down = _ratio(from_rate, to_rate)
+    return resample_poly(np.asarray(signal, dtype=np.float32), up, down)
+
+
+def load_audio(source, rate=None):
+    """
+    Return ``(rate, signal)`` for a WAV path or upload in canonical form.
+
+    Audio already mono 16-bit at the canonical rate is returned as a
+    zero-copy view.
+    """
+    rate = rate or settings.AUDIO_CANONICAL_RATE
+    sampling_rate, signal = read_wav_mono(source)
+    return rate, resample(signal, sampling_rate, rate)
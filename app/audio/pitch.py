@@ -0,0 +1,144 @@
+"""
+Vectorized YIN pitch tracking.
+
+Frames use the same window and step as ``frame_features``, so contour
+points line up with rows of the frame matrix. For a block of frames the
+YIN difference function is built from one ``rfft`` cross-correlation
+plus running sums of squares, then normalized by its cumulative mean.
+The first dip under THRESHOLD picks the period, which is refined by
+parabolic interpolation. Everything is whole-array NumPy work per block,
+with no Python code per frame.
+
+A contour is a float32 array of fundamental frequencies in Hz, 0 where
+the frame is unvoiced; ``voiced`` is the matching boolean mask.
+"""
+import numpy as np
+
+from .features import FRAME_BLOCK_SIZE, STEP_SECONDS, WINDOW_SECONDS
+
+MIN_FREQUENCY = 60.0
+MAX_FREQUENCY = 1000.0
+# Cumulative-mean-normalized difference below which a dip is a period
+THRESHOLD = 0.15
+# Frames more than this far below the loudest frame are unvoiced
+SILENCE_DB = 40.0
+
+# Contour points compared by pitch_similarity, and the error in
+# semitones at which a point stops counting as in tune
+CONTOUR_POINTS = 200
+SEMITONE_TOLERANCE = 2.0
+
+
+def _difference(frames, integration, max_lag):
+    """Return the YIN difference function, shape (frames, max_lag + 1)"""
+    size = frames.shape[1]
+    num_fft = 1 << int(np.ceil(np.log2(size + integration)))
+    spectrum = np.fft.rfft(frames, num_fft, axis=1)
+    head = np.fft.rfft(frames[:, :integration], num_fft, axis=1)
+    correlation = np.fft.irfft(spectrum * np.conj(head), num_fft,
+                               axis=1)[:, :max_lag + 1]
+
+    squares = np.cumsum(frames * frames, axis=1)
+    squares = np.concatenate([np.zeros((len(frames), 1)), squares], axis=1)
+    # Energy of frames[t:t + integration] for every lag t
+    shifted = squares[:, integration:integration + max_lag + 1] \
+        - squares[:, :max_lag + 1]
+    return shifted + squares[:, integration:integration + 1] \
+        - 2.0 * correlation
+
+
+def _block_pitch(frames, sampling_rate, min_lag, max_lag, integration):
+    difference = np.maximum(
+        _difference(frames, integration, max_lag), 0.0)
+    lags = np.arange(1, max_lag + 1)
+    running = np.cumsum(difference[:, 1:], axis=1)
+    normalized = np.ones_like(difference)
+    normalized[:, 1:] = difference[:, 1:] * lags / np.maximum(running, 1e-12)
+
+    # First lag under the threshold where the dip stops falling
+    window = normalized[:, min_lag:max_lag + 1]
+    below = window[:, :-1] < THRESHOLD
+    rising = window[:, 1:] >= window[:, :-1]
+    candidates = below & rising
+    voiced = candidates.any(axis=1)
+    lag = candidates.argmax(axis=1) + min_lag
+
+    # Parabolic interpolation around the chosen lag
+    rows = np.arange(len(frames))
+    inner = np.clip(lag, 1, max_lag - 1)
+    left = normalized[rows, inner - 1]
+    centre = normalized[rows, inner]
+    right = normalized[rows, inner + 1]
+    curvature = left - 2.0 * centre + right
+    curved = np.abs(curvature) > 1e-12
+    shift = np.zeros(len(frames))
+    shift[curved] = 0.5 * (left - right)[curved] / curvature[curved]
+    period = inner + np.clip(shift, -1.0, 1.0)
+    return np.where(voiced, sampling_rate / period, 0.0), voiced
+
+
+def pitch_contour(signal, sampling_rate, min_frequency=MIN_FREQUENCY,
+                  max_frequency=MAX_FREQUENCY):
+    """
+    Return ``(f0, voiced)`` per feature frame of a mono signal.
+
+    ``f0`` is float32 Hz (0 when unvoiced) and ``voiced`` a boolean mask.
+    Raises ValueError when the signal is shorter than one window.
+    """
+    window = int(WINDOW_SECONDS * sampling_rate)
+    step = int(STEP_SECONDS * sampling_rate)
+    min_lag = max(int(sampling_rate / max_frequency), 2)
+    max_lag = int(np.ceil(sampling_rate / min_frequency))
+    if max_lag >= window - 1:
+        raise ValueError("Window too short for the lowest pitch.")
+    integration = window - max_lag
+    signal = np.asarray(signal)
+    if signal.ndim != 1:
+        raise ValueError("Expected a mono signal.")
+    if len(signal) < window:
+        raise ValueError("Audio is too short for pitch tracking.")
+
+    count = (len(signal) - window) // step + 1
+    frames = np.lib.stride_tricks.as_strided(
+        signal, shape=(count, window),
+        strides=(step * signal.strides[0], signal.strides[0]),
+        writeable=False)
+
+    f0 = np.zeros(count, dtype=np.float32)
+    voiced = np.zeros(count, dtype=bool)
+    energy = np.empty(count)
+    for start in range(0, count, FRAME_BLOCK_SIZE):
+        block = frames[start:start + FRAME_BLOCK_SIZE].astype(np.float64)
+        block -= block.mean(axis=1, keepdims=True)
+        stop = start + len(block)
+        energy[start:stop] = np.einsum("ij,ij->i", block, block)
+        f0[start:stop], voiced[start:stop] = _block_pitch(
+            block, sampling_rate, min_lag, max_lag, integration)
+
+    loud = energy >= energy.max() * 10 ** (-SILENCE_DB / 10)
+    voiced &= loud & (energy > 0)
+    f0[~voiced] = 0.0
+    return f0, voiced
+
+
+def pitch_similarity(reference, take):
+    """
+    Return a [0, 1] similarity of two f0 contours, ignoring key.
+
+    Voiced points are converted to semitones around their mean, so a
+    take sung in another key still matches, and both are resampled to
+    CONTOUR_POINTS points. Returns None when either has no voiced frames.
+    """
+    curves = []
+    for f0 in (reference, take):
+        f0 = np.asarray(f0, dtype=np.float64)
+        f0 = f0[f0 > 0]
+        if len(f0) == 0:
+            return None
+        semitones = 12.0 * np.log2(f0)
+        semitones -= semitones.mean()
+        positions = np.linspace(0.0, len(semitones) - 1, CONTOUR_POINTS)
+        curves.append(np.interp(positions, np.arange(len(semitones)),
+                                semitones))
+    error = np.abs(curves[0] - curves[1])
+    return float(np.mean(np.clip(1.0 - error / SEMITONE_TOLERANCE, 0, 1)))
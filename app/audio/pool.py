@@ -0,0 +1,90 @@
+"""
+Shared process pool for CPU-heavy audio work.
+
+Scoring uses it when AUDIO_SCORING_MODE is 'async'; in 'sync' mode
+callers run the same functions inline. SoundPack analysis always runs
+here.
+
+Workers are started from a clean forkserver (or spawned) process rather
+than forked from the server, whose threads, locks and database sockets
+would otherwise be copied mid-use. Each worker sets Django up once.
+
+Done-callbacks of a process pool future run on the pool's manager
+thread, which cannot hand out or collect other work meanwhile. Result
+handling (database writes, scoring against reference frames) therefore
+goes through ``when_done``, which moves it to a small thread pool.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+START_METHOD = ("forkserver"
+                if "forkserver" in multiprocessing.get_all_start_methods()
+                else "spawn")
+
+_executor = None
+_executor_lock = threading.Lock()
+_result_executor = None
+_result_executor_lock = threading.Lock()
+
+
+def _init_worker(settings_module):
+    """Set Django up in a freshly started pool worker"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+def is_async():
+    """Return True when audio work should be queued instead of run inline"""
+    return settings.AUDIO_SCORING_MODE == "async"
+
+
+def get_executor(reset=False):
+    """Return the shared pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if reset and _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.AUDIO_SCORING_WORKERS,
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE",
+                                         "app.settings"),))
+        return _executor
+
+
+def get_result_executor():
+    """Return the thread pool that handles finished pool work"""
+    global _result_executor
+    with _result_executor_lock:
+        if _result_executor is None:
+            _result_executor = ThreadPoolExecutor(
+                max_workers=settings.AUDIO_RESULT_WORKERS,
+                thread_name_prefix="audio-results")
+        return _result_executor
+
+
+def when_done(future, fn, *args):
+    """Call ``fn(future, *args)`` on the result pool once ``future`` is done"""
+    future.add_done_callback(
+        lambda f: get_result_executor().submit(fn, f, *args))
+
+
+def submit(fn, *args):
+    """Submit ``fn(*args)`` to the pool, restarting it if a worker died"""
+    try:
+        return get_executor().submit(fn, *args)
+    except BrokenProcessPool:
+        logger.warning("Audio pool broken, restarting it")
+        return get_executor(reset=True).submit(fn, *args)
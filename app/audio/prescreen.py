@@ -0,0 +1,112 @@
+"""
+Cheap pre-screen run before feature extraction.
+
+Frame RMS energy is computed over fixed non-overlapping frames, a block
+of frames at a time. Frames within TRIM_DB of the loudest frame count
+as voiced, and the signal is trimmed to the span from the first voiced
+frame to the last one, so leading and trailing silence neither costs
+extraction time nor dilutes the feature means.
+
+``prescreen`` is for user takes: takes that are silent, clipped or too
+short once trimmed are rejected before the expensive stage runs.
+Reference recordings and SoundPack sounds are only trimmed, by
+``trim_silence``, since a loud, mastered reference is a valid challenge.
+"""
+import numpy as np
+
+FRAME_SECONDS = 0.020
+# Voiced frames are at most this far below the loudest frame
+TRIM_DB = 40.0
+# Loudest frame quieter than this (dB below full scale) means silence
+SILENCE_DBFS = -60.0
+MIN_VOICED_SECONDS = 0.25
+# Share of samples at full scale above which a take counts as clipped
+MAX_CLIPPED_RATIO = 0.01
+CLIP_LEVEL = 0.999
+
+# Frames squared and summed per step; bounds the float64 temporary
+BLOCK_FRAMES = 4096
+
+
+class ClipRejected(ValueError):
+    """Raised for recordings that are not worth analysing."""
+
+
+def full_scale(signal):
+    """Return the largest representable magnitude of ``signal``
+
+    Integer PCM uses its type's range; float signals are expected in the
+    int16 range that ``load_audio`` produces.
+    """
+    if np.issubdtype(signal.dtype, np.integer):
+        return float(np.iinfo(signal.dtype).max)
+    return 32768.0
+
+
+def frame_rms(signal, frame_size):
+    """Return the RMS of each complete ``frame_size`` frame"""
+    count = len(signal) // frame_size
+    frames = signal[:count * frame_size].reshape(count, frame_size)
+    rms = np.empty(count, dtype=np.float64)
+    for start in range(0, count, BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES].astype(np.float64)
+        rms[start:start + len(block)] = np.sqrt(
+            np.einsum("ij,ij->i", block, block) / frame_size)
+    return rms
+
+
+def _voiced_span(rms):
+    """Return the (first, last) frames of the voiced span, last exclusive"""
+    voiced = np.flatnonzero(rms >= rms.max() * 10 ** (-TRIM_DB / 20))
+    return voiced[0], voiced[-1] + 1
+
+
+def _cut(signal, first, last, frame_size, count):
+    end = len(signal) if last == count else last * frame_size
+    return signal[first * frame_size:end]
+
+
+def trim_silence(signal, sampling_rate):
+    """
+    Return ``signal`` trimmed to its voiced span, as a view.
+
+    Never rejects: signals shorter than a frame, and silent ones, are
+    returned whole.
+    """
+    frame_size = max(int(FRAME_SECONDS * sampling_rate), 1)
+    if len(signal) < frame_size:
+        return signal
+    rms = frame_rms(signal, frame_size)
+    first, last = _voiced_span(rms)
+    return _cut(signal, first, last, frame_size, len(rms))
+
+
+def prescreen(signal, sampling_rate):
+    """
+    Return ``signal`` trimmed to its voiced span, as a view.
+
+    Raises ClipRejected when the recording is silent, clipped or has
+    less than MIN_VOICED_SECONDS of voiced audio.
+    """
+    frame_size = max(int(FRAME_SECONDS * sampling_rate), 1)
+    if len(signal) < frame_size:
+        raise ClipRejected("Recording is too short.")
+
+    scale = full_scale(signal)
+    # abs() would overflow on the most negative integer sample
+    level = CLIP_LEVEL * scale
+    clipped = np.count_nonzero(signal >= level) \
+        + np.count_nonzero(signal <= -level)
+    if clipped > MAX_CLIPPED_RATIO * len(signal):
+        raise ClipRejected("Recording is clipped.")
+
+    rms = frame_rms(signal, frame_size)
+    loudest = rms.max()
+    if loudest <= scale * 10 ** (SILENCE_DBFS / 20):
+        raise ClipRejected("Recording is silent.")
+
+    first, last = _voiced_span(rms)
+    if (last - first) * frame_size < MIN_VOICED_SECONDS * sampling_rate:
+        raise ClipRejected("Recording has too little voiced audio.")
+
+    return _cut(signal, first, last, frame_size, len(rms))
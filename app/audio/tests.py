@@ -0,0 +1,610 @@
+"""Test the audio feature engine"""
+import io
+import os
+import struct
+import tempfile
+import threading
+import wave
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from pyAudioAnalysis import ShortTermFeatures
+
+from audio import (
+    FEATURE_NAMES,
+    FEATURE_SCHEMA_VERSION,
+    ClipRejected,
+    FeatureCache,
+    FingerprintIndex,
+    FrameStore,
+    alignment_similarity,
+    banded_dtw,
+    WavFormatError,
+    content_hash,
+    extract_features,
+    frame_features,
+    landmark_hashes,
+    load_audio,
+    metrics,
+    nest_features,
+    pack_features,
+    pitch_contour,
+    pitch_similarity,
+    prescreen,
+    read_wav,
+    read_wav_mono,
+    trim_silence,
+    unpack_features,
+)
+from audio import pool
+from audio.index import FeatureIndex
+from audio.normalize import MAX_RESAMPLE_FACTOR, _ratio
+from audio.waveform import waveform_peaks
+
+
+def make_signal(sampling_rate, seconds=2.0, freq=440.0, seed=0):
+    """Return an int16 tone with noise and a silent lead-in"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sampling_rate * seconds)) / sampling_rate
+    signal = 8000 * np.sin(2 * np.pi * freq * t)
+    signal += 2000 * rng.standard_normal(len(t))
+    signal[:sampling_rate // 4] = 0
+    return signal.astype(np.int16)
+
+
+def make_wav(samples, sampling_rate=16000, sample_width=2):
+    """Return WAV bytes for an (n, channels) int16 array"""
+    samples = np.asarray(samples, dtype=np.int16).reshape(len(samples), -1)
+    if sample_width == 3:
+        wide = samples.astype("<i4") << 8
+        frames = wide.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    else:
+        frames = samples.astype("<i2").tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(samples.shape[1])
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sampling_rate)
+        wav_file.writeframes(frames)
+    return buffer.getvalue()
+
+
+class FeatureEngineTests(SimpleTestCase):
+    """Test vectorized extraction against pyAudioAnalysis"""
+
+    def test_matches_pyaudioanalysis(self):
+        """Test frame features match ShortTermFeatures within tolerance"""
+        for sampling_rate in (8000, 16000, 44100):
+            signal = make_signal(sampling_rate)
+            reference, _ = ShortTermFeatures.feature_extraction(
+                signal, sampling_rate,
+                int(0.050 * sampling_rate), int(0.025 * sampling_rate))
+            # The rows the pyAudioAnalysis pipeline stored: ZCR, energy,
+            # energy entropy, rolloff and MFCCs 1-13
+            expected = reference[[0, 1, 2, 7] + list(range(8, 21))]
+
+            result = frame_features(signal, sampling_rate)
+
+            self.assertEqual(result.shape, expected.shape)
+            np.testing.assert_allclose(result, expected,
+                                       rtol=1e-6, atol=1e-6)
+
+    def test_extract_features_shape(self):
+        """Test the summarized vector keeps the stored layout"""
+        features = extract_features(make_signal(16000), 16000)
+
+        self.assertEqual(len(features), 5)
+        self.assertEqual(len(features[4]), 13)
+        self.assertEqual(len(FEATURE_NAMES), 17)
+
+    def test_waveform_peaks(self):
+        """Test peaks are bucketed and scaled to the loudest bucket"""
+        signal = np.zeros(1000, dtype=np.int16)
+        signal[100] = -4000
+        signal[900] = 2000
+
+        peaks = waveform_peaks(signal, buckets=10)
+
+        self.assertEqual(len(peaks), 10)
+        self.assertEqual(peaks[1], 1.0)
+        self.assertEqual(peaks[9], 0.5)
+        self.assertEqual(peaks[0], 0.0)
+
+    def test_signal_shorter_than_window(self):
+        """Test signals shorter than one window are rejected"""
+        with self.assertRaises(ValueError):
+            frame_features(np.zeros(100, dtype=np.int16), 16000)
+
+
+class PrescreenTests(SimpleTestCase):
+    """Test silence trimming and rejection of hopeless clips"""
+
+    def test_trims_leading_and_trailing_silence(self):
+        """Test the voiced span is returned as a view of the signal"""
+        tone = make_signal(16000, seconds=1.0)[16000 // 4:]
+        silence = np.zeros(8000, dtype=np.int16)
+        signal = np.concatenate([silence, tone, silence])
+
+        trimmed = prescreen(signal, 16000)
+
+        self.assertTrue(np.shares_memory(trimmed, signal))
+        self.assertLess(abs(len(trimmed) - len(tone)), 5 * 320)
+        self.assertEqual(len(prescreen(tone, 16000)), len(tone))
+
+    def test_rejects_hopeless_clips(self):
+        """Test silent, clipped and too short clips are rejected"""
+        tone = make_signal(16000, seconds=1.0)
+        clipped = np.clip(tone.astype(np.int32) * 8, -32768, 32767)
+
+        for signal in (np.zeros(16000, dtype=np.int16),
+                       clipped.astype(np.int16), tone[-1600:]):
+            with self.assertRaises(ClipRejected):
+                prescreen(signal, 16000)
+
+    def test_trim_silence_never_rejects(self):
+        """Test references are trimmed but kept when loud or silent"""
+        tone = make_signal(16000, seconds=1.0)[16000 // 4:]
+        clipped = np.clip(tone.astype(np.int32) * 8, -32768, 32767)
+        silence = np.zeros(8000, dtype=np.int16)
+        signal = np.concatenate([silence, clipped.astype(np.int16), silence])
+
+        trimmed = trim_silence(signal, 16000)
+
+        self.assertLess(abs(len(trimmed) - len(tone)), 5 * 320)
+        self.assertEqual(len(trim_silence(silence, 16000)), len(silence))
+        self.assertEqual(len(trim_silence(tone[:100], 16000)), 100)
+
+
+class WavIngestionTests(SimpleTestCase):
+    """Test RIFF parsing and zero-copy WAV reads"""
+
+    def test_read_stereo_upload_first_channel(self):
+        """Test reading an in-memory upload returns the first channel"""
+        samples = np.stack([make_signal(16000), make_signal(16000, seed=1)], 1)
+
+        sampling_rate, signal = read_wav(io.BytesIO(make_wav(samples)))
+
+        self.assertEqual(sampling_rate, 16000)
+        np.testing.assert_array_equal(signal, samples[:, 0])
+
+    def test_read_24_bit_as_float32(self):
+        """Test 24-bit PCM is converted to float32 in the int16 range"""
+        samples = make_signal(8000)
+
+        _, signal = read_wav(io.BytesIO(make_wav(samples, 8000, 3)))
+
+        self.assertEqual(signal.dtype, np.float32)
+        np.testing.assert_array_equal(signal, samples)
+
+    def test_read_mono_downmixes_channels(self):
+        """Test all channels are averaged, including 24-bit PCM"""
+        samples = np.stack([make_signal(8000), make_signal(8000, seed=1)], 1)
+        expected = samples.astype(np.float32).mean(axis=1)
+
+        for width in (2, 3):
+            _, signal = read_wav_mono(
+                io.BytesIO(make_wav(samples, 8000, width)))
+            np.testing.assert_allclose(signal, expected, atol=1e-3)
+
+    def test_load_audio_resamples_to_canonical_rate(self):
+        """Test audio is resampled, and canonical input is not copied"""
+        data = make_wav(make_signal(48000, seconds=1.0), 48000)
+        rate, signal = load_audio(io.BytesIO(data), rate=16000)
+
+        self.assertEqual(rate, 16000)
+        self.assertEqual(len(signal), 16000)
+        buffer = io.BytesIO(make_wav(make_signal(16000), 16000))
+        _, signal = load_audio(buffer, rate=16000)
+        self.assertTrue(np.shares_memory(signal, buffer.getbuffer()))
+
+    def test_reject_non_wav(self):
+        """Test non RIFF/WAVE input is rejected"""
+        with self.assertRaises(WavFormatError):
+            read_wav(io.BytesIO(b"ID3" + b"\x00" * 64))
+
+    def test_reject_implausible_sampling_rate(self):
+        """Test headers claiming absurd sampling rates are rejected"""
+        for sampling_rate in (1, 4000, 192000, 0xFFFFFFFF):
+            data = bytearray(make_wav(make_signal(8000, seconds=0.1), 8000))
+            # The canonical header stores the rate at byte 24
+            struct.pack_into("<I", data, 24, sampling_rate)
+            with self.assertRaises(WavFormatError):
+                read_wav(io.BytesIO(bytes(data)))
+
+    def test_resample_factors_bounded(self):
+        """Test awkward rate pairs resample with small polyphase factors"""
+        up, down = _ratio(44101, 16000)
+        self.assertLessEqual(max(up, down), MAX_RESAMPLE_FACTOR)
+        self.assertAlmostEqual(up / down, 16000 / 44101, places=5)
+        up, down = _ratio(8001, 96000)
+        self.assertLessEqual(max(up, down), MAX_RESAMPLE_FACTOR)
+        self.assertEqual(_ratio(44100, 16000), (160, 441))
+
+
+class FeatureCacheTests(SimpleTestCase):
+    """Test the content-hash feature cache"""
+
+    def test_identical_audio_computed_once(self):
+        """Test equal bytes hit the cache regardless of the file object"""
+        data = make_wav(make_signal(8000))
+        feature_cache = FeatureCache(max_entries=4, alias=None)
+        calls = []
+
+        def compute(source):
+            calls.append(source)
+            return [0.0, 0.0, 0.0, 0.0, [0.0] * 13]
+
+        feature_cache.get_or_compute(io.BytesIO(data), compute)
+        feature_cache.get_or_compute(io.BytesIO(data), compute)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(feature_cache.stats()["local_hits"], 1)
+        self.assertEqual(feature_cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        """Test the local tier stays bounded and counts evictions"""
+        feature_cache = FeatureCache(max_entries=2, alias=None)
+        for i in range(3):
+            feature_cache.set(content_hash(io.BytesIO(bytes([i]))), [i])
+
+        stats = feature_cache.stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertIsNone(
+            feature_cache.get(content_hash(io.BytesIO(bytes([0])))))
+
+    def test_shared_tier(self):
+        """Test entries written by another process are found"""
+        digest = content_hash(io.BytesIO(b"shared"))
+        FeatureCache(alias="default").set(digest, [1.0])
+
+        self.assertEqual(FeatureCache(alias="default").get(digest), [1.0])
+
+
+class FrameStoreTests(SimpleTestCase):
+    """Test the memory-mapped frame matrix store"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.store = FrameStore(root.name)
+        self.matrix = frame_features(make_signal(16000), 16000)
+
+    def test_round_trip_is_memory_mapped(self):
+        """Test stored frames load as a read-only float32 memmap"""
+        digest = content_hash(io.BytesIO(b"frames"))
+        path = self.store.save(digest, self.matrix)
+
+        frames = self.store.load(digest)
+
+        self.assertIsInstance(frames, np.memmap)
+        self.assertFalse(frames.flags.writeable)
+        self.assertEqual(frames.dtype, np.float32)
+        self.assertEqual(frames.shape, self.matrix.T.shape)
+        np.testing.assert_allclose(frames, self.matrix.T, rtol=1e-6)
+        self.assertIn(f"v{FEATURE_SCHEMA_VERSION}", path)
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         [os.path.basename(path)])
+
+    def test_missing_digest(self):
+        """Test unknown audio has no stored frames"""
+        self.assertIsNone(self.store.load("0" * 64))
+        self.assertFalse(self.store.exists("0" * 64))
+
+    def test_rejects_wrong_shape(self):
+        """Test only frame_features matrices are stored"""
+        with self.assertRaises(ValueError):
+            self.store.save("0" * 64, np.zeros((3, 10)))
+
+    def test_prints_round_trip(self):
+        """Test fingerprints are stored next to the frames"""
+        hashes, frames = landmark_hashes(make_signal(16000), 16000)
+        self.store.save_prints("0" * 64, hashes, frames)
+
+        stored_hashes, stored_frames = self.store.load_prints("0" * 64)
+
+        np.testing.assert_array_equal(stored_hashes, hashes)
+        np.testing.assert_array_equal(stored_frames, frames)
+        self.assertIsNone(self.store.load_prints("1" * 64))
+
+
+def make_vector(seed):
+    """Return a random stored-layout feature vector"""
+    values = np.random.default_rng(seed).standard_normal(17).tolist()
+    return values[:4] + [values[4:]]
+
+
+class FeatureVectorTests(SimpleTestCase):
+    """Test the packed feature vector storage format"""
+
+    def test_pack_round_trip(self):
+        """Test packed vectors unpack to a read-only float32 view"""
+        features = make_vector(1)
+        blob = pack_features(features)
+        vector = unpack_features(blob)
+
+        self.assertEqual(len(blob), 68)
+        self.assertEqual(vector.dtype, np.float32)
+        self.assertFalse(vector.flags.writeable)
+        np.testing.assert_allclose(nest_features(vector)[4], features[4],
+                                   rtol=1e-6)
+
+    def test_reject_malformed(self):
+        """Test wrong-sized vectors and blobs are rejected"""
+        with self.assertRaises(ValueError):
+            pack_features([0.1, 0.2, 0.3, 0.4, [1.0] * 12])
+        with self.assertRaises(ValueError):
+            unpack_features(b"\x00" * 64)
+
+
+def full_dtw(a, b):
+    """Unbanded DTW with the same step weights, for reference"""
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    costs = np.clip(1 - a @ b.T, 0, 2)
+    total = np.full((len(a) + 1, len(b) + 1), np.inf)
+    total[0, 0] = 0.0
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = costs[i - 1, j - 1]
+            total[i, j] = min(total[i - 1, j - 1] + 2 * cost,
+                              total[i - 1, j] + cost, total[i, j - 1] + cost)
+    # The start cell is entered once, not diagonally
+    return (total[-1, -1] - costs[0, 0]) / (len(a) + len(b) - 1)
+
+
+class AlignmentTests(SimpleTestCase):
+    """Test banded DTW scoring of frame sequences"""
+
+    def test_wide_band_matches_full_dtw(self):
+        """Test a band covering the whole matrix gives the exact DTW"""
+        rng = np.random.default_rng(0)
+        a = rng.standard_normal((40, 13))
+        b = rng.standard_normal((25, 13))
+
+        self.assertAlmostEqual(banded_dtw(a, b, band=40), full_dtw(a, b))
+        self.assertAlmostEqual(banded_dtw(b, a, band=40), full_dtw(a, b))
+
+    def test_distance_is_mean_along_path(self):
+        """Test a constant local cost is returned unchanged"""
+        a = np.tile([1.0, 0.0], (7, 1))
+        b = np.tile([0.0, 1.0], (4, 1))
+
+        self.assertAlmostEqual(banded_dtw(a, b), 1.0)
+        self.assertAlmostEqual(banded_dtw(a, a[:1]), 0.0)
+
+    def test_alignment_tolerates_timing_not_order(self):
+        """Test a delayed take aligns, while reordered audio does not"""
+        rate = 16000
+        first = frame_features(make_signal(rate, freq=300.0), rate).T
+        second = frame_features(make_signal(rate, freq=1200.0), rate).T
+        reference = np.concatenate([first, second])
+        delayed = np.concatenate([first[:10], first, second])
+        reordered = np.concatenate([second, first])
+
+        self.assertAlmostEqual(
+            alignment_similarity(reference, reference), 1.0)
+        self.assertGreater(alignment_similarity(reference, delayed), 0.95)
+        self.assertLess(alignment_similarity(reference, reordered), 0.5)
+
+
+def make_melody(freqs, sampling_rate=16000, seconds=0.5):
+    """Return an int16 sequence of tones with two harmonics"""
+    t = np.arange(int(sampling_rate * seconds)) / sampling_rate
+    return np.concatenate([
+        5000 * (np.sin(2 * np.pi * f * t) + 0.5 * np.sin(4 * np.pi * f * t))
+        for f in freqs]).astype(np.int16)
+
+
+class PitchTests(SimpleTestCase):
+    """Test the vectorized YIN pitch tracker"""
+
+    def test_tracks_tones(self):
+        """Test steady tones are voiced at their fundamental"""
+        for freq in (80.0, 220.0, 440.0, 950.0):
+            f0, voiced = pitch_contour(make_melody([freq]), 16000)
+
+            self.assertEqual(f0.dtype, np.float32)
+            self.assertTrue(voiced.all())
+            np.testing.assert_allclose(np.median(f0), freq, rtol=0.005)
+
+    def test_noise_and_silence_are_unvoiced(self):
+        """Test frames without a period are masked out"""
+        noise = 3000 * np.random.default_rng(0).standard_normal(16000)
+        for signal in (noise.astype(np.int16), np.zeros(16000, np.int16)):
+            f0, voiced = pitch_contour(signal, 16000)
+
+            self.assertFalse(voiced.any())
+            self.assertFalse(f0.any())
+
+    def test_contour_matches_feature_frames(self):
+        """Test one contour point per frame_features frame"""
+        signal = make_signal(16000)
+        f0, _ = pitch_contour(signal, 16000)
+
+        self.assertEqual(len(f0), frame_features(signal, 16000).shape[1])
+
+    def test_similarity_ignores_key_not_melody(self):
+        """Test a transposed melody matches and a reversed one does not"""
+        melody = [220.0, 247.0, 277.0, 330.0]
+        reference, _ = pitch_contour(make_melody(melody), 16000)
+        transposed, _ = pitch_contour(
+            make_melody([f * 1.5 for f in melody]), 16000)
+        reversed_, _ = pitch_contour(make_melody(melody[::-1]), 16000)
+
+        self.assertGreater(pitch_similarity(reference, transposed), 0.9)
+        self.assertLess(pitch_similarity(reference, reversed_), 0.5)
+        self.assertIsNone(pitch_similarity(reference, np.zeros(10)))
+
+
+def make_song(seed, sampling_rate=16000, seconds=10):
+    """Return a float32 random melody of short harmonic notes"""
+    rng = np.random.default_rng(seed)
+    notes, length = [], 0
+    while length < sampling_rate * seconds:
+        size = int(rng.uniform(0.08, 0.4) * sampling_rate)
+        freq = rng.uniform(100, 900)
+        t = np.arange(size) / sampling_rate
+        note = sum(np.sin(2 * np.pi * freq * h * t + rng.uniform(0, 6)) / h
+                   for h in range(1, 6))
+        notes.append(note * np.hanning(size))
+        length += size
+    song = np.concatenate(notes)[:sampling_rate * seconds]
+    return (song / np.abs(song).max() * 20000).astype(np.float32)
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test landmark fingerprints and their inverted index"""
+
+    def setUp(self):
+        self.songs = {f"song-{i}": make_song(i) for i in range(8)}
+        self.index = FingerprintIndex()
+        self.index.build((key,) + landmark_hashes(song, 16000)
+                         for key, song in self.songs.items())
+
+    def test_noisy_excerpt_matches_at_its_offset(self):
+        """Test a quiet, noisy, filtered excerpt finds its recording"""
+        rng = np.random.default_rng(0)
+        excerpt = self.songs["song-3"][32000:112000] * 0.3 \
+            + 1000 * rng.standard_normal(80000)
+        excerpt = np.convolve(excerpt, [0.5, 0.3, 0.2], mode="same")
+
+        matches = self.index.match(*landmark_hashes(excerpt, 16000))
+
+        self.assertEqual(matches[0][0], "song-3")
+        # 2 s into the recording, at 256-sample hops
+        self.assertAlmostEqual(matches[0][2], 125, delta=1)
+        self.assertEqual(len(matches), 1)
+
+    def test_unrelated_audio_does_not_match(self):
+        """Test other songs, noise and silence find nothing"""
+        noise = 3000 * np.random.default_rng(1).standard_normal(80000)
+        for signal in (make_song(100), noise, np.zeros(80000), np.zeros(10)):
+            self.assertEqual(
+                self.index.match(*landmark_hashes(signal, 16000)), [])
+
+    def test_add_and_remove(self):
+        """Test recordings can be added, replaced and removed"""
+        song = make_song(50)
+        prints = landmark_hashes(song, 16000)
+        self.assertEqual(self.index.match(*prints), [])
+
+        self.index.add("new", *prints)
+        self.index.add("new", *prints)
+        self.assertEqual(self.index.match(*prints)[0][:1], ("new",))
+        self.assertEqual(len(self.index), 9)
+
+        self.assertTrue((np.diff(self.index._hashes.astype(np.int64))
+                         >= 0).all())
+
+        self.index.remove("new")
+        self.assertEqual(self.index.match(*prints), [])
+        self.assertNotIn("new", self.index)
+        self.assertEqual(self.index.match(
+            *landmark_hashes(self.songs["song-0"], 16000))[0][0], "song-0")
+
+
+class FeatureIndexTests(SimpleTestCase):
+    """Test the in-memory nearest-neighbour index"""
+
+    def setUp(self):
+        self.index = FeatureIndex()
+        self.index.build((i, make_vector(i)) for i in range(50))
+
+    def test_search_returns_exact_match_first(self):
+        """Test a stored vector is its own nearest neighbour"""
+        results = self.index.search(make_vector(7), k=3)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0], 7)
+        self.assertAlmostEqual(results[0][1], 1.0, places=5)
+
+    def test_add_remove_and_duplicates(self):
+        """Test incremental updates and near-duplicate detection"""
+        self.index.add(100, make_vector(3))
+        self.index.remove(10)
+
+        self.assertNotIn(10, self.index)
+        self.assertEqual(len(self.index), 50)
+        self.assertEqual([pair[:2] for pair in self.index.duplicates()],
+                         [(3, 100)])
+
+
+class MetricsTests(SimpleTestCase):
+    """Test the pipeline stage histograms"""
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_stage_recorded_and_rendered(self):
+        """Test sampled stages land in cumulative histogram buckets"""
+        with metrics.trace("voice"):
+            with metrics.stage("decode") as sample:
+                sample.bytes = 20000
+                sample.audio_seconds = 1.5
+
+        text = metrics.render()
+        self.assertIn('audio_stage_seconds_count{stage="decode"} 1', text)
+        self.assertIn('audio_pipeline_seconds_count{pipeline="voice"} 1',
+                      text)
+        self.assertIn('audio_stage_audio_seconds_bucket'
+                      '{stage="decode",le="1.0"} 0', text)
+        self.assertIn('audio_stage_audio_seconds_bucket'
+                      '{stage="decode",le="2.0"} 1', text)
+        self.assertIn('audio_stage_bytes_sum{stage="decode"} 20000', text)
+
+    @override_settings(AUDIO_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_trace_records_nothing(self):
+        """Test stages inside an unsampled trace are discarded"""
+        with metrics.trace("voice"):
+            with metrics.stage("decode") as sample:
+                sample.bytes = 20000
+
+        self.assertEqual(metrics.STAGE_SECONDS.snapshot(), {})
+        self.assertEqual(metrics.PIPELINE_SECONDS.snapshot(), {})
+
+
+def canonical_rate():
+    """Pool entry point reading a Django setting"""
+    from django.conf import settings
+    return settings.AUDIO_CANONICAL_RATE
+
+
+class PoolTests(SimpleTestCase):
+    """Test the shared scoring process pool"""
+
+    def setUp(self):
+        self.addCleanup(self.shut_down)
+
+    def shut_down(self):
+        for name in ("_executor", "_result_executor"):
+            executor = getattr(pool, name)
+            if executor is not None:
+                executor.shutdown()
+                setattr(pool, name, None)
+
+    def test_workers_are_not_forked(self):
+        """Test workers start clean and set Django up themselves"""
+        executor = pool.get_executor()
+
+        self.assertNotEqual(executor._mp_context.get_start_method(), "fork")
+        self.assertEqual(pool.submit(canonical_rate).result(timeout=60),
+                         16000)
+
+    def test_results_handled_off_the_manager_thread(self):
+        """Test when_done runs its callback on the result threads"""
+        handled = []
+        done = threading.Event()
+
+        def record(future, label):
+            handled.append((label, future.result(),
+                            threading.current_thread().name))
+            done.set()
+
+        pool.when_done(pool.submit(canonical_rate), record, "rate")
+
+        self.assertTrue(done.wait(60))
+        label, rate, thread_name = handled[0]
+        self.assertEqual((label, rate), ("rate", 16000))
+        self.assertTrue(thread_name.startswith("audio-results"))
@@ -0,0 +1,145 @@
+"""
+Streaming validation of WAV uploads.
+
+``WavUploadHandler`` sits in front of Django's upload handlers for the
+WAV fields of a request. It parses the RIFF header as soon as enough
+bytes have arrived, enforces AUDIO_UPLOAD_MAX_BYTES while the body is
+read and hashes the file as it streams, so a non-WAV, unsupported or
+oversized upload is rejected after its first chunk instead of after the
+whole body has been buffered. Accepted files carry their SHA-256 as
+``content_hash`` so the feature cache does not read them again.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    MemoryFileUploadHandler,
+    StopFutureHandlers,
+    TemporaryFileUploadHandler,
+)
+from rest_framework.exceptions import ValidationError
+
+from .wav import WavFormatError, WavHeaderIncomplete, parse_header
+
+# Bytes a RIFF header may span before the data chunk must have started
+HEADER_LIMIT = 256 * 1024
+
+# Allowance for multipart boundaries and non-file form fields
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+def _megabytes(size):
+    return f"{size / (1024 * 1024):g}MB"
+
+
+class WavUploadHandler(FileUploadHandler):
+    """Validate, size-limit and hash the WAV fields of a multipart body"""
+
+    def __init__(self, request=None, fields=(), max_bytes=None,
+                 max_request_bytes=None):
+        super().__init__(request)
+        self.fields = set(fields)
+        self.max_bytes = max_bytes or settings.AUDIO_UPLOAD_MAX_BYTES
+        self.max_request_bytes = max_request_bytes
+        self._memory = MemoryFileUploadHandler(request)
+        self._disk = TemporaryFileUploadHandler(request)
+        self.store = None
+
+    def _reject(self, message):
+        if self.store is not None and getattr(self.store, "file", None):
+            self.store.file.close()
+        raise ValidationError({self.field_name: [message]})
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if self.max_request_bytes and content_length > self.max_request_bytes:
+            raise ValidationError({"detail": (
+                f"Request too large "
+                f"(max {_megabytes(self.max_request_bytes)}).")})
+        self._memory.handle_raw_input(
+            input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.store = None
+        if field_name not in self.fields:
+            return
+
+        if not self.file_name.lower().endswith(".wav"):
+            self._reject("Only .wav files allowed.")
+        self.store = self._memory if self._memory.activated else self._disk
+        try:
+            self.store.new_file(field_name, *args, **kwargs)
+        except StopFutureHandlers:
+            pass
+        self.size = 0
+        self.header = bytearray()
+        self.info = None
+        self.digest = hashlib.sha256()
+        # This handler stores the file; later handlers never see it
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.store is None:
+            return raw_data
+
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self._reject(f"File too large (max {_megabytes(self.max_bytes)}).")
+        if self.info is None:
+            self._parse_header(raw_data, final=False)
+        self.digest.update(raw_data)
+        self.store.receive_data_chunk(raw_data, start)
+        return None
+
+    def _parse_header(self, raw_data, final):
+        self.header += raw_data
+        try:
+            self.info = parse_header(io.BytesIO(self.header))
+        except WavHeaderIncomplete as e:
+            if final or len(self.header) >= HEADER_LIMIT:
+                self._reject(f"Invalid WAV file: {e}")
+            return
+        except WavFormatError as e:
+            self._reject(f"Invalid WAV file: {e}")
+        self.header = None
+
+    def file_complete(self, file_size):
+        if self.store is None:
+            return None
+        if self.info is None:
+            self._parse_header(b"", final=True)
+        uploaded = self.store.file_complete(file_size)
+        uploaded.content_hash = self.digest.hexdigest()
+        return uploaded
+
+
+class WavUploadMixin:
+    """
+    Install WavUploadHandler for the view actions in ``wav_upload_fields``.
+
+    ``wav_upload_fields`` maps an action name to the file fields holding
+    WAVs. With ``wav_upload_limit_request`` the whole body is capped before
+    it is read, for actions whose only files are those WAVs.
+    """
+    wav_upload_fields = {}
+    wav_upload_limit_request = False
+
+    def get_wav_upload_count(self, fields):
+        """Return how many WAVs the current action may carry"""
+        return len(fields)
+
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+        fields = self.wav_upload_fields.get(getattr(self, "action", None))
+        if fields:
+            max_bytes = settings.AUDIO_UPLOAD_MAX_BYTES
+            max_request_bytes = None
+            if self.wav_upload_limit_request:
+                max_request_bytes = max_bytes \
+                    * self.get_wav_upload_count(fields) + FORM_OVERHEAD_BYTES
+            request.upload_handlers.insert(0, WavUploadHandler(
+                request._request, fields, max_bytes, max_request_bytes))
+        return request
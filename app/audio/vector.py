@@ -0,0 +1,46 @@
+"""
+Compact storage format for summarized feature vectors.
+
+``extract_features`` returns the nested ``[4 scalars, [13 MFCC]]`` list
+the API has always exposed. On disk the same values are kept as 17
+little-endian float32 values (68 bytes), which are read back as a
+read-only NumPy view over the database buffer without re-boxing floats.
+"""
+import numpy as np
+
+from .features import NUM_MFCC
+
+VECTOR_SIZE = 4 + NUM_MFCC
+VECTOR_DTYPE = np.dtype("<f4")
+VECTOR_BYTES = VECTOR_SIZE * VECTOR_DTYPE.itemsize
+
+
+def flatten_features(features):
+    """Return a nested or flat feature vector as 17 float32 values"""
+    if isinstance(features, np.ndarray):
+        vector = features.astype(np.float32, copy=False).reshape(-1)
+    else:
+        vector = np.asarray(list(features[:4]) + list(features[4]),
+                            dtype=np.float32)
+    if vector.shape != (VECTOR_SIZE,) or not np.all(np.isfinite(vector)):
+        raise ValueError("Malformed feature vector.")
+    return vector
+
+
+def nest_features(vector):
+    """Return the API shape ``[zcr, energy, centroid, clarity, [mfcc]]``"""
+    values = flatten_features(vector).tolist()
+    return values[:4] + [values[4:]]
+
+
+def pack_features(features):
+    """Serialize a feature vector to its 68-byte storage form"""
+    return flatten_features(features).astype(VECTOR_DTYPE, copy=False) \
+        .tobytes()
+
+
+def unpack_features(buffer):
+    """Return a zero-copy float32 view over a stored feature vector"""
+    if len(buffer) != VECTOR_BYTES:
+        raise ValueError("Malformed feature vector.")
+    return np.frombuffer(buffer, dtype=VECTOR_DTYPE)
@@ -0,0 +1,26 @@
+"""
+Downsampled waveform peaks for client-side rendering.
+"""
+import numpy as np
+
+
+def waveform_peaks(signal, buckets=200):
+    """
+    Return up to ``buckets`` peak amplitudes in [0, 1].
+
+    Each value is the largest absolute sample in an equal slice of the
+    signal, scaled by the loudest slice. Uses ``reduceat`` so the signal
+    is never copied.
+    """
+    signal = np.asarray(signal)
+    if len(signal) == 0:
+        return []
+    buckets = min(buckets, len(signal))
+    edges = np.linspace(0, len(signal), buckets, endpoint=False).astype(int)
+    highs = np.maximum.reduceat(signal, edges).astype(np.float64)
+    lows = np.minimum.reduceat(signal, edges).astype(np.float64)
+    peaks = np.maximum(np.abs(highs), np.abs(lows))
+    loudest = peaks.max()
+    if loudest > 0:
+        peaks /= loudest
+    return np.round(peaks, 3).tolist()
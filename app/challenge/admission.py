@@ -0,0 +1,140 @@
+"""
+Admission control for the CPU-heavy audio endpoints.
+
+Every audio request (challenge creation, voice scoring, batch scoring and
+similarity search) must hold a slot while its audio is processed. Slots
+are counted in a shared cache (AUDIO_ADMISSION_CACHE_ALIAS), so the caps
+hold across processes when that cache is shared; the core.E001 system
+check refuses a per-process cache when WEB_CONCURRENCY is above 1.
+
+A request is refused at once when its user already holds
+AUDIO_ADMISSION_MAX_PER_USER slots or AUDIO_ADMISSION_MAX_IN_FLIGHT slots
+are taken. It never waits for a slot: the throttle runs on the request's
+worker thread, and under ASGI that is the one thread sync views share.
+
+Refusals go through ``AudioAdmissionThrottle``, so they are ordinary DRF
+429 responses carrying Retry-After. A sync request releases its slot when
+its response is finalized; an async one hands it to its ScoringJob, which
+releases it when the pool is done with the audio.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+KEY_PREFIX = "audio-admission"
+# Counters expire so slots leaked by a killed process come back
+COUNTER_TIMEOUT = 60 * 60
+
+
+def _cache():
+    return caches[settings.AUDIO_ADMISSION_CACHE_ALIAS]
+
+
+def _key(name):
+    return f"{KEY_PREFIX}:{name}"
+
+
+def _incr(key):
+    cache = _cache()
+    cache.add(key, 0, COUNTER_TIMEOUT)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 1, COUNTER_TIMEOUT)
+        return 1
+
+
+def _decr(key):
+    cache = _cache()
+    try:
+        if cache.decr(key) < 0:
+            cache.set(key, 0, COUNTER_TIMEOUT)
+    except ValueError:
+        pass
+
+
+def _take(key, limit):
+    """Increment ``key`` if that keeps it within ``limit``"""
+    if _incr(key) <= limit:
+        return True
+    _decr(key)
+    return False
+
+
+class Ticket:
+    """An admission slot; release() may be called any number of times"""
+
+    def __init__(self, user_key):
+        self._keys = (user_key, _key("in-flight"))
+        self._lock = threading.Lock()
+        self._released = False
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        for key in self._keys:
+            _decr(key)
+
+
+def acquire(user_id):
+    """Return a Ticket for ``user_id``, or None when the request is refused"""
+    user_key = _key(f"user:{user_id}")
+    if not _take(user_key, settings.AUDIO_ADMISSION_MAX_PER_USER):
+        return None
+
+    if _take(_key("in-flight"), settings.AUDIO_ADMISSION_MAX_IN_FLIGHT):
+        return Ticket(user_key)
+    _decr(user_key)
+    return None
+
+
+def in_flight():
+    """Return the number of slots currently held"""
+    return _cache().get(_key("in-flight"), 0)
+
+
+class AudioAdmissionThrottle(BaseThrottle):
+    """Admit a request only when it gets an audio processing slot"""
+
+    def allow_request(self, request, view):
+        ticket = acquire(request.user.pk)
+        if ticket is None:
+            return False
+        request.audio_admission = ticket
+        return True
+
+    def wait(self):
+        return settings.AUDIO_ADMISSION_RETRY_AFTER
+
+
+class AudioAdmissionMixin:
+    """
+    Apply AudioAdmissionThrottle to the view actions in ``admission_actions``
+    and release their slot once the response is ready.
+    """
+    admission_actions = ()
+
+    def get_throttles(self):
+        throttles = super().get_throttles()
+        if getattr(self, "action", None) in self.admission_actions:
+            throttles.append(AudioAdmissionThrottle())
+        return throttles
+
+    def queue_job(self, request, submit, *args):
+        """Call a ``jobs.submit_*`` function, handing it the request's slot"""
+        ticket = getattr(request, "audio_admission", None)
+        job = submit(*args, admission=ticket)
+        request.audio_admission = None
+        return job
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        ticket = getattr(request, "audio_admission", None)
+        if ticket is not None:
+            request.audio_admission = None
+            ticket.release()
+        return super().finalize_response(request, response, *args, **kwargs)
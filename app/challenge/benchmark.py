@@ -0,0 +1,220 @@
+"""
+Benchmarks for the challenge scoring pipeline.
+
+A deterministic synthetic corpus (tones, noise and speech-like chirps at
+8-48 kHz, mono and stereo, 1 s to 5 min) is pushed through the stages of
+a voice upload: WAV decode (including downmix and resampling to the
+canonical rate), pre-screen plus feature extraction, and similarity
+scoring, both mean-based and time-aligned (banded DTW over frames), plus
+pitch tracking for melodic challenges and the replay fingerprint lookup.
+Each stage is timed separately (best of ``repeat`` runs) and the peak traced
+memory of one full mean-based pass is recorded. ``compare``
+checks a run against stored baselines so changes to the scoring path can
+be gated on speed, memory and unchanged feature values.
+"""
+import io
+import json
+import os
+import time
+import tracemalloc
+import wave
+import zlib
+from itertools import product
+
+import numpy as np
+
+from audio import (
+    FingerprintIndex, alignment_similarity, extract_features, frame_features,
+    landmark_hashes, load_audio, pack_features, pitch_contour, prescreen,
+    unpack_features,
+)
+
+KINDS = ("tone", "noise", "chirp")
+SAMPLING_RATES = (8000, 16000, 22050, 44100, 48000)
+CHANNELS = (1, 2)
+QUICK_DURATIONS = (1, 5)
+FULL_DURATIONS = (1, 30, 300)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__),
+                             "benchmark_baseline.json")
+STAGES = ("decode", "extract", "similarity", "alignment", "pitch",
+          "fingerprint")
+
+# Stages faster than this are dominated by timer noise
+MIN_SECONDS = 0.005
+
+
+def corpus(full=False):
+    """Return the benchmark cases as ``(name, kind, rate, channels, s)``"""
+    durations = FULL_DURATIONS if full else QUICK_DURATIONS
+    cases = []
+    for kind, rate, channels, seconds in product(
+            KINDS, SAMPLING_RATES, CHANNELS, durations):
+        layout = "stereo" if channels == 2 else "mono"
+        name = f"{kind}-{rate}-{layout}-{seconds}s"
+        cases.append((name, kind, rate, channels, seconds))
+    return cases
+
+
+def synthesize(kind, sampling_rate, seconds, seed):
+    """Return a deterministic float signal in [-1, 1]"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sampling_rate * seconds)) / sampling_rate
+    if kind == "tone":
+        signal = sum(np.sin(2 * np.pi * 220.0 * h * t) / h
+                     for h in (1, 2, 3))
+        signal *= 0.5 + 0.5 * np.sin(2 * np.pi * 0.5 * t) ** 2
+    elif kind == "noise":
+        signal = rng.standard_normal(len(t))
+    elif kind == "chirp":
+        # Gliding voiced pitch with harmonics, gated into syllables
+        pitch = 150.0 + 100.0 * np.sin(2 * np.pi * 0.7 * t)
+        phase = 2 * np.pi * np.cumsum(pitch) / sampling_rate
+        signal = sum(np.sin(h * phase) / h for h in range(1, 6)
+                     if h * 400.0 < sampling_rate / 2)
+        signal *= np.clip(np.sin(2 * np.pi * 4.0 * t), 0, None)
+        signal += 0.05 * rng.standard_normal(len(t))
+    else:
+        raise ValueError(f"Unknown signal kind {kind!r}.")
+    return signal / max(np.abs(signal).max(), 1e-12)
+
+
+def make_case_wav(name, kind, sampling_rate, channels, seconds):
+    """Return 16-bit PCM WAV bytes for one corpus case"""
+    seed = zlib.crc32(name.encode())
+    signal = synthesize(kind, sampling_rate, seconds, seed)
+    samples = np.round(signal * 24000).astype("<i2")
+    if channels == 2:
+        # Second channel lags slightly so the channels differ
+        samples = np.stack([samples, np.roll(samples, 7)], axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sampling_rate)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def _best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def reference_frames(signal, sampling_rate):
+    """Return the (frames, features) matrix the frame store would hold"""
+    matrix = frame_features(prescreen(signal, sampling_rate), sampling_rate)
+    return matrix.T.astype(np.float32)
+
+
+def run_case(data, reference, repeat=3):
+    """Time decode, extraction and scoring of one WAV upload
+
+    ``reference`` is the ``(features, frames, index)`` of the challenge,
+    ``index`` a FingerprintIndex holding its recording.
+    """
+    from .serializers import VoiceUpdateSerializer
+
+    scorer = VoiceUpdateSerializer()
+    reference, frames, index = reference
+    decode, (rate, signal) = _best_time(
+        lambda: load_audio(io.BytesIO(data)), repeat)
+    extract, features = _best_time(
+        lambda: extract_features(prescreen(signal, rate), rate), repeat)
+    similarity, _ = _best_time(
+        lambda: scorer._calculate_similarities(reference, features), repeat)
+    take_frames = reference_frames(signal, rate)
+    alignment, _ = _best_time(
+        lambda: alignment_similarity(frames, take_frames), repeat)
+    pitch, _ = _best_time(
+        lambda: pitch_contour(prescreen(signal, rate), rate), repeat)
+    fingerprint, _ = _best_time(
+        lambda: index.match(*landmark_hashes(signal, rate)), repeat)
+
+    tracemalloc.start()
+    try:
+        rate, signal = load_audio(io.BytesIO(data))
+        scorer._calculate_similarities(
+            reference, extract_features(prescreen(signal, rate), rate))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "samples": len(signal),
+        "decode": decode,
+        "extract": extract,
+        "similarity": similarity,
+        "alignment": alignment,
+        "pitch": pitch,
+        "fingerprint": fingerprint,
+        "peak_mb": peak / 2 ** 20,
+        "features": unpack_features(pack_features(features)).tolist(),
+    }
+
+
+def run(full=False, repeat=3, match=None):
+    """Run the corpus and return ``{case name: result}``"""
+    reference_wav = make_case_wav("reference", "chirp", 16000, 1, 3)
+    rate, signal = load_audio(io.BytesIO(reference_wav))
+    reference = unpack_features(pack_features(
+        extract_features(prescreen(signal, rate), rate)))
+    index = FingerprintIndex()
+    index.add("reference", *landmark_hashes(signal, rate))
+    reference = (reference, reference_frames(signal, rate), index)
+
+    results = {}
+    for name, kind, rate, channels, seconds in corpus(full):
+        if match and match not in name:
+            continue
+        data = make_case_wav(name, kind, rate, channels, seconds)
+        results[name] = run_case(data, reference, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=1.5, memory_tolerance=1.25,
+            rtol=1e-4):
+    """Return regression messages for ``results`` against ``baseline``"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for stage in STAGES:
+            if stage not in expected:
+                continue
+            limit = max(expected[stage] * tolerance,
+                        expected[stage] + MIN_SECONDS)
+            if result[stage] > limit:
+                regressions.append(
+                    f"{name}: {stage} took {result[stage] * 1000:.1f} ms, "
+                    f"baseline {expected[stage] * 1000:.1f} ms")
+        if result["peak_mb"] > expected["peak_mb"] * memory_tolerance:
+            regressions.append(
+                f"{name}: peak memory {result['peak_mb']:.1f} MB, "
+                f"baseline {expected['peak_mb']:.1f} MB")
+        if not np.allclose(result["features"], expected["features"],
+                           rtol=rtol, atol=1e-6):
+            regressions.append(f"{name}: feature values changed")
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Return the stored baseline, or an empty one"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Merge ``results`` into the stored baseline"""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,39 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from .jobs import job_group_name
+
+
+class ScoringJobConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = job_group_name(user.pk)
+
+        # Join the user's job group
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+
+    async def scoring_job(self, event):
+        # Send job outcome to WebSocket
+        await self.send(text_data=json.dumps({
+            'type': 'scoring_job',
+            'job_id': event['job_id'],
+            'kind': event['kind'],
+            'status': event['status'],
+            'result': event['result'],
+            'error': event['error'],
+        }))
@@ -0,0 +1,244 @@
+"""
+Background execution of challenge audio work.
+
+In ``async`` scoring mode feature extraction runs in a bounded process
+pool. Each submission is tracked by a ScoringJob row that clients poll,
+and the outcome is also pushed to the owner's channel-layer group.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import Future
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import close_old_connections
+from django.utils import timezone
+
+from audio import content_hash, get_feature_cache, metrics
+from audio.pool import submit, when_done
+from core.models import Challenge, ScoringJob
+from .serializers import extract_reference_features, extract_take
+
+logger = logging.getLogger(__name__)
+
+
+def job_group_name(user_id):
+    """Channel-layer group that receives a user's job updates"""
+    return f"scoring_jobs_{user_id}"
+
+
+def _extract_upload(data, with_frames=False, with_pitch=False):
+    """Pool entry point for uploads, which arrive as raw bytes"""
+    return extract_take(io.BytesIO(data), with_frames, with_pitch)
+
+
+def _resolved(features):
+    """Return a completed future for features that need no extraction"""
+    future = Future()
+    future.set_result(features)
+    return future
+
+
+def _gather(*futures):
+    """Return a future of all results, failing with the first error
+
+    Completion is chained through callbacks; a pool callback must never
+    wait on another future of the same pool.
+    """
+    gathered = Future()
+    results = [None] * len(futures)
+    pending = [len(futures)]
+    lock = threading.Lock()
+
+    def done(position, future):
+        error = future.exception()
+        with lock:
+            if gathered.done():
+                return
+            if error is not None:
+                gathered.set_exception(error)
+                return
+            results[position] = future.result()
+            pending[0] -= 1
+            if pending[0]:
+                return
+        gathered.set_result(tuple(results))
+
+    for position, future in enumerate(futures):
+        future.add_done_callback(
+            lambda f, position=position: done(position, f))
+    return gathered
+
+
+def _submit_cached(digest, fn, *args, kind="features"):
+    """Resolve from the feature cache, or queue ``fn`` and cache its result"""
+    features = get_feature_cache().get(digest, kind)
+    if features is not None:
+        return _resolved(features)
+    return _submit_and_cache(digest, fn, *args, kind=kind)
+
+
+def _submit_and_cache(digest, fn, *args, kind="features"):
+    """Queue ``fn`` and cache its result under ``digest``"""
+    feature_cache = get_feature_cache()
+
+    def store(f):
+        if f.exception() is None:
+            feature_cache.set(digest, f.result(), kind)
+
+    future = submit(fn, *args)
+    when_done(future, store)
+    return future
+
+
+def _notify(job):
+    """Push the job outcome to the owner's websocket group"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            job_group_name(job.user_id),
+            {
+                "type": "scoring_job",
+                "job_id": str(job.id),
+                "kind": job.kind,
+                "status": job.status,
+                "result": job.result,
+                "error": job.error,
+            }
+        )
+    except Exception:
+        logger.exception("Failed to push scoring job %s", job.id)
+
+
+def _finish(future, job, on_result, admission=None):
+    """Record the outcome of a pool future on its job
+
+    ``admission`` is the request's admission ticket, released here since
+    the request itself returned before the work was done.
+    """
+    if admission is not None:
+        admission.release()
+    close_old_connections()
+    try:
+        try:
+            job.result = on_result(future.result())
+            job.status = ScoringJob.STATUS_DONE
+        except Exception as e:
+            job.status = ScoringJob.STATUS_FAILED
+            job.error = f"Audio processing failed: {str(e)}"
+        job.save()
+        _notify(job)
+        sample = metrics.Sample("job")
+        sample.seconds = (timezone.now() - job.created_at).total_seconds()
+        metrics.observe(sample)
+    except Exception:
+        logger.exception("Failed to complete scoring job %s", job.id)
+    finally:
+        close_old_connections()
+
+
+def submit_challenge(serializer, admission=None):
+    """Queue feature extraction for a validated ChallengeSerializer"""
+    user = serializer.context["request"].user
+    file_path = serializer.resolve_audio_path(
+        serializer.validated_data["sound_url"])
+    digest = content_hash(file_path)
+    known = serializer.known_features(file_path, digest)
+    job = ScoringJob.objects.create(kind=ScoringJob.KIND_CHALLENGE, user=user)
+
+    def on_result(features):
+        challenge = serializer.save(sound_features=features, sound_hash=digest)
+        job.challenge = challenge
+        return {"challenge_id": challenge.id}
+
+    if known is not None:
+        future = _resolved(known)
+    else:
+        # Also writes the frame matrix, so cached features are not enough
+        future = _submit_and_cache(
+            digest, extract_reference_features, file_path, digest)
+    when_done(future, _finish, job, on_result, admission)
+    return job
+
+
+def _submit_take(voice_file, challenge):
+    """Queue extraction and fingerprinting of one uploaded take
+
+    Both come from one pool task that decodes the upload once. The future
+    resolves to ``(features, frames, f0, prints)``, with ``frames`` and
+    ``f0`` None unless the challenge is scored by alignment.
+    """
+    with metrics.stage("hash") as sample:
+        digest = content_hash(voice_file)
+        sample.bytes = voice_file.size
+    voice_file.seek(0)
+    data = voice_file.read()
+
+    if challenge.aligned_scoring:
+        # Take frames are not cached; only the reference's are stored
+        return submit(
+            _extract_upload, data, True,
+            challenge.scoring_mode == Challenge.SCORING_MELODIC)
+    # Cached fingerprints are still matched against the challenge on
+    # every attempt, so a replay is caught each time
+    return _submit_cached(digest, _extract_upload, data, kind="take")
+
+
+def submit_voice(serializer, challenge, user, admission=None):
+    """Queue scoring of a validated VoiceUpdateSerializer upload"""
+    future = _submit_take(serializer.validated_data["voice_file"], challenge)
+    job = ScoringJob.objects.create(
+        kind=ScoringJob.KIND_VOICE, user=user, challenge=challenge)
+
+    def on_result(take):
+        features, frames, f0, prints = take
+        similarities = serializer.score_features(
+            challenge, features, frames, f0)
+        replay = serializer.check_replay(challenge, prints)
+        attempt = serializer.record_attempt(
+            challenge, user, similarities, replay)
+        return {
+            "attempt_id": attempt.id,
+            "score": attempt.score,
+            "replay": attempt.replay,
+            **{k: float(v) for k, v in similarities.items()},
+        }
+
+    when_done(future, _finish, job, on_result, admission)
+    return job
+
+
+def _submit_takes(serializer, challenge):
+    """Queue every take of a BatchVoiceSerializer upload at once"""
+    return _gather(*[
+        _submit_take(voice_file, challenge)
+        for voice_file in serializer.validated_data["voice_files"]
+    ])
+
+
+def score_takes(serializer, challenge, user):
+    """Score a validated BatchVoiceSerializer upload and return it ranked
+
+    Runs on the request thread, with the takes extracted in parallel on
+    the scoring pool.
+    """
+    takes = _submit_takes(serializer, challenge).result()
+    return serializer.ranked_data(
+        serializer.rank_takes(challenge, user, takes))
+
+
+def submit_takes(serializer, challenge, user, admission=None):
+    """Queue scoring of a validated BatchVoiceSerializer upload"""
+    future = _submit_takes(serializer, challenge)
+    job = ScoringJob.objects.create(
+        kind=ScoringJob.KIND_BATCH, user=user, challenge=challenge)
+
+    def on_result(takes):
+        ranked = serializer.rank_takes(challenge, user, takes)
+        return {"results": serializer.ranked_data(ranked)}
+
+    when_done(future, _finish, job, on_result, admission)
+    return job
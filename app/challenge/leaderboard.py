@@ -0,0 +1,167 @@
+"""
+Per-challenge leaderboards.
+
+Every attempt updates the user's best score in LeaderboardEntry, whose
+(challenge, -score) index serves top-N reads directly.
+
+"My rank" must not count every entry ahead of the user, so the database
+backend also keeps an order-statistic histogram: the score range is cut
+into SCORE_BUCKETS buckets, each entry stores its bucket, and
+LeaderboardBucket holds the number of entries per challenge and bucket.
+A rank is the sum of the counts of the buckets above the user's plus a
+count within the user's own bucket. Both are bounded by the bucket
+resolution rather than by how far down the board the user is.
+
+With LEADERBOARD_BACKEND = 'redis' the same ranking is mirrored into one
+sorted set per challenge so "my rank" is a ZREVRANK; a missing set is
+rebuilt from the table on first read.
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from core.models import LeaderboardBucket, LeaderboardEntry
+
+logger = logging.getLogger(__name__)
+
+# Scores are averaged similarities, so they lie in [-1, 1]
+SCORE_MIN = -1.0
+SCORE_MAX = 1.0
+SCORE_BUCKETS = 10000
+
+
+def score_bucket(score):
+    """Return the histogram bucket of a score, clamped to the range"""
+    position = (score - SCORE_MIN) / (SCORE_MAX - SCORE_MIN)
+    return min(max(int(position * SCORE_BUCKETS), 0), SCORE_BUCKETS - 1)
+
+
+class DatabaseLeaderboard:
+    """Ranking served from the indexed LeaderboardEntry table"""
+
+    def record(self, attempt):
+        """Keep the user's best attempt; return True if it improved"""
+        try:
+            with transaction.atomic():
+                return self._record(attempt)
+        except IntegrityError:
+            # A concurrent attempt created the row first; retry
+            return self.record(attempt)
+
+    def _record(self, attempt):
+        bucket = score_bucket(attempt.score)
+        entry = LeaderboardEntry.objects.select_for_update().filter(
+            challenge_id=attempt.challenge_id, user_id=attempt.user_id,
+        ).first()
+        if entry is None:
+            LeaderboardEntry.objects.create(
+                challenge_id=attempt.challenge_id, user_id=attempt.user_id,
+                score=attempt.score, attempt=attempt, bucket=bucket,
+            )
+            self._count(attempt.challenge_id, bucket, 1)
+            return True
+        if entry.score >= attempt.score:
+            return False
+        LeaderboardEntry.objects.filter(pk=entry.pk).update(
+            score=attempt.score, attempt=attempt, bucket=bucket)
+        if entry.bucket != bucket:
+            self._count(attempt.challenge_id, entry.bucket, -1)
+            self._count(attempt.challenge_id, bucket, 1)
+        return True
+
+    @staticmethod
+    def _count(challenge_id, bucket, delta):
+        """Add ``delta`` to the number of entries in a bucket"""
+        updated = LeaderboardBucket.objects.filter(
+            challenge_id=challenge_id, bucket=bucket,
+        ).update(count=F("count") + delta)
+        if not updated:
+            LeaderboardBucket.objects.create(
+                challenge_id=challenge_id, bucket=bucket, count=delta)
+
+    def top(self, challenge_id, limit):
+        """Return [(user_id, score)] for the best ``limit`` users"""
+        return list(
+            LeaderboardEntry.objects
+            .filter(challenge_id=challenge_id)
+            .order_by("-score", "user_id")
+            .values_list("user_id", "score")[:limit]
+        )
+
+    def rank(self, challenge_id, user_id):
+        """Return (1-based rank, score) for a user, or None"""
+        entry = LeaderboardEntry.objects.filter(
+            challenge_id=challenge_id, user_id=user_id).first()
+        if entry is None:
+            return None
+        above = LeaderboardBucket.objects.filter(
+            challenge_id=challenge_id, bucket__gt=entry.bucket,
+        ).aggregate(total=Sum("count"))["total"] or 0
+        level = LeaderboardEntry.objects.filter(
+            challenge_id=challenge_id, bucket=entry.bucket,
+            score__gt=entry.score,
+        ).count()
+        return above + level + 1, entry.score
+
+
+class RedisLeaderboard(DatabaseLeaderboard):
+    """Database ranking mirrored into a Redis sorted set per challenge"""
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    @staticmethod
+    def key(challenge_id):
+        return f"leaderboard:challenge:{challenge_id}"
+
+    def _ensure(self, challenge_id):
+        """Rebuild the sorted set from the table if Redis lost it"""
+        key = self.key(challenge_id)
+        if self.client.exists(key):
+            return key
+        scores = dict(LeaderboardEntry.objects.filter(
+            challenge_id=challenge_id).values_list("user_id", "score"))
+        if scores:
+            self.client.zadd(key, scores, gt=True)
+        return key
+
+    def record(self, attempt):
+        improved = super().record(attempt)
+        if improved:
+            key = self._ensure(attempt.challenge_id)
+            self.client.zadd(key, {attempt.user_id: attempt.score}, gt=True)
+        return improved
+
+    def top(self, challenge_id, limit):
+        key = self._ensure(challenge_id)
+        return [
+            (int(member), score) for member, score in
+            self.client.zrevrange(key, 0, limit - 1, withscores=True)
+        ]
+
+    def rank(self, challenge_id, user_id):
+        key = self._ensure(challenge_id)
+        pipe = self.client.pipeline()
+        pipe.zrevrank(key, user_id)
+        pipe.zscore(key, user_id)
+        position, score = pipe.execute()
+        if position is None:
+            return None
+        return position + 1, score
+
+
+_leaderboard = None
+
+
+def get_leaderboard():
+    """Return the leaderboard backend configured in settings"""
+    global _leaderboard
+    if _leaderboard is None:
+        if settings.LEADERBOARD_BACKEND == "redis":
+            _leaderboard = RedisLeaderboard(settings.REDIS_URL)
+        else:
+            _leaderboard = DatabaseLeaderboard()
+    return _leaderboard
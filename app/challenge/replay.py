@@ -0,0 +1,68 @@
+"""
+Process-wide fingerprint index of challenge and SoundPack recordings.
+
+Voice takes are looked up here to catch a challenge's own recording
+being played back into the microphone. The index holds the landmark
+fingerprints the frame store keeps for every reference recording, keyed
+by content hash. It is built lazily on first use and rebuilt when older
+than CHALLENGE_INDEX_MAX_AGE seconds; recordings scored in between are
+added as they are first looked up.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from audio import FingerprintIndex, get_frame_store
+from core.models import Challenge, SoundPack
+
+_index = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def _catalogue_digests():
+    """Return content hashes of challenge and analysed pack recordings"""
+    digests = set(
+        Challenge.objects.exclude(sound_hash="")
+        .values_list("sound_hash", flat=True).distinct()
+    )
+    for analysis in SoundPack.objects.values_list(
+            "sound_analysis", flat=True).iterator(chunk_size=200):
+        for entry in (analysis or {}).values():
+            if entry.get("digest"):
+                digests.add(entry["digest"])
+    return digests
+
+
+def _stored_prints(digests):
+    store = get_frame_store()
+    for digest in digests:
+        prints = store.load_prints(digest)
+        if prints is not None:
+            yield (digest,) + prints
+
+
+def get_replay_index():
+    """Return the fingerprint index, (re)building it when missing or stale"""
+    global _index, _built_at
+    with _lock:
+        max_age = settings.CHALLENGE_INDEX_MAX_AGE
+        if _index is None or time.monotonic() - _built_at > max_age:
+            index = FingerprintIndex()
+            index.build(_stored_prints(_catalogue_digests()))
+            _index, _built_at = index, time.monotonic()
+        return _index
+
+
+def is_replay(digest, reference_prints, hashes, frames):
+    """
+    Return whether a take's fingerprints match the recording ``digest``.
+
+    ``reference_prints`` are that recording's stored ``(hashes, frames)``,
+    added to the index if it does not hold them yet.
+    """
+    index = get_replay_index()
+    if digest not in index:
+        index.add(digest, *reference_prints)
+    return any(key == digest for key, _, _ in index.match(hashes, frames))
@@ -0,0 +1,59 @@
+"""
+Process-wide similarity index over Challenge.sound_features.
+
+The index is built lazily from the database on first use and kept in
+step with challenge saves and deletes in this process. Only features of
+the current FEATURE_SCHEMA_VERSION are indexed; older ones are not
+comparable with a query's. Other processes
+catch up when their copy is older than CHALLENGE_INDEX_MAX_AGE seconds.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from audio import FEATURE_SCHEMA_VERSION
+from audio.index import FeatureIndex
+from core.models import Challenge
+
+_index = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def get_challenge_index():
+    """Return the challenge index, (re)building it when missing or stale"""
+    global _index, _built_at
+    with _lock:
+        max_age = settings.CHALLENGE_INDEX_MAX_AGE
+        if _index is None or time.monotonic() - _built_at > max_age:
+            index = FeatureIndex()
+            index.build(
+                Challenge.objects
+                .filter(sound_features_version=FEATURE_SCHEMA_VERSION)
+                .values_list("id", "sound_features")
+                .iterator(chunk_size=2000)
+            )
+            _index, _built_at = index, time.monotonic()
+        return _index
+
+
+@receiver(post_save, sender=Challenge)
+def _index_saved_challenge(sender, instance, **kwargs):
+    if _index is None:
+        return
+    if instance.sound_features_version != FEATURE_SCHEMA_VERSION:
+        _index.remove(instance.id)
+        return
+    try:
+        _index.add(instance.id, instance.sound_features)
+    except (ValueError, TypeError, IndexError):
+        _index.remove(instance.id)
+
+
+@receiver(post_delete, sender=Challenge)
+def _drop_deleted_challenge(sender, instance, **kwargs):
+    if _index is not None:
+        _index.remove(instance.id)
@@ -1,58 +1,300 @@
+import logging
 import os
 import numpy as np
 from rest_framework import serializers
-from pyAudioAnalysis import audioBasicIO, ShortTermFeatures
 from sklearn.metrics.pairwise import cosine_similarity
-from core.models import Challenge
+from core.models import Attempt, Challenge, ScoringJob
+from audio import (
+    FEATURE_SCHEMA_VERSION, alignment_similarity, content_hash,
+    flatten_features, frame_features, get_feature_cache, get_frame_store,
+    landmark_hashes, load_audio, metrics, nest_features, pitch_contour,
+    pitch_similarity, prescreen, summarize_features, trim_silence,
+)
+from audio.features import STEP_SECONDS
 from django.conf import settings
+from .leaderboard import get_leaderboard
+from .replay import is_replay
+from sound_pack.analysis import stored_sound_features
+
+logger = logging.getLogger(__name__)
+
+
+def _decode(source):
+    # Memory-mapped or viewed straight from the upload, then downmixed
+    # and resampled to the canonical rate
+    with metrics.stage("decode") as sample:
+        Fs, x = load_audio(source)
+        sample.bytes = _source_size(source)
+        sample.audio_seconds = len(x) / Fs
+    return Fs, x
+
+
+def _voiced(Fs, x):
+    if len(x) == 0:
+        raise ValueError("Invalid or empty audio file.")
+
+    # Drop leading/trailing silence and reject hopeless takes cheaply
+    with metrics.stage("prescreen") as sample:
+        x = prescreen(x, Fs)
+        sample.audio_seconds = len(x) / Fs
+    return Fs, x
+
+
+def decode_reference(source):
+    """Decode a reference recording and return its voiced span as (Fs, x)
+
+    References are trimmed like takes but never rejected.
+    """
+    Fs, x = _decode(source)
+    with metrics.stage("prescreen") as sample:
+        x = trim_silence(x, Fs)
+        sample.audio_seconds = len(x) / Fs
+    return Fs, x
+
+
+def _frames(Fs, x):
+    with metrics.stage("extract") as sample:
+        sample.audio_seconds = len(x) / Fs
+        return frame_features(x, Fs)
+
+
+def extract_file_frames(source):
+    """Decode a reference recording and return its frame feature matrix"""
+    return _frames(*decode_reference(source))
+
+
+def _pitch(Fs, x):
+    with metrics.stage("pitch") as sample:
+        sample.audio_seconds = len(x) / Fs
+        return pitch_contour(x, Fs)[0]
+
+
+def _fingerprint(Fs, x):
+    with metrics.stage("fingerprint") as sample:
+        sample.audio_seconds = len(x) / Fs
+        return landmark_hashes(x, Fs)
+
+
+def extract_file_features(source):
+    """Decode a reference recording and return its feature vector.
+
+    Kept at module level so it can be shipped to the scoring process pool.
+    """
+    return summarize_features(extract_file_frames(source))
+
+
+def extract_take(source, with_frames=False, with_pitch=False):
+    """Return ``(features, frames, f0, prints)`` of an uploaded take
+
+    The take is decoded once for scoring and replay detection. ``frames``
+    are (frames, features) float32, laid out like the frame store, or None
+    unless ``with_frames``; ``f0`` is the pitch contour, or None unless
+    ``with_pitch``. ``prints`` are the landmark ``(hashes, frames)`` of the
+    whole take, before pre-screening trims it.
+    """
+    Fs, x = _decode(source)
+    Fs, voiced = _voiced(Fs, x)
+    matrix = _frames(Fs, voiced)
+    frames = matrix.T.astype(np.float32) if with_frames else None
+    f0 = _pitch(Fs, voiced) if with_pitch else None
+    return summarize_features(matrix), frames, f0, _fingerprint(Fs, x)
+
+
+def extract_reference_features(source, digest):
+    """Like extract_file_features, also storing the frames and landmark
+    fingerprints under ``digest``"""
+    Fs, x = decode_reference(source)
+    matrix = _frames(Fs, x)
+    store = get_frame_store()
+    store.save(digest, matrix)
+    store.save_prints(digest, *_fingerprint(Fs, x))
+    return summarize_features(matrix)
+
+
+def _challenge_source(challenge):
+    """Return the recording path and content hash of a challenge"""
+    file_path = ChallengeSerializer.resolve_audio_path(challenge.sound_url)
+    digest = content_hash(file_path)
+    if digest != challenge.sound_hash:
+        Challenge.objects.filter(pk=challenge.pk).update(sound_hash=digest)
+        challenge.sound_hash = digest
+    return file_path, digest
+
+
+def challenge_features(challenge):
+    """
+    Return the feature vector takes of a challenge are compared with.
+
+    Features stored by an older extractor (legacy rows are version 0) do
+    not match a fresh take's, so they are extracted again from the
+    recording and saved on first use. Without a local recording scoring
+    is refused until recompute_sound_features has run.
+    """
+    if challenge.sound_features_version == FEATURE_SCHEMA_VERSION:
+        return challenge.sound_features
+    try:
+        file_path, digest = _challenge_source(challenge)
+    except (IndexError, serializers.ValidationError):
+        raise serializers.ValidationError(
+            {"sound_features": "Challenge sound features are out of date; "
+                               "recompute them."})
+    features = ChallengeSerializer.known_features(file_path, digest)
+    if features is None:
+        try:
+            features = extract_reference_features(file_path, digest)
+        except Exception as e:
+            raise serializers.ValidationError(
+                {"sound_features": f"Audio processing failed: {str(e)}"})
+    challenge.sound_features = features
+    challenge.sound_features_version = FEATURE_SCHEMA_VERSION
+    challenge.save(update_fields=["sound_features", "sound_features_version"])
+    return features
+
+
+def challenge_frames(challenge):
+    """
+    Return the memory-mapped frame matrix of a challenge recording.
+
+    Challenges created before the frame store existed are extracted and
+    stored on first use. Returns None when the recording is missing or
+    cannot be decoded.
+    """
+    store = get_frame_store()
+    if challenge.sound_hash:
+        frames = store.load(challenge.sound_hash)
+        if frames is not None:
+            return frames
+
+    try:
+        file_path, digest = _challenge_source(challenge)
+        extract_reference_features(file_path, digest)
+    except (IndexError, ValueError, serializers.ValidationError):
+        return None
+    return store.load(digest)
+
+
+def challenge_pitch(challenge):
+    """Return the memory-mapped f0 contour of a challenge recording,
+    tracking and storing it on first use, or None when the recording is
+    missing or cannot be decoded"""
+    store = get_frame_store()
+    if challenge.sound_hash:
+        f0 = store.load_pitch(challenge.sound_hash)
+        if f0 is not None:
+            return f0
+
+    try:
+        file_path, digest = _challenge_source(challenge)
+        f0 = _pitch(*decode_reference(file_path))
+    except (IndexError, ValueError, serializers.ValidationError):
+        return None
+    store.save_pitch(digest, f0)
+    return store.load_pitch(digest)
+
+
+def challenge_prints(challenge):
+    """Return the stored landmark fingerprints of a challenge recording,
+    computing and storing them on first use, or None without a local
+    recording"""
+    store = get_frame_store()
+    if challenge.sound_hash:
+        prints = store.load_prints(challenge.sound_hash)
+        if prints is not None:
+            return prints
+
+    try:
+        file_path, digest = _challenge_source(challenge)
+    except (IndexError, serializers.ValidationError):
+        return None
+    store.save_prints(digest, *_fingerprint(*decode_reference(file_path)))
+    return store.load_prints(digest)
+
+
+def _source_size(source):
+    """Return the byte size of a WAV path, upload or in-memory file"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if getattr(source, "size", None) is not None:
+        return source.size
+    getbuffer = getattr(source, "getbuffer", None)
+    return getbuffer().nbytes if getbuffer is not None else None
+
+
+class SoundFeaturesField(serializers.Field):
+    """Render a packed feature vector in the nested API shape"""
+
+    def to_representation(self, value):
+        return nest_features(value)
 
 
 class ChallengeSerializer(serializers.ModelSerializer):
+    sound_features = SoundFeaturesField(read_only=True)
 
     class Meta:
         model = Challenge
         fields = "__all__"
-        read_only_fields = ["created_by", "created_at", "updated_at", "sound_features", "joined_users"]
+        read_only_fields = ["created_by", "created_at", "updated_at",
+                            "sound_features", "sound_features_version",
+                            "sound_hash", "joined_users"]
 
     def create(self, validated_data):
         """Create Challenge with audio feature extraction"""
         validated_data["created_by"] = self.context["request"].user
-        validated_data["sound_features"] = self._process_audio_file(validated_data["sound_url"])
+        if "sound_features" not in validated_data:
+            # Background jobs pass features computed in the scoring pool
+            with metrics.trace("challenge"):
+                features, digest = self._process_audio_file(
+                    validated_data["sound_url"])
+            validated_data["sound_features"] = features
+            validated_data["sound_hash"] = digest
         return super().create(validated_data)
 
-    def _process_audio_file(self, sound_url):
-        """Extract audio features from file"""
-
+    @staticmethod
+    def resolve_audio_path(sound_url):
+        """Map a media URL to the audio file under MEDIA_ROOT"""
         path = sound_url.split("/media/")[1]
         file_path = os.path.join(settings.MEDIA_ROOT, path)
         if not os.path.exists(file_path):
-            raise serializers.ValidationError({"file_path": "Audio file not found."})
-
-        try:
-            Fs, x = audioBasicIO.read_audio_file(file_path)
+            raise serializers.ValidationError(
+                {"file_path": "Audio file not found."})
+        return file_path
 
-            if x is None or len(x) == 0:
-                raise serializers.ValidationError({"file_path": "Invalid or empty audio file."})
-
-            # Convert to mono
-            if len(x.shape) > 1:
-                x = x[:, 0]
+    @staticmethod
+    def stored_features(file_path):
+        """Return features stored for a SoundPack sound file, or None"""
+        name = os.path.relpath(file_path, settings.MEDIA_ROOT)
+        return stored_sound_features(name)
+
+    @classmethod
+    def known_features(cls, file_path, digest):
+        """Return earlier features of a recording whose frames are stored,
+        or None"""
+        if not get_frame_store().exists(digest):
+            return None
+        # Pack sounds were analysed on upload
+        features = cls.stored_features(file_path)
+        if features is None:
+            with metrics.stage("cache"):
+                features = get_feature_cache().get(digest)
+        return features
 
-            # Extract features
-            features, _ = ShortTermFeatures.feature_extraction(x, Fs, int(0.050 * Fs), int(0.025 * Fs))
+    def _process_audio_file(self, sound_url):
+        """Return the features and content hash of a challenge recording"""
+        file_path = self.resolve_audio_path(sound_url)
+        with metrics.stage("hash"):
+            digest = content_hash(file_path)
 
-            if features is None or features.shape[0] == 0:
-                raise serializers.ValidationError({"file_path": "Feature extraction failed."})
+        features = self.known_features(file_path, digest)
+        if features is not None:
+            return features, digest
 
-            return [
-                float(np.mean(features[0])),  # ZCR
-                float(np.mean(features[1])),  # Energy
-                float(np.mean(features[2])),  # Spectral Centroid
-                float(np.mean(features[7])),  # Clarity
-                np.mean(features[8:21], axis=1).tolist(),  # MFCCs
-            ]
+        try:
+            features = extract_reference_features(file_path, digest)
         except Exception as e:
-            raise serializers.ValidationError({"file_path": f"Audio processing failed: {str(e)}"})
+            raise serializers.ValidationError(
+                {"file_path": f"Audio processing failed: {str(e)}"})
+        get_feature_cache().set(digest, features)
+        return features, digest
 
 
 class VoiceUpdateSerializer(serializers.Serializer):
@@ -60,82 +302,161 @@ class VoiceUpdateSerializer(serializers.Serializer):
 
     def validate_voice_file(self, value):
         """Validate uploaded file"""
-        if value.size > 50 * 1024 * 1024:  # 50MB
-            raise serializers.ValidationError("File too large (max 50MB).")
+        max_bytes = settings.AUDIO_UPLOAD_MAX_BYTES
+        if value.size > max_bytes:
+            raise serializers.ValidationError(
+                f"File too large (max {max_bytes / (1024 * 1024):g}MB).")
 
         if not value.name.lower().endswith('.wav'):
             raise serializers.ValidationError("Only .wav files allowed.")
 
         return value
 
-    def update_challenge_voice(self, challenge_instance):
-        """Process uploaded voice file and compare with challenge"""
+    def update_challenge_voice(self, challenge_instance, user):
+        """Process an uploaded voice file, score it and store the attempt"""
         voice_file = self.validated_data["voice_file"]
-        temp_path = self._save_temp_file(voice_file, challenge_instance.id)
 
-        try:
-            voice_features = self._extract_features(temp_path)
-            similarities = self._calculate_similarities(challenge_instance.sound_features, voice_features)
-            self._print_results(similarities)
-            return challenge_instance
-        finally:
-            self._cleanup_file(temp_path)
-
-    def _save_temp_file(self, voice_file, challenge_id):
-        """Save uploaded file temporarily"""
-        temp_dir = os.path.join(settings.MEDIA_ROOT, "temp")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_path = os.path.join(temp_dir, f"temp_voice_{challenge_id}.wav")
+        with metrics.trace("voice"):
+            voice_features, voice_frames, voice_pitch, voice_prints = \
+                self._extract_take(voice_file, challenge_instance)
+            similarities = self.score_features(
+                challenge_instance, voice_features, voice_frames, voice_pitch)
+            replay = self.check_replay(challenge_instance, voice_prints)
+            return self.record_attempt(
+                challenge_instance, user, similarities, replay)
+
+    def score_features(self, challenge_instance, voice_features,
+                       voice_frames=None, voice_pitch=None):
+        """Compare extracted voice features with the challenge
+
+        With ``voice_frames`` the MFCC score comes from aligning the take's
+        frames with the challenge's instead of comparing their means, and
+        with ``voice_pitch`` the melody is scored as well.
+        """
+        with metrics.stage("similarity"):
+            similarities = self._calculate_similarities(
+                challenge_features(challenge_instance), voice_features)
+        return self._score_sequences(
+            challenge_instance, similarities, voice_frames, voice_pitch)
+
+    def _score_sequences(self, challenge_instance, similarities,
+                         voice_frames, voice_pitch):
+        """Refine mean-based similarities with alignment and melody scores"""
+        reference_frames = None
+        if voice_frames is not None:
+            reference_frames = challenge_frames(challenge_instance)
+        # Without reference frames the mean-based MFCC score stands
+        if reference_frames is not None:
+            with metrics.stage("align") as sample:
+                sample.audio_seconds = len(voice_frames) * STEP_SECONDS
+                similarities["mfcc"] = alignment_similarity(
+                    reference_frames, voice_frames)
+        if voice_pitch is not None:
+            reference_pitch = challenge_pitch(challenge_instance)
+            # A missing or unvoiced reference has no melody to match; an
+            # unvoiced take against a melody scores 0
+            if reference_pitch is not None and reference_pitch.any():
+                with metrics.stage("melody"):
+                    similarities["pitch"] = pitch_similarity(
+                        reference_pitch, voice_pitch) or 0.0
+        self._log_results(similarities)
+        return similarities
 
-        try:
-            with open(temp_path, "wb") as f:
-                for chunk in voice_file.chunks():
-                    f.write(chunk)
-            return temp_path
-        except Exception as e:
-            raise serializers.ValidationError({"voice_file": f"Failed to save file: {str(e)}"})
+    @staticmethod
+    def check_replay(challenge_instance, voice_prints):
+        """Return whether a take is the challenge recording played back"""
+        reference_prints = challenge_prints(challenge_instance)
+        if reference_prints is None:
+            return False
+        with metrics.stage("replay"):
+            return is_replay(challenge_instance.sound_hash,
+                             reference_prints, *voice_prints)
 
-    def _extract_features(self, file_path):
-        """Extract features from audio file"""
+    @staticmethod
+    def record_attempt(challenge_instance, user, similarities, replay=False):
+        """Persist the attempt and update the challenge leaderboard
+
+        Replayed attempts are kept for review but never ranked.
+        """
+        scores = {feature: float(score)
+                  for feature, score in similarities.items()}
+        with metrics.stage("record"):
+            attempt = Attempt.objects.create(
+                challenge=challenge_instance,
+                user=user,
+                score=sum(scores.values()) / len(scores),
+                replay=replay,
+                **scores
+            )
+            if not replay:
+                get_leaderboard().record(attempt)
+        return attempt
+
+    def extract_features(self, voice_file):
+        """Return the feature vector of an uploaded take
+
+        Shares the content-hash cache of scored takes, so a clip that was
+        scored before is not decoded again.
+        """
+        return self._extract_take(voice_file)[0]
+
+    def _extract_take(self, voice_file, challenge_instance=None):
+        """Extract what scoring a take against the challenge needs
+
+        Takes scored by feature means are cached by content hash, fingerprints
+        included; frames and pitch of aligned takes are not cached.
+        """
+        aligned = challenge_instance is not None \
+            and challenge_instance.aligned_scoring
         try:
-            Fs, x = audioBasicIO.read_audio_file(file_path)
-
-            if x is None or len(x) == 0:
-                raise serializers.ValidationError({"voice_file": "Invalid audio file."})
-
-            # Convert to mono
-            if len(x.shape) > 1:
-                x = x[:, 0]
-
-            # Extract features
-            features, _ = ShortTermFeatures.feature_extraction(x, Fs, int(0.050 * Fs), int(0.025 * Fs))
-
-            if features is None or features.shape[0] == 0:
-                raise serializers.ValidationError({"voice_file": "Feature extraction failed."})
-
-            return [
-                float(np.mean(features[0])),  # ZCR
-                float(np.mean(features[1])),  # Energy
-                float(np.mean(features[2])),  # Spectral Centroid
-                float(np.mean(features[7])),  # Clarity
-                np.mean(features[8:21], axis=1).tolist(),  # MFCCs
-            ]
+            if aligned:
+                melodic = challenge_instance.scoring_mode \
+                    == Challenge.SCORING_MELODIC
+                return extract_take(
+                    voice_file, with_frames=True, with_pitch=melodic)
+            return get_feature_cache().get_or_compute(
+                voice_file, extract_take, kind="take")
         except Exception as e:
-            raise serializers.ValidationError({"voice_file": f"Audio processing failed: {str(e)}"})
+            raise serializers.ValidationError(
+                {"voice_file": f"Audio processing failed: {str(e)}"})
+
+    def _batch_similarities(self, challenge_features, voice_features):
+        """Vectorized _calculate_similarities over a list of takes
+
+        Returns ``{feature: array}`` with one score per take.
+        """
+        reference = flatten_features(challenge_features).astype(np.float64)
+        takes = np.stack([flatten_features(features)
+                          for features in voice_features]).astype(np.float64)
+
+        similarities = {}
+        for column, feature in enumerate(
+                ("zcr", "energy", "centroid", "clarity")):
+            a, b = reference[column], takes[:, column]
+            similarities[feature] = np.clip(
+                1 - np.abs(a - b) / (np.maximum(a, b) + 1e-6), 0, 1)
+        similarities["mfcc"] = cosine_similarity(
+            reference[None, 4:], takes[:, 4:])[0]
+        return similarities
 
     def _calculate_similarities(self, challenge_features, voice_features):
         """Calculate similarity scores between challenge and voice features"""
+        # Stored features are a flat float32 view; uploads are nested lists
+        challenge_features = flatten_features(challenge_features)
+        voice_features = flatten_features(voice_features)
+
         # Basic feature similarities
         similarities = {
-            'zcr': self._feature_similarity(challenge_features[0], voice_features[0]),
-            'energy': self._feature_similarity(challenge_features[1], voice_features[1]),
-            'centroid': self._feature_similarity(challenge_features[2], voice_features[2]),
-            'clarity': self._feature_similarity(challenge_features[3], voice_features[3]),
+            feature: self._feature_similarity(
+                float(challenge_features[column]),
+                float(voice_features[column]))
+            for column, feature in enumerate(
+                ('zcr', 'energy', 'centroid', 'clarity'))
         }
 
         # MFCC similarity using cosine similarity
-        challenge_mfcc = np.array(challenge_features[4]).flatten()
-        voice_mfcc = np.array(voice_features[4]).flatten()
+        challenge_mfcc = challenge_features[4:]
+        voice_mfcc = voice_features[4:]
 
         similarities['mfcc'] = cosine_similarity(
             challenge_mfcc.reshape(1, -1),
@@ -148,21 +469,84 @@ class VoiceUpdateSerializer(serializers.Serializer):
     def _feature_similarity(val1, val2, epsilon=1e-6):
         """Calculate normalized similarity between two values"""
         try:
-            return max(0, min(1, 1 - abs(val1 - val2) / (max(val1, val2) + epsilon)))
+            return max(0, min(
+                1, 1 - abs(val1 - val2) / (max(val1, val2) + epsilon)))
         except (TypeError, ValueError):
             return 0.0
 
     @staticmethod
-    def _print_results(similarities):
-        """Print similarity results"""
-        print(f"Voice Similarity Results:")
-        for feature, score in similarities.items():
-            print(f"  {feature.upper()}: {score:.3f}")
+    def _log_results(similarities):
+        """Log similarity results at debug level"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Voice similarity results: %s", ", ".join(
+                f"{feature.upper()}={score:.3f}"
+                for feature, score in similarities.items()))
+
+
+class BatchVoiceSerializer(VoiceUpdateSerializer):
+    """Several takes of one challenge, scored together and ranked"""
+    voice_file = None
+    voice_files = serializers.ListField(
+        child=serializers.FileField(), allow_empty=False)
+
+    def validate_voice_files(self, value):
+        """Validate the number of takes and each uploaded file"""
+        max_takes = settings.AUDIO_BATCH_MAX_TAKES
+        if len(value) > max_takes:
+            raise serializers.ValidationError(
+                f"Too many takes (max {max_takes}).")
+        return [self.validate_voice_file(voice_file) for voice_file in value]
+
+    def rank_takes(self, challenge_instance, user, takes):
+        """Score extracted takes, store an attempt for each and rank them
+
+        ``takes`` holds ``(features, frames, f0, prints)`` per uploaded file,
+        in upload order, with ``frames`` and ``f0`` as for score_features.
+        Mean-based similarities of all takes are computed in one vectorized
+        step. Returns ``(file name, attempt)`` pairs best first.
+        """
+        with metrics.stage("similarity"):
+            batch = self._batch_similarities(
+                challenge_features(challenge_instance),
+                [take[0] for take in takes])
+
+        ranked = []
+        voice_files = self.validated_data["voice_files"]
+        for position, (voice_file, (_, frames, f0, prints)) in enumerate(
+                zip(voice_files, takes)):
+            similarities = {feature: float(scores[position])
+                            for feature, scores in batch.items()}
+            similarities = self._score_sequences(
+                challenge_instance, similarities, frames, f0)
+            replay = self.check_replay(challenge_instance, prints)
+            attempt = self.record_attempt(
+                challenge_instance, user, similarities, replay)
+            ranked.append((voice_file.name, attempt))
+        ranked.sort(key=lambda pair: -pair[1].score)
+        return ranked
 
     @staticmethod
-    def _cleanup_file(file_path):
-        """Remove temporary file"""
-        try:
-            os.remove(file_path)
-        except FileNotFoundError:
-            pass
\ No newline at end of file
+    def ranked_data(ranked):
+        """Render rank_takes output as ranked attempts with their file names"""
+        return [
+            {"rank": rank, "file": name, **AttemptSerializer(attempt).data}
+            for rank, (name, attempt) in enumerate(ranked, start=1)
+        ]
+
+
+class AttemptSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Attempt
+        fields = ["id", "challenge", "user", "zcr", "energy", "centroid",
+                  "clarity", "mfcc", "pitch", "score", "replay", "created_at"]
+        read_only_fields = fields
+
+
+class ScoringJobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ScoringJob
+        fields = ["id", "kind", "status", "challenge", "result", "error",
+                  "created_at", "updated_at"]
+        read_only_fields = fields
@@ -1,11 +1,30 @@
 import wave
 import io
+import os
+import struct
+import tempfile
+from concurrent.futures import Future
 from unittest.mock import patch
-from django.test import TestCase
+import numpy as np
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
-from core.models import Challenge
+from audio import (
+    FEATURE_SCHEMA_VERSION, content_hash, get_feature_cache, get_frame_store,
+    load_audio,
+)
+from core.models import (
+    Attempt, Challenge, LeaderboardBucket, LeaderboardEntry, ScoringJob,
+)
+from challenge.serializers import (
+    VoiceUpdateSerializer, challenge_features, challenge_frames,
+    extract_file_features,
+)
+from challenge import admission, benchmark
+from challenge.leaderboard import get_leaderboard, score_bucket
 from django.contrib.auth import get_user_model
 
 
@@ -16,6 +35,27 @@ def CHALLENGE_DETAIL_URL(pk):
     return reverse("challenge:challenge-detail", args=[pk])
 
 
+def CHALLENGE_VOICE_URL(pk):
+    return reverse("challenge:challenge-voice", args=[pk])
+
+
+def CHALLENGE_VOICE_BATCH_URL(pk):
+    return reverse("challenge:challenge-voice-batch", args=[pk])
+
+
+def SCORING_JOB_URL(pk):
+    return reverse("challenge:scoring-job", args=[pk])
+
+
+def CHALLENGE_LEADERBOARD_URL(pk):
+    return reverse("challenge:challenge-leaderboard", args=[pk])
+
+
+CHALLENGE_SIMILAR_URL = reverse("challenge:challenge-similar")
+CHALLENGE_DUPLICATES_URL = reverse("challenge:challenge-duplicates")
+AUDIO_METRICS_URL = reverse("challenge:audio-metrics")
+
+
 def create_user(**params):
     """Create and return a new user"""
     return get_user_model().objects.create_user(**params)
@@ -61,14 +101,33 @@ class PublicChallengeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-def generate_fake_wav():
+def generate_fake_wav(freq=440.0, seconds=1.0, lead_in=0.0, amplitude=8000):
     """Generate a minimal valid WAV file for mocking"""
+    rate = 44100
+    t = np.arange(int(rate * seconds)) / rate
+    samples = np.clip(amplitude * np.sin(2 * np.pi * freq * t),
+                      -32768, 32767).astype("<i2")
+    silence = np.zeros(int(rate * lead_in), dtype="<i2")
     buffer = io.BytesIO()
     with wave.open(buffer, "wb") as wav_file:
         wav_file.setnchannels(1)  # Mono
         wav_file.setsampwidth(2)  # 16-bit
-        wav_file.setframerate(44100)  # Sample rate
-        wav_file.writeframes(b"\x00\x00" * 44100)  # 1 second of silence
+        wav_file.setframerate(rate)  # Sample rate
+        wav_file.writeframes(silence.tobytes() + samples.tobytes())
+    return buffer.getvalue()
+
+
+def generate_melody_wav(freqs, seconds=0.5):
+    """Generate a WAV playing each frequency in turn"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        t = np.arange(int(16000 * seconds)) / 16000
+        for freq in freqs:
+            wav_file.writeframes(
+                (8000 * np.sin(2 * np.pi * freq * t)).astype("<i2").tobytes())
     return buffer.getvalue()
 
 
@@ -84,7 +143,8 @@ class PrivateChallengeApiTests(TestCase):
     def test_create_challenge_authenticated(self, mock_get):
         """Mock request.get to simulate a valid WAV file response"""
         mock_get.return_value.status_code = 200
-        mock_get.return_value.content = generate_fake_wav()  # Simulated valid WAV binary
+        # Simulated valid WAV binary
+        mock_get.return_value.content = generate_fake_wav()
 
         payload = {
             "name": "Test Challenge",
@@ -136,3 +196,747 @@ class PrivateChallengeApiTests(TestCase):
         res = self.client.get(CHALLENGE_DETAIL_URL(challenge.id))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.json()["name"], "Test Challenge")
+
+    def test_sound_features_rendered_nested(self):
+        """Test packed sound features are rendered in the nested shape"""
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Packed Challenge",
+            sound_url="https://example.com/sounds/sound1.wav",
+            sound_features=[0.5, 0.25, 0.125, 1.0, [2.0] * 13])
+        res = self.client.get(CHALLENGE_DETAIL_URL(challenge.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["sound_features"],
+                         [0.5, 0.25, 0.125, 1.0, [2.0] * 13])
+        self.assertEqual(res.json()["sound_features_version"],
+                         FEATURE_SCHEMA_VERSION)
+
+
+class InlineExecutor:
+    """Run scoring pool submissions synchronously"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@override_settings(AUDIO_SCORING_MODE="async")
+@patch("challenge.jobs.close_old_connections")
+@patch("audio.pool.get_executor", return_value=InlineExecutor())
+@patch("audio.pool.get_result_executor", return_value=InlineExecutor())
+class AsyncScoringApiTests(TestCase):
+    """Test queued audio scoring jobs"""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.challenge = Challenge.objects.create(
+            created_by=self.user, name="Voice Challenge",
+            sound_url="https://example.com/sounds/sound1.wav",
+            sound_features=[0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+
+    def test_voice_upload_returns_job(self, *mocks):
+        """Test voice uploads answer 202 and the job can be polled"""
+        voice = SimpleUploadedFile("take.wav", generate_fake_wav())
+        res = self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        res = self.client.get(SCORING_JOB_URL(res.data["id"]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["status"], ScoringJob.STATUS_DONE)
+        self.assertIn("mfcc", res.data["result"])
+        # The job released the request's admission slot
+        self.assertEqual(admission.in_flight(), 0)
+
+    def test_job_of_other_user_not_found(self, *mocks):
+        """Test users cannot poll jobs they did not submit"""
+        other = create_user(email="other@example.com", password="testpass")
+        job = ScoringJob.objects.create(kind=ScoringJob.KIND_VOICE, user=other)
+
+        res = self.client.get(SCORING_JOB_URL(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@patch("challenge.jobs.close_old_connections")
+@patch("audio.pool.get_executor", return_value=InlineExecutor())
+@patch("audio.pool.get_result_executor", return_value=InlineExecutor())
+class BatchScoringApiTests(TestCase):
+    """Test several takes scored in one request"""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.challenge = Challenge.objects.create(
+            created_by=self.user, name="Voice Challenge",
+            sound_url="https://example.com/sounds/sound1.wav",
+            sound_features=[0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+        self.takes = {f"take-{freq}.wav": generate_fake_wav(freq)
+                      for freq in (220.0, 440.0, 880.0)}
+
+    def upload(self):
+        voices = [SimpleUploadedFile(name, take)
+                  for name, take in self.takes.items()]
+        return self.client.post(CHALLENGE_VOICE_BATCH_URL(self.challenge.id),
+                                {"voice_files": voices}, format="multipart")
+
+    def test_takes_ranked_with_single_take_scores(self, *mocks):
+        """Test batch scores match one-by-one scoring, best first"""
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([result["rank"] for result in res.data], [1, 2, 3])
+        scores = [result["score"] for result in res.data]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        scorer = VoiceUpdateSerializer()
+        for result in res.data:
+            expected = scorer._calculate_similarities(
+                self.challenge.sound_features,
+                extract_file_features(io.BytesIO(self.takes[result["file"]])))
+            for feature, score in expected.items():
+                self.assertAlmostEqual(result[feature], score, places=5)
+        self.assertEqual(Attempt.objects.count(), 3)
+        self.assertEqual(LeaderboardEntry.objects.get().score, scores[0])
+
+    @override_settings(AUDIO_BATCH_MAX_TAKES=2)
+    def test_too_many_takes_rejected(self, *mocks):
+        """Test batches over AUDIO_BATCH_MAX_TAKES are refused"""
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["field"], "voice_files")
+        self.assertFalse(Attempt.objects.exists())
+
+    @override_settings(AUDIO_SCORING_MODE="async")
+    def test_async_batch_returns_job(self, *mocks):
+        """Test async batches answer 202 with a job holding the ranking"""
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        job = ScoringJob.objects.get(id=res.data["id"])
+        self.assertEqual(job.kind, ScoringJob.KIND_BATCH)
+        self.assertEqual(job.status, ScoringJob.STATUS_DONE)
+        self.assertEqual(
+            sorted(result["file"] for result in job.result["results"]),
+            sorted(self.takes))
+
+
+@override_settings(AUDIO_ADMISSION_MAX_PER_USER=1,
+                   AUDIO_ADMISSION_MAX_IN_FLIGHT=2)
+class AdmissionControlApiTests(TestCase):
+    """Test audio endpoints are refused with 429 when saturated"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.challenge = Challenge.objects.create(
+            created_by=self.user, name="Voice Challenge",
+            sound_url="https://example.com/sounds/sound1.wav",
+            sound_features=[0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+
+    def hold(self, user_id):
+        ticket = admission.acquire(user_id)
+        self.assertIsNotNone(ticket)
+        self.addCleanup(ticket.release)
+        return ticket
+
+    def upload(self):
+        voice = SimpleUploadedFile("take.wav", generate_fake_wav())
+        return self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                 {"voice_file": voice}, format="multipart")
+
+    def test_user_over_cap_gets_retry_after(self):
+        """Test a user already holding their slots is refused at once"""
+        self.hold(self.user.pk)
+
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "5")
+        self.assertEqual(res.data["error_code"], "THROTTLED")
+        self.assertFalse(Attempt.objects.exists())
+
+    def test_full_queue_refuses_audio_only(self):
+        """Test saturation refuses audio requests but not the rest"""
+        self.hold(1001)
+        self.hold(1002)
+
+        self.assertEqual(self.upload().status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        res = self.client.get(CHALLENGE_LEADERBOARD_URL(self.challenge.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_saturated_request_refused_without_waiting(self):
+        """Test a request finding no free slot is refused at once
+
+        The same request is admitted on retry once a slot is free.
+        """
+        self.hold(1001)
+        ticket = self.hold(1002)
+
+        with patch("time.sleep") as sleep:
+            res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        sleep.assert_not_called()
+        self.assertEqual(admission.in_flight(), 2)
+        ticket.release()
+        self.assertEqual(self.upload().status_code, status.HTTP_200_OK)
+
+    def test_slots_released_after_response(self):
+        """Test admitted requests give their slot back"""
+        for _ in range(3):
+            self.assertEqual(self.upload().status_code, status.HTTP_200_OK)
+        self.assertEqual(admission.in_flight(), 0)
+
+
+class ChallengeFrameStoreTests(TestCase):
+    """Test per-frame features of challenge recordings are stored once"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media_root.name
+
+        self.path = os.path.join(media_root.name, "tone.wav")
+        with open(self.path, "wb") as f:
+            f.write(generate_fake_wav())
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_stores_frames(self):
+        """Test creating a challenge stores its frame matrix"""
+        payload = {
+            "name": "Stored Frames",
+            "sound_url": "https://example.com/static/media/tone.wav",
+            "levels": [0.5],
+            "invited_users": [self.user.id],
+        }
+        res = self.client.post(CHALLENGE_LIST_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        challenge = Challenge.objects.get(id=res.data["id"])
+        self.assertEqual(challenge.sound_hash, content_hash(self.path))
+        frames = get_frame_store().load(challenge.sound_hash)
+        self.assertEqual(frames.shape[1], 17)
+        self.assertIs(challenge_frames(challenge), frames)
+
+    def test_create_accepts_loud_reference(self):
+        """Test a mastered reference at full scale is not rejected"""
+        with open(os.path.join(self.media_root, "loud.wav"), "wb") as f:
+            f.write(generate_fake_wav(amplitude=80000))
+        payload = {
+            "name": "Loud",
+            "sound_url": "https://example.com/static/media/loud.wav",
+            "levels": [0.5],
+            "invited_users": [self.user.id],
+        }
+        res = self.client.post(CHALLENGE_LIST_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        voice = SimpleUploadedFile(
+            "take.wav", generate_fake_wav(amplitude=80000))
+        res = self.client.patch(CHALLENGE_VOICE_URL(res.data["id"]),
+                                {"voice_file": voice}, format="multipart")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Recording is clipped", str(res.data))
+
+    def test_frames_extracted_on_first_use(self):
+        """Test challenges without stored frames get them when scored"""
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Legacy",
+            sound_url="http://testserver/static/media/tone.wav",
+            sound_features=[0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+
+        frames = challenge_frames(challenge)
+
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.sound_hash, content_hash(self.path))
+        self.assertGreater(len(frames), 0)
+
+    def test_stale_features_reextracted_when_scored(self):
+        """Test features of an older schema version are extracted again"""
+        stale = [0.1, 0.01, 0.2, 0.3, [1.0] * 13]
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Legacy",
+            sound_url="http://testserver/static/media/tone.wav",
+            sound_features=stale, sound_features_version=0)
+
+        features = challenge_features(challenge)
+
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.sound_features_version,
+                         FEATURE_SCHEMA_VERSION)
+        np.testing.assert_allclose(
+            np.hstack(challenge.sound_features[:4]),
+            extract_file_features(self.path)[:4], rtol=1e-5)
+        self.assertNotEqual(features[:4], stale[:4])
+
+    def test_stale_features_without_recording_refused(self):
+        """Test scoring is refused when stale features cannot be redone"""
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Legacy",
+            sound_url="https://example.com/sounds/missing.wav",
+            sound_features=[0.1, 0.01, 0.2, 0.3, [1.0] * 13],
+            sound_features_version=0)
+
+        voice = SimpleUploadedFile("take.wav", generate_fake_wav())
+        res = self.client.patch(CHALLENGE_VOICE_URL(challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("out of date", str(res.data))
+        self.assertFalse(Attempt.objects.exists())
+
+    def test_stale_features_of_broken_recording_refused(self):
+        """Test a recording that cannot be decoded again is a 400"""
+        with open(os.path.join(self.media_root, "broken.wav"), "wb") as f:
+            f.write(b"RIFF" + b"\0" * 64)
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Legacy",
+            sound_url="http://testserver/static/media/broken.wav",
+            sound_features=[0.1, 0.01, 0.2, 0.3, [1.0] * 13],
+            sound_features_version=0)
+
+        voice = SimpleUploadedFile("take.wav", generate_fake_wav())
+        res = self.client.patch(CHALLENGE_VOICE_URL(challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("sound_features", res.data)
+        self.assertFalse(Attempt.objects.exists())
+
+
+class AlignedScoringApiTests(TestCase):
+    """Test challenges scored by aligning frame sequences"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        path = os.path.join(media_root.name, "melody.wav")
+        with open(path, "wb") as f:
+            f.write(generate_melody_wav([300, 600, 1200]))
+        self.features = extract_file_features(path)
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def score(self, scoring_mode, take, field="mfcc"):
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Melody", scoring_mode=scoring_mode,
+            sound_url="https://example.com/static/media/melody.wav",
+            sound_features=self.features)
+        challenge.invited_users.add(self.user)
+        voice = SimpleUploadedFile("take.wav", take)
+        res = self.client.patch(CHALLENGE_VOICE_URL(challenge.id),
+                                {"voice_file": voice}, format="multipart")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return getattr(Attempt.objects.get(challenge=challenge), field)
+
+    def test_aligned_mode_penalizes_wrong_order(self):
+        """Test only the aligned mode tells a reordered melody apart"""
+        reordered = generate_melody_wav([1200, 600, 300])
+
+        mean_score = self.score(Challenge.SCORING_MEAN, reordered)
+        aligned_score = self.score(Challenge.SCORING_ALIGNED, reordered)
+        exact_score = self.score(
+            Challenge.SCORING_ALIGNED, generate_melody_wav([300, 600, 1200]))
+
+        self.assertLess(aligned_score, 0.5)
+        self.assertGreater(exact_score, 0.99)
+        self.assertLess(aligned_score, mean_score)
+
+    def test_aligned_mode_without_recording_scores_means(self):
+        """Test a missing reference recording falls back to mean scoring"""
+        take = generate_melody_wav([1200, 600, 300])
+        mean_score = self.score(Challenge.SCORING_MEAN, take)
+
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Missing",
+            scoring_mode=Challenge.SCORING_ALIGNED,
+            sound_url="https://example.com/sounds/missing.wav",
+            sound_features=self.features)
+        voice = SimpleUploadedFile("take.wav", take)
+        res = self.client.patch(CHALLENGE_VOICE_URL(challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(res.data["mfcc"], mean_score, places=5)
+
+    def test_melodic_mode_without_recording_skips_pitch(self):
+        """Test a missing reference recording leaves the melody unscored"""
+        challenge = Challenge.objects.create(
+            created_by=self.user, name="Missing",
+            scoring_mode=Challenge.SCORING_MELODIC,
+            sound_url="https://example.com/sounds/missing.wav",
+            sound_features=self.features)
+        voice = SimpleUploadedFile(
+            "take.wav", generate_melody_wav([300, 600, 1200]))
+        res = self.client.patch(CHALLENGE_VOICE_URL(challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data["pitch"])
+
+    def test_melodic_mode_scores_pitch(self):
+        """Test melodic challenges score the contour, ignoring key"""
+        transposed = generate_melody_wav([450, 900, 1800])
+        reordered = generate_melody_wav([1200, 600, 300])
+
+        self.assertIsNone(self.score(Challenge.SCORING_ALIGNED, transposed,
+                                     "pitch"))
+        self.assertGreater(self.score(Challenge.SCORING_MELODIC, transposed,
+                                      "pitch"), 0.9)
+        self.assertLess(self.score(Challenge.SCORING_MELODIC, reordered,
+                                   "pitch"), 0.5)
+
+
+class ReplayDetectionApiTests(TestCase):
+    """Test takes that play the challenge recording back are flagged"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        path = os.path.join(media_root.name, "melody.wav")
+        with open(path, "wb") as f:
+            f.write(generate_melody_wav([300, 600, 1200, 450]))
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.challenge = Challenge.objects.create(
+            created_by=self.user, name="Melody",
+            sound_url="https://example.com/static/media/melody.wav",
+            sound_features=extract_file_features(path))
+        self.challenge.invited_users.add(self.user)
+
+    def upload(self, take):
+        voice = SimpleUploadedFile("take.wav", take)
+        res = self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                {"voice_file": voice}, format="multipart")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return Attempt.objects.get(challenge=self.challenge)
+
+    def test_replayed_excerpt_is_flagged_and_unranked(self):
+        """Test part of the recording played back stays off the leaderboard"""
+        attempt = self.upload(generate_melody_wav([600, 1200, 450]))
+
+        self.assertTrue(attempt.replay)
+        self.assertFalse(LeaderboardEntry.objects.exists())
+        # Fingerprinted on first use and kept for later takes
+        self.challenge.refresh_from_db()
+        self.assertTrue(get_frame_store().load_prints(
+            self.challenge.sound_hash)[0].size)
+
+    def test_other_take_is_ranked(self):
+        """Test a take of the same notes in another order is not a replay"""
+        attempt = self.upload(generate_melody_wav([450, 1200, 600, 300]))
+
+        self.assertFalse(attempt.replay)
+        self.assertTrue(LeaderboardEntry.objects.filter(
+            attempt=attempt).exists())
+
+
+class AttemptLeaderboardApiTests(TestCase):
+    """Test persisted attempts and challenge leaderboards"""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.challenge = Challenge.objects.create(
+            created_by=self.user, name="Voice Challenge",
+            sound_url="https://example.com/sounds/sound1.wav",
+            sound_features=[0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+
+    def test_voice_upload_rejects_non_wav_body(self):
+        """Test uploads that are not RIFF/WAVE are rejected while streaming"""
+        voice = SimpleUploadedFile("take.wav", b"<html>not audio</html>")
+        res = self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["field"], "voice_file")
+        self.assertFalse(Attempt.objects.exists())
+
+    def test_voice_upload_rejects_implausible_sampling_rate(self):
+        """Test a crafted header rate is rejected before the body is stored"""
+        data = bytearray(generate_fake_wav())
+        struct.pack_into("<I", data, 24, 1)
+        voice = SimpleUploadedFile("take.wav", bytes(data))
+        res = self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("sampling rate", str(res.data))
+        self.assertFalse(Attempt.objects.exists())
+
+    def test_voice_upload_rejects_silence(self):
+        """Test silent takes are rejected before feature extraction"""
+        voice = SimpleUploadedFile(
+            "take.wav", generate_fake_wav(seconds=0, lead_in=1.0))
+        res = self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Recording is silent", str(res.data))
+
+    def test_voice_upload_ignores_lead_in_silence(self):
+        """Test leading silence does not change the scored features"""
+        serializer = VoiceUpdateSerializer()
+        plain = serializer.extract_features(
+            SimpleUploadedFile("take.wav", generate_fake_wav()))
+        padded = serializer.extract_features(
+            SimpleUploadedFile("late.wav", generate_fake_wav(lead_in=2.0)))
+
+        np.testing.assert_allclose(plain[:4], padded[:4], rtol=0.05)
+
+    @override_settings(AUDIO_UPLOAD_MAX_BYTES=64 * 1024)
+    def test_voice_upload_size_limited(self):
+        """Test oversized uploads are rejected before being stored"""
+        voice = SimpleUploadedFile("take.wav", generate_fake_wav())
+        res = self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("File too large", str(res.data))
+
+    def test_voice_upload_stages_in_metrics(self):
+        """Test voice scoring stages are exposed to admins as metrics"""
+        voice = SimpleUploadedFile("take.wav", generate_fake_wav())
+        self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                          {"voice_file": voice}, format="multipart")
+
+        res = self.client.get(AUDIO_METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(AUDIO_METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        text = res.content.decode()
+        for stage in ("hash", "decode", "extract", "similarity", "record"):
+            self.assertIn(
+                f'audio_stage_seconds_count{{stage="{stage}"}}', text)
+        self.assertIn('audio_pipeline_seconds_count{pipeline="voice"}', text)
+
+    def record(self, user, score):
+        similarities = dict.fromkeys(
+            ["zcr", "energy", "centroid", "clarity", "mfcc"], score)
+        return VoiceUpdateSerializer.record_attempt(
+            self.challenge, user, similarities)
+
+    def test_voice_upload_records_attempt(self):
+        """Test a voice upload stores the scored attempt"""
+        voice = SimpleUploadedFile("take.wav", generate_fake_wav())
+        res = self.client.patch(CHALLENGE_VOICE_URL(self.challenge.id),
+                                {"voice_file": voice}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        attempt = Attempt.objects.get(id=res.data["id"])
+        self.assertEqual(attempt.user, self.user)
+        self.assertEqual(attempt.challenge, self.challenge)
+
+    def test_voice_upload_decoded_once(self):
+        """Test scoring and replay detection share one cached decode"""
+        cache.clear()
+        get_feature_cache().clear()
+        data = generate_fake_wav(freq=523.0)
+        with patch("challenge.serializers.load_audio",
+                   wraps=load_audio) as decode:
+            for _ in range(2):
+                voice = SimpleUploadedFile("take.wav", data)
+                res = self.client.patch(
+                    CHALLENGE_VOICE_URL(self.challenge.id),
+                    {"voice_file": voice}, format="multipart")
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(Attempt.objects.count(), 2)
+
+    def test_leaderboard_ranks_best_score_per_user(self):
+        """Test the leaderboard keeps each user's best attempt in order"""
+        other = create_user(email="other@example.com", password="testpass")
+        self.record(self.user, 0.5)
+        self.record(other, 0.9)
+        self.record(self.user, 0.7)
+        self.record(self.user, 0.2)
+
+        res = self.client.get(CHALLENGE_LEADERBOARD_URL(self.challenge.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["user"] for r in res.data["results"]],
+                         [other.id, self.user.id])
+        self.assertAlmostEqual(res.data["results"][1]["score"], 0.7)
+        self.assertEqual(res.data["me"]["rank"], 2)
+
+    def test_leaderboard_rank_from_score_buckets(self):
+        """Test ranks are read from bucket counts, not every entry ahead"""
+        users = [create_user(email=f"u{i}@example.com", password="testpass")
+                 for i in range(4)]
+        for user, score in zip(users, [0.9, 0.9, 0.30001, 0.3]):
+            self.record(user, score)
+        self.record(self.user, 0.3)
+        self.record(self.user, 0.30002)
+
+        leaderboard = get_leaderboard()
+        self.assertEqual(
+            leaderboard.rank(self.challenge.id, self.user.id)[0], 3)
+        self.assertEqual(
+            leaderboard.rank(self.challenge.id, users[3].id)[0], 5)
+        counts = dict(LeaderboardBucket.objects.filter(
+            challenge=self.challenge).values_list("bucket", "count"))
+        self.assertEqual(sum(counts.values()), 5)
+        self.assertEqual(counts[score_bucket(0.9)], 2)
+
+
+@override_settings(CHALLENGE_INDEX_MAX_AGE=0)
+class ChallengeSimilarityApiTests(TestCase):
+    """Test nearest-neighbour search over challenge sounds"""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, name, features):
+        return Challenge.objects.create(
+            created_by=self.user, name=name,
+            sound_url="https://example.com/sounds/sound1.wav",
+            sound_features=features)
+
+    def test_similar_challenges_ranked(self):
+        """Test the challenge matching the uploaded clip ranks first"""
+        voice_features = VoiceUpdateSerializer().extract_features(
+            SimpleUploadedFile("clip.wav", generate_fake_wav()))
+        match = self.create("Match", voice_features)
+        self.create("Other", [0.5, 0.9, 0.1, 0.7, [5.0] * 13])
+
+        voice = SimpleUploadedFile("clip.wav", generate_fake_wav())
+        res = self.client.post(CHALLENGE_SIMILAR_URL, {"voice_file": voice},
+                               format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]["id"], match.id)
+
+    def test_similar_reuses_scored_take(self):
+        """Test searching with a scored clip does not decode it again"""
+        cache.clear()
+        get_feature_cache().clear()
+        challenge = self.create("Scored", [0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+        data = generate_fake_wav(freq=523.0)
+        with patch("challenge.serializers.load_audio",
+                   wraps=load_audio) as decode:
+            res = self.client.patch(
+                CHALLENGE_VOICE_URL(challenge.id),
+                {"voice_file": SimpleUploadedFile("take.wav", data)},
+                format="multipart")
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            res = self.client.post(
+                CHALLENGE_SIMILAR_URL,
+                {"voice_file": SimpleUploadedFile("clip.wav", data)},
+                format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_similar_challenges_own_only(self):
+        """Test other users' challenges are never returned, however close"""
+        voice_features = VoiceUpdateSerializer().extract_features(
+            SimpleUploadedFile("clip.wav", generate_fake_wav()))
+        other = create_user(email="other@example.com", password="testpass")
+        Challenge.objects.create(
+            created_by=other, name="Theirs",
+            sound_url="https://example.com/sounds/sound1.wav",
+            sound_features=voice_features)
+        mine = self.create("Mine", [0.5, 0.9, 0.1, 0.7, [5.0] * 13])
+
+        voice = SimpleUploadedFile("clip.wav", generate_fake_wav())
+        res = self.client.post(CHALLENGE_SIMILAR_URL, {"voice_file": voice},
+                               format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data], [mine.id])
+
+    def test_similar_skips_stale_features(self):
+        """Test features of an older schema version are not indexed"""
+        voice_features = VoiceUpdateSerializer().extract_features(
+            SimpleUploadedFile("clip.wav", generate_fake_wav()))
+        stale = self.create("Stale", voice_features)
+        Challenge.objects.filter(pk=stale.pk).update(sound_features_version=0)
+        current = self.create("Current", [0.5, 0.9, 0.1, 0.7, [5.0] * 13])
+
+        voice = SimpleUploadedFile("clip.wav", generate_fake_wav())
+        res = self.client.post(CHALLENGE_SIMILAR_URL, {"voice_file": voice},
+                               format="multipart")
+
+        self.assertEqual([r["id"] for r in res.data], [current.id])
+
+    def test_duplicates_admin_only(self):
+        """Test the duplicate report requires an admin and lists pairs"""
+        first = self.create("First", [0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+        second = self.create("Second", [0.1, 0.01, 0.2, 0.3, [1.0] * 13])
+        self.create("Other", [0.5, 0.9, 0.1, 0.7, [5.0] * 13])
+
+        res = self.client.get(CHALLENGE_DUPLICATES_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(CHALLENGE_DUPLICATES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([(p["challenge"], p["duplicate"]) for p in res.data],
+                         [(first.id, second.id)])
+
+
+class BenchmarkTests(SimpleTestCase):
+    """Test the scoring pipeline benchmark harness"""
+
+    def test_corpus_is_deterministic(self):
+        """Test corpus WAVs are identical across runs and cover stereo"""
+        name, *spec = benchmark.corpus()[3]
+        self.assertEqual(benchmark.make_case_wav(name, *spec),
+                         benchmark.make_case_wav(name, *spec))
+        self.assertIn("chirp-48000-stereo-5s",
+                      [case[0] for case in benchmark.corpus()])
+
+    def test_baseline_covers_quick_corpus(self):
+        """Test every quick case has a stored baseline"""
+        baseline = benchmark.load_baseline()
+        for name, *_ in benchmark.corpus():
+            self.assertIn(name, baseline)
+
+    def test_compare_flags_regressions(self):
+        """Test slow stages, memory growth and feature drift are reported"""
+        expected = {"decode": 0.01, "extract": 0.1, "similarity": 0.001,
+                    "peak_mb": 10.0, "features": [1.0] * 17}
+        result = dict(expected, extract=0.2, similarity=0.002,
+                      features=[1.0] * 16 + [1.1])
+
+        regressions = benchmark.compare({"case": result}, {"case": expected})
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("extract", regressions[0])
+        self.assertIn("feature values changed", regressions[1])
+        self.assertEqual(benchmark.compare({"case": expected},
+                                           {"case": expected}), [])
@@ -1,6 +1,9 @@
 """URL mappings for the challenge API."""
 from django.urls import path
-from .views import ChallengeViewSet
+from .views import (
+    ChallengeViewSet, ScoringJobViewSet, FeatureCacheStatsView,
+    ChallengeDuplicatesView, AudioMetricsView,
+)
 
 app_name = 'challenge'
 
@@ -10,9 +13,30 @@ urlpatterns = [
          name='challenges'),
     path('<int:pk>/',
          ChallengeViewSet.as_view(
-             {'get': 'retrieve','patch': 'partial_update'}),
+             {'get': 'retrieve', 'patch': 'partial_update'}),
          name='challenge-detail'),
     path('<int:pk>/voice/',
          ChallengeViewSet.as_view({'patch': 'update_voice'}),
          name='challenge-voice'),
+    path('<int:pk>/voice/batch/',
+         ChallengeViewSet.as_view({'post': 'score_takes'}),
+         name='challenge-voice-batch'),
+    path('<int:pk>/leaderboard/',
+         ChallengeViewSet.as_view({'get': 'leaderboard'}),
+         name='challenge-leaderboard'),
+    path('similar/',
+         ChallengeViewSet.as_view({'post': 'similar'}),
+         name='challenge-similar'),
+    path('duplicates/',
+         ChallengeDuplicatesView.as_view(),
+         name='challenge-duplicates'),
+    path('jobs/<uuid:pk>/',
+         ScoringJobViewSet.as_view({'get': 'retrieve'}),
+         name='scoring-job'),
+    path('feature-cache/',
+         FeatureCacheStatsView.as_view(),
+         name='feature-cache-stats'),
+    path('metrics/',
+         AudioMetricsView.as_view(),
+         name='audio-metrics'),
 ]
@@ -1,47 +1,237 @@
+from django.conf import settings
+from django.http import HttpResponse
 from rest_framework import viewsets, permissions, authentication, status
-from .serializers import ChallengeSerializer, VoiceUpdateSerializer
+from .serializers import (
+    ChallengeSerializer, VoiceUpdateSerializer, BatchVoiceSerializer,
+    ScoringJobSerializer, AttemptSerializer,
+)
+from .admission import AudioAdmissionMixin
+from .leaderboard import get_leaderboard
+from .search import get_challenge_index
+from . import jobs
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import serializers
-from core.models import Challenge
+from core.models import Challenge, ScoringJob, User
+from audio import get_feature_cache, metrics
+from audio.pool import is_async
+from audio.uploads import WavUploadMixin
 
 
-class ChallengeViewSet(viewsets.ModelViewSet):
+class ChallengeViewSet(AudioAdmissionMixin, WavUploadMixin,
+                       viewsets.ModelViewSet):
     queryset = Challenge.objects.all()
     serializer_class = ChallengeSerializer
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    wav_upload_fields = {
+        'update_voice': ['voice_file'],
+        'score_takes': ['voice_files'],
+        'similar': ['voice_file'],
+    }
+    wav_upload_limit_request = True
+    # Actions that decode and analyse audio on this request
+    admission_actions = ('create', 'update_voice', 'score_takes', 'similar')
 
     def get_queryset(self):
         # Only return challenges created by the requesting user
         return Challenge.objects.filter(created_by=self.request.user)
 
     def get_serializer_class(self):
-        if self.action == 'update_voice':
+        if self.action in ('update_voice', 'similar'):
             return VoiceUpdateSerializer
+        if self.action == 'score_takes':
+            return BatchVoiceSerializer
         return ChallengeSerializer
 
-    @action(detail=True, methods=['patch'], url_path='voice', parser_classes=[MultiPartParser, FormParser])
+    def get_wav_upload_count(self, fields):
+        if self.action == 'score_takes':
+            return settings.AUDIO_BATCH_MAX_TAKES
+        return super().get_wav_upload_count(fields)
+
+    def create(self, request, *args, **kwargs):
+        """Create a challenge, queueing feature extraction in async mode"""
+        if not is_async():
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = self.queue_job(request, jobs.submit_challenge, serializer)
+        return Response(ScoringJobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['patch'], url_path='voice',
+            parser_classes=[MultiPartParser, FormParser])
     def update_voice(self, request, pk=None):
-        """Update voice/audio for an existing challenge by uploading a .wav file"""
+        """Score an uploaded .wav take against an existing challenge"""
         challenge = self.get_object()
 
         # Check if user owns this challenge (optional security check)
         if challenge.created_by != request.user:
             return Response(
-                {"error": "You don't have permission to update this challenge."},
+                {"error":
+                    "You don't have permission to update this challenge."},
                 status=status.HTTP_403_FORBIDDEN
             )
 
         serializer = VoiceUpdateSerializer(data=request.data)
         if serializer.is_valid():
+            if is_async():
+                job = self.queue_job(request, jobs.submit_voice, serializer,
+                                     challenge, request.user)
+                return Response(ScoringJobSerializer(job).data,
+                                status=status.HTTP_202_ACCEPTED)
             try:
-                updated_challenge = serializer.update_challenge_voice(challenge)
-                # Return the updated challenge data
-                response_serializer = ChallengeSerializer(updated_challenge)
-                return Response(response_serializer.data, status=status.HTTP_200_OK)
+                attempt = serializer.update_challenge_voice(
+                    challenge, request.user)
+                # Return the stored attempt with its scores
+                response_serializer = AttemptSerializer(attempt)
+                return Response(response_serializer.data,
+                                status=status.HTTP_200_OK)
             except serializers.ValidationError as e:
                 return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
         else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response(serializer.errors,
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'], url_path='voice/batch',
+            parser_classes=[MultiPartParser, FormParser])
+    def score_takes(self, request, pk=None):
+        """Score several .wav takes of a challenge at once and rank them"""
+        challenge = self.get_object()
+
+        if challenge.created_by != request.user:
+            return Response(
+                {"error":
+                    "You don't have permission to update this challenge."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = BatchVoiceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if is_async():
+            job = self.queue_job(request, jobs.submit_takes, serializer,
+                                 challenge, request.user)
+            return Response(ScoringJobSerializer(job).data,
+                            status=status.HTTP_202_ACCEPTED)
+        with metrics.trace("batch"):
+            try:
+                results = jobs.score_takes(serializer, challenge, request.user)
+            except serializers.ValidationError:
+                raise
+            except Exception as e:
+                raise serializers.ValidationError(
+                    {"voice_files": f"Audio processing failed: {str(e)}"})
+        return Response(results, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='leaderboard')
+    def leaderboard(self, request, pk=None):
+        """Top scores for a challenge and the requesting user's rank"""
+        challenge = self.get_object()
+        try:
+            limit = min(max(
+                int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            raise serializers.ValidationError({"limit": "Must be an integer."})
+
+        board = get_leaderboard()
+        top = board.top(challenge.id, limit)
+        names = dict(User.objects.filter(
+            id__in=[user_id for user_id, _ in top]).values_list('id', 'name'))
+        results = [
+            {"rank": position, "user": user_id,
+             "name": names.get(user_id, ""), "score": score}
+            for position, (user_id, score) in enumerate(top, start=1)
+        ]
+
+        mine = board.rank(challenge.id, request.user.id)
+        me = {"rank": mine[0], "score": mine[1]} if mine else None
+        return Response({"results": results, "me": me},
+                        status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='similar',
+            parser_classes=[MultiPartParser, FormParser])
+    def similar(self, request):
+        """Find the requesting user's challenges whose sound is closest to
+        an uploaded .wav clip"""
+        serializer = VoiceUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            limit = min(max(
+                int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            raise serializers.ValidationError({"limit": "Must be an integer."})
+
+        with metrics.trace("similar"):
+            features = serializer.extract_features(
+                serializer.validated_data["voice_file"])
+            with metrics.stage("search"):
+                own = self.get_queryset().values_list("id", flat=True)
+                matches = get_challenge_index().search(
+                    features, limit, include=own)
+        challenges = self.get_queryset().in_bulk(
+            [challenge_id for challenge_id, _ in matches])
+        results = [
+            {
+                "id": challenge_id,
+                "name": challenges[challenge_id].name,
+                "sound_url": challenges[challenge_id].sound_url,
+                "similarity": similarity,
+            }
+            for challenge_id, similarity in matches
+            if challenge_id in challenges
+        ]
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class ChallengeDuplicatesView(APIView):
+    """Admin report of challenges whose sound features are near-identical"""
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            threshold = float(request.query_params.get('threshold', 0.995))
+        except ValueError:
+            raise serializers.ValidationError(
+                {"threshold": "Must be a number."})
+
+        pairs = get_challenge_index().duplicates(threshold)
+        return Response([
+            {"challenge": a, "duplicate": b, "similarity": similarity}
+            for a, b, similarity in pairs
+        ], status=status.HTTP_200_OK)
+
+
+class ScoringJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Poll the outcome of queued challenge audio work"""
+    queryset = ScoringJob.objects.all()
+    serializer_class = ScoringJobSerializer
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # Only return jobs submitted by the requesting user
+        return ScoringJob.objects.filter(user=self.request.user)
+
+
+class FeatureCacheStatsView(APIView):
+    """Hit, miss and eviction counters of this process's feature cache"""
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_feature_cache().stats())
+
+
+class AudioMetricsView(APIView):
+    """Audio pipeline stage histograms in the Prometheus text format"""
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,15 +1,38 @@
 import json
+from asgiref.sync import async_to_sync, sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
+from channels.layers import get_channel_layer
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import DatabaseError, transaction
+from django.dispatch import receiver
 from core.models import Message, Room
 from django.utils import timezone
 
+from .history import get_history
+from .persistence import get_message_buffer, is_write_behind
+from .room_stats import record_messages
+
+
+def room_group_name(room_name):
+    """Channel-layer group of the sockets connected to a room"""
+    return f'chat_{room_name}'
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_name = self.scope['url_route']['kwargs']['room_name']
-        self.room_group_name = f'chat_{self.room_name}'
+        self.room_group_name = room_group_name(self.room_name)
+
+        # Resolved once for the socket's lifetime; TokenAuthMiddlewareStack
+        # has already loaded the user from the API token or session. The
+        # room is looked up on the first message, so joining costs no
+        # query, and room_changed drops it when it goes stale
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            user = None
+        self.user = user
+        self.room_id = None
 
         # Join room group
         await self.channel_layer.group_add(
@@ -25,6 +48,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message': f'Connected to room: {self.room_name}'
         }))
 
+        # Replay the room's recent messages; older ones come from the
+        # paginated messages endpoint
+        recent = await sync_to_async(
+            get_history().recent, thread_sensitive=False)(self.room_name)
+        await self.send(text_data=json.dumps({
+            'type': 'history',
+            'messages': recent
+        }))
+
     async def disconnect(self, close_code):
         # Leave room group
         await self.channel_layer.group_discard(
@@ -50,23 +82,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def handle_chat_message(self, data):
         message = data.get('message', '')
-        email = data.get('email', 'Anonymous')
+        if self.user is not None:
+            email = self.user.email
+        else:
+            email = data.get('email', 'Anonymous')
 
         if not message.strip():
             return
 
-        # Save message to database
-        await self.save_message(email, message)
+        timestamp = timezone.now()
+        if is_write_behind():
+            # Broadcast first; the buffer writes the message in a batch
+            saved = await self.queue_message(email, message, timestamp)
+        else:
+            # Save message to database
+            saved = await self.save_message(email, message, timestamp)
+
+        # The uid is the entry's stable id in both modes; clients use it
+        # to drop ring entries the messages endpoint also returns
+        entry = {
+            'uid': str(saved.uid),
+            'message': message,
+            'email': email,
+            'timestamp': str(timestamp)
+        }
+        await sync_to_async(get_history().append, thread_sensitive=False)(
+            self.room_name, entry)
 
         # Send message to room group
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message,
-                'email': email,
-                'timestamp': str(timezone.now())
-            }
+            {'type': 'chat_message', **entry}
         )
 
     async def handle_typing(self, data):
@@ -87,11 +133,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Send message to WebSocket
         await self.send(text_data=json.dumps({
             'type': 'chat_message',
+            'uid': event['uid'],
             'message': event['message'],
             'email': event['email'],
             'timestamp': event['timestamp']
         }))
 
+    async def room_changed(self, event):
+        # The room was renamed or deleted; resolve it again on next message
+        self.room_id = None
+
     async def typing_status(self, event):
         # Send typing status to WebSocket
         await self.send(text_data=json.dumps({
@@ -101,18 +152,75 @@ class ChatConsumer(AsyncWebsocketConsumer):
         }))
 
     @database_sync_to_async
-    def save_message(self, email, message):
-        User = get_user_model()
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            user = None
-
+    def resolve_room(self):
         room, created = Room.objects.get_or_create(name=self.room_name)
+        return room.pk
 
-        Message.objects.create(
-            room=room,
-            user=user,
+    def build_message(self, email, message, timestamp):
+        return Message(
+            room_id=self.room_id,
+            user=self.user,
             email=email,
-            content=message
+            content=message,
+            timestamp=timestamp
         )
+
+    @database_sync_to_async
+    def save_message(self, email, message, timestamp):
+        if self.room_id is None:
+            room, created = Room.objects.get_or_create(name=self.room_name)
+            self.room_id = room.pk
+
+        saved = self.build_message(email, message, timestamp)
+        with transaction.atomic():
+            saved.save(force_insert=True)
+            record_messages([saved])
+        return saved
+
+    async def queue_message(self, email, message, timestamp):
+        if self.room_id is None:
+            self.room_id = await self.resolve_room()
+
+        buffer = get_message_buffer()
+        queued = self.build_message(email, message, timestamp)
+        if buffer.put(queued):
+            # The buffer is backed up; help drain it before going on
+            await self.write_buffered_batch(buffer)
+        return queued
+
+    @database_sync_to_async
+    def write_buffered_batch(self, buffer):
+        try:
+            buffer.write_batch()
+        except DatabaseError:
+            # Still buffered; the flusher thread retries it
+            pass
+
+
+def _room_changed(room_name):
+    """Tell the sockets of a room to drop their cached Room"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        room_group_name(room_name), {'type': 'room_changed'})
+
+
+@receiver(pre_save, sender=Room)
+def _remember_room_name(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._stored_name = Room.objects.filter(
+            pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Room)
+def _invalidate_renamed_room(sender, instance, created, **kwargs):
+    stored_name = getattr(instance, '_stored_name', None)
+    if stored_name is not None and stored_name != instance.name:
+        _room_changed(stored_name)
+
+
+@receiver(post_delete, sender=Room)
+def _invalidate_deleted_room(sender, instance, **kwargs):
+    get_history().clear(instance.name)
+    _room_changed(instance.name)
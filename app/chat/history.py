@@ -0,0 +1,103 @@
+"""
+Recent-history ring buffer of chat rooms.
+
+The consumer appends every message it broadcasts to its room's ring of
+the last CHAT_HISTORY_SIZE messages and replays that ring to a socket as
+soon as it connects, so opening a room renders without a database query.
+Postgres is only read when a client scrolls back past the ring, through
+the paginated messages endpoint.
+
+With CHAT_HISTORY_BACKEND = 'redis' the ring is a Redis list per room
+(RPUSH + LTRIM), shared by every process behind the channel layer. The
+default 'memory' backend keeps a deque per room in this process, which
+is only complete for single-node deployments. Either way the ring is a
+cache: losing it only means a join starts with fewer messages.
+
+Each entry carries its message's ``uid``, assigned before broadcast even
+when the row is written later, so clients can match ring entries against
+the pages of the messages endpoint.
+"""
+import json
+import threading
+from collections import OrderedDict, deque
+
+import redis
+from django.conf import settings
+
+# Rooms whose rings the memory backend keeps before evicting the least
+# recently used one
+MAX_MEMORY_ROOMS = 10000
+
+
+class MemoryHistory:
+    """Per-process rings of recent messages, one deque per room"""
+
+    def __init__(self, size, max_rooms=MAX_MEMORY_ROOMS):
+        self.size = size
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, room_name, entry):
+        with self._lock:
+            ring = self._rooms.get(room_name)
+            if ring is None:
+                ring = self._rooms[room_name] = deque(maxlen=self.size)
+                if len(self._rooms) > self.max_rooms:
+                    self._rooms.popitem(last=False)
+            else:
+                self._rooms.move_to_end(room_name)
+            ring.append(entry)
+
+    def recent(self, room_name):
+        """Return the room's ring, oldest message first"""
+        with self._lock:
+            return list(self._rooms.get(room_name, ()))
+
+    def clear(self, room_name):
+        with self._lock:
+            self._rooms.pop(room_name, None)
+
+
+class RedisHistory:
+    """Rings of recent messages kept in one Redis list per room"""
+
+    def __init__(self, url, size):
+        self.client = redis.Redis.from_url(url)
+        self.size = size
+
+    @staticmethod
+    def key(room_name):
+        return f'chat:history:{room_name}'
+
+    def append(self, room_name, entry):
+        key = self.key(room_name)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, json.dumps(entry))
+        pipe.ltrim(key, -self.size, -1)
+        pipe.execute()
+
+    def recent(self, room_name):
+        """Return the room's ring, oldest message first"""
+        return [json.loads(entry) for entry in
+                self.client.lrange(self.key(room_name), 0, -1)]
+
+    def clear(self, room_name):
+        self.client.delete(self.key(room_name))
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """Return the history backend configured in settings"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            if settings.CHAT_HISTORY_BACKEND == 'redis':
+                _history = RedisHistory(
+                    settings.REDIS_URL, settings.CHAT_HISTORY_SIZE)
+            else:
+                _history = MemoryHistory(settings.CHAT_HISTORY_SIZE)
+        return _history
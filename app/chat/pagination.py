@@ -0,0 +1,168 @@
+"""
+Keyset pagination of chat message history.
+
+Messages are ordered by (timestamp, id), and a cursor is the position of
+one message in that order. ``?before=<cursor>`` returns the page of
+messages just older than it, for infinite scroll, and ``?after=<cursor>``
+the page just newer, for catching up after a reconnect. Without a cursor
+the newest page is returned. Pages are always in chronological order.
+
+Each page is a single range scan of the (room, timestamp, id) index
+limited to page_size + 1 rows, so it costs the same however deep into
+a room's history it is. Offsets would cost more the further back a
+page is.
+"""
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(message):
+    """Return the opaque cursor of a message's position"""
+    micros = (message.timestamp - EPOCH) // MICROSECOND
+    position = f'{micros}.{message.pk}'.encode()
+    return base64.urlsafe_b64encode(position).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) a cursor points at; ValueError if bad"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = base64.urlsafe_b64decode(padded.encode()).decode()
+        micros, pk = (int(part) for part in position.split('.'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor.')
+    return EPOCH + micros * MICROSECOND, pk
+
+
+def older_than(timestamp, pk):
+    # The timestamp bound alone is an index range; the OR only refines
+    # its last timestamp
+    return Q(timestamp__lte=timestamp) & (
+        Q(timestamp__lt=timestamp) | Q(id__lt=pk))
+
+
+def newer_than(timestamp, pk):
+    return Q(timestamp__gte=timestamp) & (
+        Q(timestamp__gt=timestamp) | Q(id__gt=pk))
+
+
+class MessageCursorPagination(BasePagination):
+    """Before/after keyset pagination over (timestamp, id)"""
+    before_query_param = 'before'
+    after_query_param = 'after'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(
+                self.page_size_query_param, settings.CHAT_MESSAGE_PAGE_SIZE))
+        except ValueError:
+            raise serializers.ValidationError(
+                {self.page_size_query_param: 'Must be an integer.'})
+        return min(max(size, 1), self.max_page_size)
+
+    def get_cursor(self, request, param):
+        cursor = request.query_params.get(param)
+        if cursor is None:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except ValueError as exc:
+            raise serializers.ValidationError({param: str(exc)})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        self.before = self.get_cursor(request, self.before_query_param)
+        self.after = self.get_cursor(request, self.after_query_param)
+        if self.before is not None and self.after is not None:
+            raise serializers.ValidationError(
+                {self.before_query_param: 'Use either before or after.'})
+
+        if self.after is not None:
+            rows = list(queryset.filter(newer_than(*self.after))
+                        .order_by('timestamp', 'id')[:size + 1])
+            self.has_newer = len(rows) > size
+            self.has_older = True
+            self.page = rows[:size]
+        else:
+            if self.before is not None:
+                queryset = queryset.filter(older_than(*self.before))
+            rows = list(queryset.order_by('-timestamp', '-id')[:size + 1])
+            self.has_older = len(rows) > size
+            self.has_newer = self.before is not None
+            self.page = rows[:size][::-1]
+        return self.page
+
+    def _link(self, param, cursor):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.before_query_param)
+        url = remove_query_param(url, self.after_query_param)
+        return replace_query_param(url, param, cursor)
+
+    def get_previous_link(self):
+        if not self.page or not self.has_older:
+            return None
+        return self._link(self.before_query_param,
+                          encode_cursor(self.page[0]))
+
+    def get_next_link(self):
+        # Always offered once there is a position, so clients can poll
+        # for messages sent after the newest one they have
+        if self.page:
+            return self._link(self.after_query_param,
+                              encode_cursor(self.page[-1]))
+        if self.after is not None:
+            return self.request.build_absolute_uri()
+        return None
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('previous', self.get_previous_link()),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'previous': {'type': 'string', 'nullable': True,
+                             'format': 'uri'},
+                'next': {'type': 'string', 'nullable': True,
+                         'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': param,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': schema_type},
+            }
+            for param, schema_type, description in (
+                (self.before_query_param, 'string',
+                 'Cursor; return the messages just older than it.'),
+                (self.after_query_param, 'string',
+                 'Cursor; return the messages just newer than it.'),
+                (self.page_size_query_param, 'integer',
+                 'Number of messages per page.'),
+            )
+        ]
@@ -0,0 +1,222 @@
+"""
+Write-behind persistence of chat messages.
+
+With CHAT_PERSISTENCE_MODE = 'write_behind' the consumer broadcasts a
+message at once and hands the unsaved Message to this process's
+MessageBuffer. A daemon thread writes the buffer with one bulk_create
+per CHAT_WRITE_BATCH_SIZE messages, or every CHAT_WRITE_FLUSH_INTERVAL
+seconds when traffic is light.
+
+Rows are stamped with the time they are written, not the time they
+were sent. A client catching up with an ``after`` cursor has seen every
+row older than its cursor, so a batch flushed later must not sort before
+it. Broadcasts keep the send time; clients match them to stored rows by
+``uid``.
+
+A batch that fails is put back in front of the buffer and retried with
+backoff, so a database outage delays writes instead of losing them.
+Messages whose room was deleted meanwhile cannot be written; they are
+found by retrying the batch row by row and dropped. Past
+CHAT_WRITE_MAX_PENDING buffered messages senders write a batch
+themselves, which pushes back on them until the database catches up.
+The buffer is drained when the interpreter exits, so a graceful
+shutdown loses nothing.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, IntegrityError, close_old_connections, transaction,
+)
+from django.utils import timezone
+
+from core.models import Message
+from .room_stats import record_messages
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between retries of a failing batch, in seconds
+MAX_BACKOFF = 30.0
+
+
+def is_write_behind():
+    """Return True when chat messages are persisted after broadcast"""
+    return settings.CHAT_PERSISTENCE_MODE == 'write_behind'
+
+
+class MessageBuffer:
+    """Buffer of unsaved Messages written in batches by a daemon thread"""
+
+    def __init__(self, batch_size, interval, max_pending):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = deque()
+        # Serializes writers, so batches reach the database in order
+        self._write_lock = threading.Lock()
+        self._ready = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._counters = {'written': 0, 'dropped': 0, 'failures': 0}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, message):
+        """
+        Queue an unsaved Message without touching the database.
+
+        Returns True when more than ``max_pending`` messages are waiting;
+        the caller should then call write_batch() from a sync context.
+        """
+        with self._ready:
+            self._pending.append(message)
+            depth = len(self._pending)
+            if depth >= self.batch_size:
+                self._ready.notify()
+            if self._thread is None:
+                self._start()
+        return depth > self.max_pending
+
+    def _start(self):
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name='chat-write-behind', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            with self._ready:
+                if len(self._pending) < self.batch_size \
+                        and not self._stopping:
+                    self._ready.wait(self.interval)
+                if self._stopping:
+                    return
+            try:
+                while self.write_batch() >= self.batch_size:
+                    pass
+            except DatabaseError:
+                logger.exception('Chat write-behind flush failed, retrying')
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            else:
+                backoff = self.interval
+            finally:
+                close_old_connections()
+
+    def _take(self):
+        with self._ready:
+            count = min(len(self._pending), self.batch_size)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _requeue(self, batch):
+        with self._ready:
+            self._pending.extendleft(reversed(batch))
+
+    def _insert(self, messages):
+        written_at = timezone.now()
+        for message in messages:
+            message.timestamp = written_at
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+            record_messages(messages)
+
+    def write_batch(self):
+        """Write up to one batch; return how many messages it held"""
+        with self._write_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+            try:
+                self._insert(batch)
+            except IntegrityError:
+                self._write_one_by_one(batch)
+            except DatabaseError:
+                self._counters['failures'] += 1
+                self._requeue(batch)
+                raise
+            else:
+                self._counters['written'] += len(batch)
+            return len(batch)
+
+    def _write_one_by_one(self, batch):
+        """Write a batch holding rows that cannot be saved, dropping those"""
+        for position, message in enumerate(batch):
+            try:
+                self._insert([message])
+            except IntegrityError:
+                self._counters['dropped'] += 1
+                logger.warning('Dropped chat message for missing room %s',
+                               message.room_id)
+            except DatabaseError:
+                self._counters['failures'] += 1
+                self._requeue(batch[position:])
+                raise
+            else:
+                self._counters['written'] += 1
+
+    def flush(self, attempts=3):
+        """
+        Write everything buffered on the calling thread.
+
+        Each failing batch is retried up to ``attempts`` times before the
+        error is raised; the unwritten messages stay buffered.
+        """
+        failed = 0
+        while len(self._pending):
+            try:
+                self.write_batch()
+            except DatabaseError:
+                failed += 1
+                if failed >= attempts:
+                    raise
+                time.sleep(min(self.interval * 2 ** failed, MAX_BACKOFF))
+        return self._counters['written']
+
+    def stop(self):
+        """Stop the flusher thread and write what is left"""
+        with self._ready:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._ready.notify()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def stats(self):
+        """Return queue depth and write counters for monitoring"""
+        return dict(self._counters, pending=len(self._pending),
+                    max_pending=self.max_pending)
+
+
+_message_buffer = None
+_message_buffer_lock = threading.Lock()
+
+
+def get_message_buffer():
+    """Return the process-wide message buffer configured from settings"""
+    global _message_buffer
+    with _message_buffer_lock:
+        if _message_buffer is None:
+            _message_buffer = MessageBuffer(
+                batch_size=settings.CHAT_WRITE_BATCH_SIZE,
+                interval=settings.CHAT_WRITE_FLUSH_INTERVAL,
+                max_pending=settings.CHAT_WRITE_MAX_PENDING,
+            )
+        return _message_buffer
+
+
+@atexit.register
+def _drain():
+    if _message_buffer is None:
+        return
+    try:
+        _message_buffer.stop()
+    except DatabaseError:
+        logger.exception('Chat messages left unwritten at exit: %d',
+                         len(_message_buffer))
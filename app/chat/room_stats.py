@@ -0,0 +1,45 @@
+"""
+Denormalized per-room message statistics.
+
+Every write path calls ``record_messages`` in the transaction that
+inserts the messages. That covers the consumer, the write-behind buffer
+and the REST send endpoint. Each room touched costs one UPDATE, which
+adds to ``message_count`` and replaces ``last_message_*`` only when the
+new message is not older than the stored one. Room listings then read
+plain columns instead of counting and sorting messages per room.
+"""
+from django.db.models import Case, F, Q, Value, When
+
+from core.models import Room
+
+
+def _latest(messages):
+    # Rows of one write-behind batch share a timestamp and may have no pk
+    # yet; the last one queued wins the tie
+    return max(reversed(messages), key=lambda message: (message.timestamp,
+                                                        message.pk or 0))
+
+
+def _if(condition, field, value):
+    """``value`` where ``condition`` holds, else the field's own value"""
+    return Case(When(condition, then=Value(value)), default=F(field),
+                output_field=Room._meta.get_field(field))
+
+
+def record_messages(messages):
+    """Add newly inserted ``messages`` to their rooms' statistics"""
+    by_room = {}
+    for message in messages:
+        by_room.setdefault(message.room_id, []).append(message)
+
+    for room_id, room_messages in by_room.items():
+        last = _latest(room_messages)
+        newer = Q(last_message_at__isnull=True) \
+            | Q(last_message_at__lte=last.timestamp)
+        Room.objects.filter(pk=room_id).update(
+            message_count=F('message_count') + len(room_messages),
+            last_message_at=_if(newer, 'last_message_at', last.timestamp),
+            last_message_email=_if(newer, 'last_message_email', last.email),
+            last_message_content=_if(
+                newer, 'last_message_content', last.content),
+        )
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from core.models import Room, Message
 
@@ -5,41 +6,38 @@ from core.models import Room, Message
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = ['id', 'email', 'content', 'timestamp']
-        read_only_fields = ['id', 'timestamp']
+        fields = ['id', 'uid', 'email', 'content', 'timestamp']
+        read_only_fields = ['id', 'uid', 'timestamp']
 
 
 class RoomSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
-    message_count = serializers.SerializerMethodField()
+    messages = serializers.SerializerMethodField()
 
     class Meta:
         model = Room
         fields = ['id', 'name', 'created_at', 'messages', 'message_count']
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'created_at', 'message_count']
 
-    def get_message_count(self, obj):
-        return obj.messages.count()
+    def get_messages(self, obj):
+        """The newest messages; older ones come from the messages action"""
+        recent = obj.messages.order_by('-timestamp', '-id')[
+            :settings.CHAT_ROOM_RECENT_MESSAGES]
+        return MessageSerializer(reversed(recent), many=True).data
 
 
 class RoomListSerializer(serializers.ModelSerializer):
-    message_count = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
 
     class Meta:
         model = Room
         fields = ['id', 'name', 'created_at', 'message_count', 'last_message']
-        read_only_fields = ['id', 'created_at']
-
-    def get_message_count(self, obj):
-        return obj.messages.count()
+        read_only_fields = ['id', 'created_at', 'message_count']
 
     def get_last_message(self, obj):
-        last_msg = obj.messages.last()
-        if last_msg:
-            return {
-                'content': last_msg.content,
-                'email': last_msg.email,
-                'timestamp': last_msg.timestamp
-            }
-        return None
\ No newline at end of file
+        if obj.last_message_at is None:
+            return None
+        return {
+            'content': obj.last_message_content,
+            'email': obj.last_message_email,
+            'timestamp': obj.last_message_at
+        }
@@ -1,3 +1,511 @@
-from django.test import TestCase
+import time
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from core.models import Message, Room
+from chat.history import MemoryHistory
+from chat.persistence import MessageBuffer
+from chat.room_stats import record_messages
+from chat.routing import websocket_urlpatterns
+from core.websocket_auth import TokenAuthMiddlewareStack
+
+MESSAGE_BUFFER_STATS_URL = reverse('chat:message-buffer-stats')
+
+MESSAGES_URL = reverse('chat:message-list')
+ROOMS_URL = reverse('chat:room-list')
+
+
+def room_detail_url(room_id):
+    return reverse('chat:room-detail', args=[room_id])
+
+
+def send_message_url(room_id):
+    return reverse('chat:room-send-message', args=[room_id])
+
+
+def room_messages_url(room_id):
+    return reverse('chat:room-messages', args=[room_id])
+
+
+IN_MEMORY_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+}
+
+
+def create_user(**params):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class ChatConsumerTests(TransactionTestCase):
+    """Test the chat websocket consumer"""
+
+    def setUp(self):
+        self.user = create_user(email='user@example.com', password='testpass')
+        self.history = MemoryHistory(size=3)
+        patcher = mock.patch('chat.history._history', self.history)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def connect(self, room_name='lobby', user=None):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/chat/{room_name}/')
+        communicator.scope['user'] = user or AnonymousUser()
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        welcome = await communicator.receive_json_from()
+        self.assertEqual(welcome['type'], 'connection_established')
+        history = await communicator.receive_json_from()
+        self.assertEqual(history['type'], 'history')
+        communicator.history = history['messages']
+        return communicator
+
+    async def send(self, communicator, message, **fields):
+        await communicator.send_json_to(
+            {'type': 'chat_message', 'message': message, **fields})
+        return await communicator.receive_json_from()
+
+    async def test_message_is_a_single_insert(self):
+        """Test the user and room are resolved once, not per message"""
+        communicator = await self.connect(user=self.user)
+        # The first message looks the room up
+        await self.send(communicator, 'zero')
+
+        # The consumer's queries run on this thread's connection
+        queries = CaptureQueriesContext(connection)
+        await database_sync_to_async(queries.__enter__)()
+        for text in ('one', 'two', 'three'):
+            event = await self.send(
+                communicator, text, email='spoof@example.com')
+            self.assertEqual(event['email'], self.user.email)
+        await database_sync_to_async(queries.__exit__)(None, None, None)
+        await communicator.disconnect()
+
+        captured = await database_sync_to_async(
+            lambda: queries.captured_queries)()
+        # Per message: the insert and the room statistics update, with
+        # no SELECTs (sqlite also logs the transaction's BEGIN)
+        statements = [query['sql'].split()[0] for query in captured]
+        self.assertEqual(
+            [statement for statement in statements if statement != 'BEGIN'],
+            ['INSERT', 'UPDATE'] * 3)
+        messages = await database_sync_to_async(list)(
+            Message.objects.values_list('content', 'user', 'email'))
+        self.assertEqual(messages, [
+            (text, self.user.pk, self.user.email)
+            for text in ('zero', 'one', 'two', 'three')
+        ])
+
+    async def test_join_replays_recent_history(self):
+        """Test joining sends the room's last messages without queries"""
+        sender = await self.connect(user=self.user)
+        for text in ('one', 'two', 'three', 'four'):
+            await self.send(sender, text)
+
+        queries = CaptureQueriesContext(connection)
+        await database_sync_to_async(queries.__enter__)()
+        communicator = await self.connect()
+        await database_sync_to_async(queries.__exit__)(None, None, None)
+        await communicator.disconnect()
+        await sender.disconnect()
+
+        self.assertEqual(
+            [entry['message'] for entry in communicator.history],
+            ['two', 'three', 'four'])
+        self.assertEqual(communicator.history[-1]['email'], self.user.email)
+        captured = await database_sync_to_async(
+            lambda: queries.captured_queries)()
+        self.assertEqual(captured, [])
+
+    async def test_ring_entries_name_their_messages(self):
+        """Test broadcasts and ring entries carry the saved message's uid"""
+        communicator = await self.connect(user=self.user)
+        events = [await self.send(communicator, text)
+                  for text in ('one', 'two')]
+        await communicator.disconnect()
+
+        uids = await database_sync_to_async(list)(
+            Message.objects.order_by('timestamp').values_list(
+                'uid', flat=True))
+        self.assertEqual([event['uid'] for event in events],
+                         [str(uid) for uid in uids])
+        self.assertEqual(
+            [entry['uid'] for entry in self.history.recent('lobby')],
+            [str(uid) for uid in uids])
+
+    async def connect_with_token(self, path, headers=()):
+        communicator = WebsocketCommunicator(
+            TokenAuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+            path, headers=list(headers))
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        for _ in range(2):
+            await communicator.receive_json_from()
+        return communicator
+
+    async def test_api_token_authenticates_socket(self):
+        """Test sockets opened with an API token send as that user"""
+        token = await database_sync_to_async(Token.objects.create)(
+            user=self.user)
+        by_query = await self.connect_with_token(
+            f'/ws/chat/lobby/?token={token.key}')
+        by_header = await self.connect_with_token(
+            '/ws/chat/lobby/',
+            [(b'authorization', f'Token {token.key}'.encode())])
+
+        for communicator in (by_query, by_header):
+            event = await self.send(
+                communicator, 'hello', email='spoof@example.com')
+            self.assertEqual(event['email'], self.user.email)
+            await communicator.disconnect()
+
+        users = await database_sync_to_async(list)(
+            Message.objects.values_list('user', 'email'))
+        self.assertEqual(users, [(self.user.pk, self.user.email)] * 2)
+
+    async def test_invalid_token_is_anonymous(self):
+        """Test a bad token leaves the socket without a user"""
+        communicator = await self.connect_with_token(
+            '/ws/chat/lobby/?token=not-a-token')
+
+        await self.send(communicator, 'hello', email='guest@example.com')
+        await communicator.disconnect()
+
+        message = await database_sync_to_async(
+            Message.objects.select_related('room').get)()
+        self.assertIsNone(message.user_id)
+        self.assertEqual(message.room.name, 'lobby')
+
+    async def test_deleted_room_is_resolved_again(self):
+        """Test deleting a room drops its sockets' room and its history"""
+        communicator = await self.connect(user=self.user)
+        await self.send(communicator, 'before delete')
+        await database_sync_to_async(
+            Room.objects.filter(name='lobby').delete)()
+
+        self.assertEqual(self.history.recent('lobby'), [])
+
+        await self.send(communicator, 'still here')
+        await communicator.disconnect()
+
+        message = await database_sync_to_async(
+            Message.objects.select_related('room').get)()
+        self.assertEqual(message.room.name, 'lobby')
+
+    async def test_renamed_room_is_resolved_again(self):
+        """Test renaming a room sends later messages to the socket's room"""
+        communicator = await self.connect(user=self.user)
+        await self.send(communicator, 'before rename')
+
+        @database_sync_to_async
+        def rename():
+            room = Room.objects.get(name='lobby')
+            room.name = 'archive'
+            room.save()
+            return room.pk
+
+        renamed_pk = await rename()
+
+        await self.send(communicator, 'after rename')
+        await communicator.disconnect()
+
+        message = await database_sync_to_async(
+            Message.objects.select_related('room').get)(
+            content='after rename')
+        self.assertEqual(message.room.name, 'lobby')
+        self.assertNotEqual(message.room_id, renamed_pk)
+
+    async def test_write_behind_broadcasts_before_saving(self):
+        """Test write-behind mode buffers the message it broadcasts"""
+        buffer = MessageBuffer(batch_size=100, interval=60, max_pending=1000)
+        communicator = await self.connect(user=self.user)
+
+        with self.settings(CHAT_PERSISTENCE_MODE='write_behind'), \
+                mock.patch('chat.persistence._message_buffer', buffer):
+            event = await self.send(communicator, 'fast')
+        await communicator.disconnect()
+
+        self.assertEqual(len(buffer), 1)
+        self.assertEqual(await database_sync_to_async(
+            Message.objects.count)(), 0)
+        await database_sync_to_async(buffer.stop)()
+        message = await database_sync_to_async(Message.objects.get)()
+        self.assertEqual(message.content, 'fast')
+        # Stored with the time it was written, after it was sent
+        self.assertGreaterEqual(
+            message.timestamp, datetime.fromisoformat(event['timestamp']))
+        self.assertEqual(str(message.uid), event['uid'])
+        self.assertEqual(self.history.recent('lobby')[-1]['uid'],
+                         event['uid'])
+
+
+class MessageBufferTests(TransactionTestCase):
+    """Test batched write-behind persistence of chat messages"""
+
+    def setUp(self):
+        self.room = Room.objects.create(name='lobby')
+        self.buffer = MessageBuffer(
+            batch_size=100, interval=60, max_pending=1000)
+        self.addCleanup(self.buffer.stop)
+
+    def put(self, count, room=None):
+        for i in range(count):
+            self.buffer.put(Message(
+                room=room or self.room, email='user@example.com',
+                content=f'message {i}', timestamp=timezone.now()))
+
+    def test_batch_is_one_insert(self):
+        """Test buffered messages are written with a single insert"""
+        self.put(50)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.buffer.flush()
+
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 50)
+        self.assertEqual(self.room.last_message_content, 'message 49')
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(
+            list(Message.objects.values_list('content', flat=True)),
+            [f'message {i}' for i in range(50)])
+
+    def test_full_batch_is_written_by_flusher_thread(self):
+        """Test reaching the batch size wakes the flusher thread"""
+        self.buffer.batch_size = 10
+        self.put(10)
+
+        deadline = time.monotonic() + 5
+        while Message.objects.count() < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(Message.objects.count(), 10)
+        self.assertEqual(self.buffer.stats()['written'], 10)
+
+    def test_failed_batch_is_kept_for_retry(self):
+        """Test a failing write leaves the messages buffered in order"""
+        self.put(5)
+
+        with mock.patch.object(Message.objects, 'bulk_create',
+                               side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush(attempts=1)
+
+        self.assertEqual(len(self.buffer), 5)
+        self.assertEqual(self.buffer.stats()['failures'], 1)
+        self.buffer.flush()
+        self.assertEqual(
+            list(Message.objects.values_list('content', flat=True)),
+            [f'message {i}' for i in range(5)])
+
+    def test_late_flush_is_seen_by_catch_up_cursor(self):
+        """Test buffered rows sort after a cursor taken before their flush"""
+        # Sent before a message another process has already saved
+        self.put(2)
+        Message.objects.create(room=self.room, email='user@example.com',
+                               content='saved')
+        client = APIClient()
+        res = client.get(room_messages_url(self.room.id))
+        self.assertEqual(
+            [message['content'] for message in res.data['results']],
+            ['saved'])
+
+        self.buffer.flush()
+
+        res = client.get(res.data['next'])
+        self.assertEqual(
+            [message['content'] for message in res.data['results']],
+            ['message 0', 'message 1'])
+
+    def test_message_for_deleted_room_is_dropped(self):
+        """Test rows of a deleted room do not block the rest of a batch"""
+        doomed = Room.objects.create(name='doomed')
+        self.put(2)
+        self.put(1, room=doomed)
+        self.put(2)
+        Room.objects.filter(pk=doomed.pk).delete()
+
+        self.buffer.flush()
+
+        self.assertEqual(Message.objects.count(), 4)
+        stats = self.buffer.stats()
+        self.assertEqual(stats['dropped'], 1)
+        self.assertEqual(stats['written'], 4)
+        self.assertEqual(stats['pending'], 0)
+
+    def test_stats_require_admin(self):
+        """Test only admins can read the buffer counters"""
+        client = APIClient()
+        user = create_user(email='user@example.com', password='testpass')
+        client.force_authenticate(user=user)
+
+        res = client.get(MESSAGE_BUFFER_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        res = client.get(MESSAGE_BUFFER_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('pending', res.data)
+
+
+class MessagePaginationApiTests(APITestCase):
+    """Test keyset pagination of room message history"""
+
+    def setUp(self):
+        self.room = Room.objects.create(name='lobby')
+        other = Room.objects.create(name='other')
+        Message.objects.create(room=other, email='x@example.com',
+                               content='elsewhere')
+        # Pairs of messages share a timestamp to exercise the id tiebreak
+        start = timezone.now()
+        self.messages = [
+            Message.objects.create(
+                room=self.room, email='user@example.com',
+                content=f'message {i}',
+                timestamp=start + timedelta(seconds=i // 2))
+            for i in range(7)
+        ]
+
+    def contents(self, res):
+        return [message['content'] for message in res.data['results']]
+
+    def test_newest_page_then_older_pages(self):
+        """Test scrolling back visits every message once, oldest last"""
+        res = self.client.get(room_messages_url(self.room.id),
+                              {'page_size': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.contents(res),
+                         ['message 4', 'message 5', 'message 6'])
+        pages = [self.contents(res)]
+        while res.data['previous']:
+            res = self.client.get(res.data['previous'])
+            pages.insert(0, self.contents(res))
+
+        self.assertEqual(sum(pages, []),
+                         [f'message {i}' for i in range(7)])
+        self.assertEqual(len(pages), 3)
+
+    def test_after_cursor_catches_up(self):
+        """Test the next link returns only messages sent since the page"""
+        res = self.client.get(room_messages_url(self.room.id))
+        Message.objects.create(
+            room=self.room, email='user@example.com', content='late',
+            timestamp=self.messages[-1].timestamp + timedelta(seconds=1))
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(self.contents(res), ['late'])
+        res = self.client.get(res.data['next'])
+        self.assertEqual(self.contents(res), [])
+        self.assertIsNotNone(res.data['next'])
+
+    def test_page_is_a_single_query(self):
+        """Test a page costs the same queries however deep it is"""
+        res = self.client.get(room_messages_url(self.room.id),
+                              {'page_size': 2})
+
+        with self.assertNumQueries(2):
+            res = self.client.get(res.data['previous'])
+        self.assertEqual(self.contents(res), ['message 3', 'message 4'])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is a validation error"""
+        res = self.client.get(room_messages_url(self.room.id),
+                              {'before': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_message_list_filtered_by_room(self):
+        """Test the message list pages a room's history the same way"""
+        res = self.client.get(MESSAGES_URL,
+                              {'room': self.room.id, 'page_size': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.contents(res),
+                         [f'message {i}' for i in range(2, 7)])
+        res = self.client.get(res.data['previous'])
+        self.assertEqual(self.contents(res), ['message 0', 'message 1'])
+        self.assertIsNone(res.data['previous'])
+
+
+class RoomStatsApiTests(APITestCase):
+    """Test room listings served from denormalized statistics"""
+
+    def setUp(self):
+        self.user = create_user(email='user@example.com', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def send(self, room, content):
+        res = self.client.post(send_message_url(room.id), {
+            'content': content, 'email': self.user.email})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_list_rooms_in_one_query(self):
+        """Test listing rooms does not query messages per room"""
+        for name in ('one', 'two', 'three'):
+            room = Room.objects.create(name=name)
+            self.send(room, f'first in {name}')
+            self.send(room, f'last in {name}')
+        Room.objects.create(name='empty')
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ROOMS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rooms = {room['name']: room for room in res.data}
+        self.assertEqual(rooms['two']['message_count'], 2)
+        self.assertEqual(rooms['two']['last_message']['content'],
+                         'last in two')
+        self.assertEqual(rooms['two']['last_message']['email'],
+                         self.user.email)
+        self.assertEqual(rooms['empty']['message_count'], 0)
+        self.assertIsNone(rooms['empty']['last_message'])
+
+    def test_older_message_keeps_last_message(self):
+        """Test a late write of an older message does not replace it"""
+        room = Room.objects.create(name='lobby')
+        self.send(room, 'newest')
+        # A sender whose insert commits after a newer message's
+        stale = Message.objects.create(
+            room=room, email='user@example.com', content='old',
+            timestamp=timezone.now() - timedelta(minutes=5))
+        record_messages([stale])
+
+        room.refresh_from_db()
+        self.assertEqual(room.message_count, 2)
+        self.assertEqual(room.last_message_content, 'newest')
+
+    def test_room_detail_embeds_recent_messages(self):
+        """Test a room embeds only its newest messages, oldest first"""
+        room = Room.objects.create(name='lobby')
+        start = timezone.now()
+        for i in range(5):
+            Message.objects.create(room=room, email='user@example.com',
+                                   content=f'message {i}',
+                                   timestamp=start + timedelta(seconds=i))
+
+        with self.settings(CHAT_ROOM_RECENT_MESSAGES=3):
+            res = self.client.get(room_detail_url(room.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [message['content'] for message in res.data['messages']],
+            ['message 2', 'message 3', 'message 4'])
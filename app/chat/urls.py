@@ -9,5 +9,8 @@ router.register(r'messages', views.MessageViewSet)
 app_name = "chat"
 
 urlpatterns = [
+    path('message-buffer/',
+         views.MessageBufferStatsView.as_view(),
+         name='message-buffer-stats'),
     path('', include(router.urls)),
 ]
@@ -1,9 +1,13 @@
-from rest_framework import viewsets, status
-# , permissions, authentication
+from rest_framework import viewsets, status, permissions, authentication
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from core.models import Room, Message
+from .pagination import MessageCursorPagination
+from .persistence import get_message_buffer
+from .room_stats import record_messages
 from .serializers import RoomSerializer, RoomListSerializer, MessageSerializer
 
 
@@ -23,14 +27,11 @@ class RoomViewSet(viewsets.ModelViewSet):
         room = get_object_or_404(Room, pk=pk)
         messages = room.messages.all()
 
-        # Pagination
-        page = self.paginate_queryset(messages)
-        if page is not None:
-            serializer = MessageSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        # Keyset pagination; the room list itself is not paginated
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        serializer = MessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
@@ -39,11 +40,13 @@ class RoomViewSet(viewsets.ModelViewSet):
 
         serializer = MessageSerializer(data=request.data)
         if serializer.is_valid():
-            message = serializer.save(
-                room=room,
-                user=request.user,
-                email=request.user.email
-            )
+            with transaction.atomic():
+                message = serializer.save(
+                    room=room,
+                    user=request.user,
+                    email=request.user.email
+                )
+                record_messages([message])
 
             # You could also broadcast this message via WebSocket here
             # using channels.layers.get_channel_layer()
@@ -59,6 +62,7 @@ class RoomViewSet(viewsets.ModelViewSet):
 class MessageViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    pagination_class = MessageCursorPagination
     # authentication_classes = [authentication.TokenAuthentication]
     # permission_classes = [permissions.IsAuthenticated]
 
@@ -67,4 +71,13 @@ class MessageViewSet(viewsets.ReadOnlyModelViewSet):
         room_id = self.request.query_params.get('room', None)
         if room_id is not None:
             queryset = queryset.filter(room_id=room_id)
-        return queryset
\ No newline at end of file
+        return queryset
+
+
+class MessageBufferStatsView(APIView):
+    """Queue depth and write counters of this process's message buffer"""
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_message_buffer().stats())
@@ -0,0 +1,23 @@
+"""
+System checks of deployment settings.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, register
+
+
+@register()
+def check_admission_cache(app_configs, **kwargs):
+    """Audio admission counters must be shared by every server process"""
+    alias = settings.AUDIO_ADMISSION_CACHE_ALIAS
+    processes = settings.WEB_CONCURRENCY
+    if processes > 1 and isinstance(caches[alias], LocMemCache):
+        return [Error(
+            f"Cache '{alias}' is local to each process, so audio admission "
+            f"caps would not hold across {processes} server processes.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache, "
+                 "or AUDIO_ADMISSION_CACHE_ALIAS to an alias that is one.",
+            id="core.E001",
+        )]
+    return []
@@ -0,0 +1,69 @@
+"""
+Django command to benchmark the audio scoring pipeline.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from challenge import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to benchmark decode, extraction and scoring."""
+
+    help = 'Benchmark the scoring pipeline on a synthetic WAV corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Include 30 s and 5 min recordings.')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timed runs per stage; the best is kept.')
+        parser.add_argument('--case',
+                            help='Only run cases whose name contains this.')
+        parser.add_argument('--baseline', default=benchmark.BASELINE_PATH,
+                            help='Baseline JSON file.')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store this run as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=1.5,
+                            help='Allowed slowdown factor per stage.')
+        parser.add_argument('--memory-tolerance', type=float, default=1.25,
+                            help='Allowed peak memory growth factor.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        results = benchmark.run(full=options['full'],
+                                repeat=options['repeat'],
+                                match=options['case'])
+        if not results:
+            raise CommandError('No benchmark cases matched.')
+
+        self.stdout.write(
+            f"{'case':<28}{'decode ms':>11}{'extract ms':>12}"
+            f"{'score ms':>10}{'align ms':>10}{'pitch ms':>10}"
+            f"{'print ms':>10}{'peak MB':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<28}{result['decode'] * 1000:>11.2f}"
+                f"{result['extract'] * 1000:>12.2f}"
+                f"{result['similarity'] * 1000:>10.2f}"
+                f"{result['alignment'] * 1000:>10.2f}"
+                f"{result['pitch'] * 1000:>10.2f}"
+                f"{result['fingerprint'] * 1000:>10.2f}"
+                f"{result['peak_mb']:>9.1f}")
+
+        if options['update_baseline']:
+            benchmark.save_baseline(results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Baseline updated for {len(results)} cases"))
+            return
+
+        baseline = benchmark.load_baseline(options['baseline'])
+        missing = [name for name in results if name not in baseline]
+        if missing:
+            self.stdout.write(f'No baseline for {len(missing)} cases')
+        regressions = benchmark.compare(
+            results, baseline, options['tolerance'],
+            options['memory_tolerance'])
+        if regressions:
+            for message in regressions:
+                self.stderr.write(message)
+            raise CommandError(f'{len(regressions)} benchmark regressions.')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,202 @@
+"""
+Django command to recompute Challenge.sound_features in bulk.
+
+The checkpoint records the highest id processed and the ids that failed
+up to it. A rerun resumes after that id and retries the failed ones.
+"""
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+from audio import FEATURE_SCHEMA_VERSION, content_hash, flatten_features
+from challenge.serializers import (
+    ChallengeSerializer, extract_file_features, extract_reference_features,
+)
+from core.models import Challenge
+
+
+def recompute(item):
+    """Worker entry point: return (id, features, hash, error) per challenge"""
+    challenge_id, sound_url, dry_run = item
+    try:
+        file_path = ChallengeSerializer.resolve_audio_path(sound_url)
+        digest = content_hash(file_path)
+        # Dry runs leave the frame store untouched as well
+        if dry_run:
+            features = extract_file_features(file_path)
+        else:
+            features = extract_reference_features(file_path, digest)
+        return challenge_id, features, digest, None
+    except Exception as e:
+        return challenge_id, None, None, str(getattr(e, "detail", e))
+
+
+def flatten(features):
+    """Flatten a stored feature vector for comparison"""
+    try:
+        return flatten_features(features).astype(float)
+    except (TypeError, IndexError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    """Django command to recompute challenge sound features."""
+
+    help = 'Recompute Challenge.sound_features across a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='+', type=int,
+                            help='Only recompute these challenge ids.')
+        parser.add_argument('--created-by',
+                            help='Only recompute challenges of this email.')
+        parser.add_argument('--stale', action='store_true',
+                            help='Only recompute challenges whose features '
+                                 'are from an older schema version.')
+        parser.add_argument('--workers', type=int,
+                            default=multiprocessing.cpu_count(),
+                            help='Worker processes (1 runs inline).')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Rows per bulk_update and checkpoint.')
+        parser.add_argument('--checkpoint',
+                            help='File recording the last processed id '
+                                 'and failed ids; rerunning resumes after '
+                                 'it and retries the failures.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drift from stored values only.')
+        parser.add_argument('--tolerance', type=float, default=1e-6,
+                            help='Relative drift reported in dry runs.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.options = options
+        last_id, self.failed = self._read_checkpoint()
+        self.last_id = last_id
+
+        queryset = Challenge.objects.order_by('id')
+        if options['ids']:
+            queryset = queryset.filter(id__in=options['ids'])
+        if options['created_by']:
+            queryset = queryset.filter(created_by__email=options['created_by'])
+        if options['stale']:
+            queryset = queryset.exclude(
+                sound_features_version=FEATURE_SCHEMA_VERSION)
+        if last_id is not None:
+            queryset = queryset.filter(
+                Q(id__gt=last_id) | Q(id__in=self.failed))
+            self.stdout.write(f'Resuming after challenge {last_id}, '
+                              f'retrying {len(self.failed)} failed')
+
+        total = queryset.count()
+        self.stdout.write(f'Recomputing features for {total} challenges...')
+        stored = {}
+        rows = queryset.values_list('id', 'sound_url', 'sound_features') \
+            .iterator(chunk_size=options['batch_size'])
+
+        def items():
+            for challenge_id, sound_url, features in rows:
+                if options['dry_run']:
+                    stored[challenge_id] = features
+                yield challenge_id, sound_url, options['dry_run']
+
+        self.started = time.monotonic()
+        self.counts = dict(done=0, failed=0, drifted=0, max_drift=0.0)
+        batch = []
+
+        workers = options['workers']
+        if workers > 1:
+            # Children must not inherit open database sockets
+            connections.close_all()
+            with multiprocessing.Pool(workers) as pool:
+                results = pool.imap(recompute, items(), chunksize=8)
+                self._consume(results, batch, stored, total)
+        else:
+            self._consume(map(recompute, items()), batch, stored, total)
+
+        self._flush(batch, total)
+        if not options['dry_run']:
+            # Failures after the last written batch still move it on
+            self._write_checkpoint()
+        counts = self.counts
+        summary = (f"{counts['done']} recomputed, {counts['failed']} failed")
+        if options['dry_run']:
+            summary += (f", {counts['drifted']} drifted "
+                        f"(max relative drift {counts['max_drift']:.3g})")
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _consume(self, results, batch, stored, total):
+        for challenge_id, features, digest, error in results:
+            # Rows arrive in id order, retried failures first
+            self.last_id = max(self.last_id or 0, challenge_id)
+            if error is not None:
+                self.counts['failed'] += 1
+                self.failed.add(challenge_id)
+                self.stderr.write(f'Challenge {challenge_id}: {error}')
+                continue
+            self.counts['done'] += 1
+            self.failed.discard(challenge_id)
+            if self.options['dry_run']:
+                self._record_drift(challenge_id,
+                                   stored.pop(challenge_id, None), features)
+            batch.append(Challenge(
+                id=challenge_id, sound_features=features, sound_hash=digest,
+                sound_features_version=FEATURE_SCHEMA_VERSION))
+            if len(batch) >= self.options['batch_size']:
+                self._flush(batch, total)
+
+    def _record_drift(self, challenge_id, old, new):
+        old, new = flatten(old), flatten(new)
+        if old is None or old.shape != new.shape:
+            drift = float('inf')
+        else:
+            drift = float(np.max(np.abs(old - new)
+                                 / np.maximum(np.abs(old), 1e-12)))
+        if drift > self.options['tolerance']:
+            self.counts['drifted'] += 1
+            self.stdout.write(f'Challenge {challenge_id}: drift {drift:.3g}')
+        self.counts['max_drift'] = max(self.counts['max_drift'], drift)
+
+    def _flush(self, batch, total):
+        if not batch:
+            return
+        if not self.options['dry_run']:
+            Challenge.objects.bulk_update(
+                batch,
+                ['sound_features', 'sound_features_version', 'sound_hash'],
+                batch_size=self.options['batch_size'])
+            self._write_checkpoint()
+        processed = self.counts['done'] + self.counts['failed']
+        elapsed = time.monotonic() - self.started
+        rate = processed / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f'{processed}/{total} challenges ({rate:.1f}/s)')
+        batch.clear()
+
+    def _read_checkpoint(self):
+        """Return (last processed id or None, set of failed ids)"""
+        path = self.options['checkpoint']
+        if not path or not os.path.exists(path):
+            return None, set()
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            return (int(state['last_id']),
+                    {int(i) for i in state.get('failed', [])})
+        except (ValueError, KeyError, TypeError) as e:
+            raise CommandError(f'Invalid checkpoint {path}: {e}')
+
+    def _write_checkpoint(self):
+        path = self.options['checkpoint']
+        if not path or self.last_id is None:
+            return
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'last_id': self.last_id,
+                       'failed': sorted(self.failed)}, f)
+        os.replace(temp_path, path)
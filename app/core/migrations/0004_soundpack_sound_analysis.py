@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_attempt_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='soundpack',
+            name='sound_analysis',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
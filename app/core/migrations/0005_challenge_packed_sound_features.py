@@ -0,0 +1,76 @@
+from django.db import migrations, models
+
+import core.models.challenge
+import core.models.fields
+
+
+def pack_sound_features(apps, schema_editor):
+    """Copy the JSON feature lists into the packed float32 column"""
+    Challenge = apps.get_model('core', 'Challenge')
+    challenges = Challenge.objects.only('id', 'sound_features')
+    batch = []
+    for challenge in challenges.iterator(chunk_size=2000):
+        challenge.packed_sound_features = challenge.sound_features
+        batch.append(challenge)
+        if len(batch) >= 2000:
+            Challenge.objects.bulk_update(batch, ['packed_sound_features'])
+            batch = []
+    Challenge.objects.bulk_update(batch, ['packed_sound_features'])
+
+
+def unpack_sound_features(apps, schema_editor):
+    """Restore the JSON feature lists from the packed column"""
+    from audio import nest_features
+
+    Challenge = apps.get_model('core', 'Challenge')
+    challenges = Challenge.objects.only('id', 'packed_sound_features')
+    batch = []
+    for challenge in challenges.iterator(chunk_size=2000):
+        challenge.sound_features = nest_features(
+            challenge.packed_sound_features)
+        batch.append(challenge)
+        if len(batch) >= 2000:
+            Challenge.objects.bulk_update(batch, ['sound_features'])
+            batch = []
+    Challenge.objects.bulk_update(batch, ['sound_features'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_soundpack_sound_analysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='packed_sound_features',
+            field=core.models.fields.FeatureVectorField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='challenge',
+            name='sound_features',
+            field=models.JSONField(null=True, validators=[core.models.challenge.validate_sound_features]),
+        ),
+        migrations.RunPython(pack_sound_features, unpack_sound_features),
+        migrations.RemoveField(
+            model_name='challenge',
+            name='sound_features',
+        ),
+        migrations.RenameField(
+            model_name='challenge',
+            old_name='packed_sound_features',
+            new_name='sound_features',
+        ),
+        migrations.AlterField(
+            model_name='challenge',
+            name='sound_features',
+            field=core.models.fields.FeatureVectorField(validators=[core.models.challenge.validate_sound_features]),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='sound_features_version',
+            # Existing rows predate versioned extraction
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_challenge_packed_sound_features'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='challenge',
+            name='sound_features_version',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-17 17:39
+
+import core.models.challenge
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_challenge_sound_features_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='challenge',
+            name='sound_features_version',
+            field=models.PositiveSmallIntegerField(default=core.models.challenge.current_feature_version),
+        ),
+    ]
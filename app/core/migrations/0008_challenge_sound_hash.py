@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_alter_challenge_sound_features_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='sound_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_challenge_sound_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='scoring_mode',
+            field=models.CharField(choices=[('mean', 'Feature means'), ('aligned', 'Time-aligned frames')], default='mean', max_length=16),
+        ),
+    ]
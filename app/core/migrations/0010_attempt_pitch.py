@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-17 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_challenge_scoring_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='pitch',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='challenge',
+            name='scoring_mode',
+            field=models.CharField(choices=[('mean', 'Feature means'), ('aligned', 'Time-aligned frames'), ('melodic', 'Time-aligned frames and pitch contour')], default='mean', max_length=16),
+        ),
+    ]
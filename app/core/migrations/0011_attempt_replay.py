@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_attempt_pitch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='replay',
+            field=models.BooleanField(default=False),
+        ),
+    ]
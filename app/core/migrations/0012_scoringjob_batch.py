@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_attempt_replay'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scoringjob',
+            name='kind',
+            field=models.CharField(choices=[('challenge', 'Challenge creation'), ('voice', 'Voice scoring'), ('batch', 'Batch voice scoring')], max_length=16),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_message_send_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', 'timestamp', 'id'], name='core_messag_room_id_bf36ac_idx'),
+        ),
+    ]
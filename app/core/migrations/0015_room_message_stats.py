@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-17 18:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_room_stats(apps, schema_editor):
+    """Count existing messages and copy each room's latest one"""
+    Room = apps.get_model('core', 'Room')
+    Message = apps.get_model('core', 'Message')
+    rooms = Room.objects.annotate(count=Count('messages'))
+    for room in rooms.iterator(chunk_size=2000):
+        last = Message.objects.filter(room_id=room.pk) \
+            .order_by('-timestamp', '-id').first()
+        Room.objects.filter(pk=room.pk).update(
+            message_count=room.count,
+            last_message_at=last.timestamp if last else None,
+            last_message_email=last.email if last else '',
+            last_message_content=last.content if last else '',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='last_message_content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='last_message_email',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_room_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.25 on 2026-10-17 18:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+# challenge.leaderboard.score_bucket as of this migration
+SCORE_MIN = -1.0
+SCORE_MAX = 1.0
+SCORE_BUCKETS = 10000
+
+
+def score_bucket(score):
+    position = (score - SCORE_MIN) / (SCORE_MAX - SCORE_MIN)
+    return min(max(int(position * SCORE_BUCKETS), 0), SCORE_BUCKETS - 1)
+
+
+def fill_buckets(apps, schema_editor):
+    """Assign each entry its bucket and count entries per bucket"""
+    LeaderboardEntry = apps.get_model('core', 'LeaderboardEntry')
+    LeaderboardBucket = apps.get_model('core', 'LeaderboardBucket')
+    entries = LeaderboardEntry.objects.only('id', 'score')
+    for entry in entries.iterator(chunk_size=2000):
+        LeaderboardEntry.objects.filter(pk=entry.pk).update(
+            bucket=score_bucket(entry.score))
+    counts = LeaderboardEntry.objects.values('challenge_id', 'bucket') \
+        .annotate(count=Count('id')).order_by()
+    LeaderboardBucket.objects.bulk_create(
+        LeaderboardBucket(challenge_id=row['challenge_id'],
+                          bucket=row['bucket'], count=row['count'])
+        for row in counts.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_room_message_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='bucket',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['challenge', 'bucket', '-score'], name='core_leader_challen_8a2d48_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardbucket',
+            name='challenge',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_buckets', to='core.challenge'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardbucket',
+            constraint=models.UniqueConstraint(fields=('challenge', 'bucket'), name='unique_leaderboard_bucket'),
+        ),
+        migrations.RunPython(fill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:05
+
+import uuid
+
+from django.db import migrations, models
+
+
+def fill_message_uids(apps, schema_editor):
+    """Give every existing message its own uid"""
+    Message = apps.get_model('core', 'Message')
+    messages = Message.objects.only('pk').iterator(chunk_size=2000)
+    batch = []
+    for message in messages:
+        message.uid = uuid.uuid4()
+        batch.append(message)
+        if len(batch) == 2000:
+            Message.objects.bulk_update(batch, ['uid'])
+            batch = []
+    Message.objects.bulk_update(batch, ['uid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_leaderboard_buckets'),
+    ]
+
+    operations = [
+        # Added nullable first: a callable default is evaluated once for
+        # every existing row, which would break the unique constraint
+        migrations.AddField(
+            model_name='message',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_message_uids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='uid',
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
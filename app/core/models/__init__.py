@@ -1,4 +1,6 @@
 from .user import User # noqa
 from .sound_pack import SoundPack # noqa
 from .challenge import Challenge # noqa
-from .chat import Room, Message # noqa
\ No newline at end of file
+from .chat import Room, Message # noqa
+from .scoring_job import ScoringJob # noqa
+from .attempt import Attempt, LeaderboardBucket, LeaderboardEntry # noqa
@@ -0,0 +1,88 @@
+from django.db import models
+from django.conf import settings
+
+
+class Attempt(models.Model):
+    """A scored voice take against a challenge."""
+    challenge = models.ForeignKey(
+        "core.Challenge",
+        on_delete=models.CASCADE,
+        related_name="attempts",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="attempts",
+    )
+    zcr = models.FloatField()
+    energy = models.FloatField()
+    centroid = models.FloatField()
+    clarity = models.FloatField()
+    mfcc = models.FloatField()
+    # Only scored for melodic challenges
+    pitch = models.FloatField(null=True, blank=True)
+    score = models.FloatField()
+    # The take was the challenge recording played back; kept off the
+    # leaderboard
+    replay = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["challenge", "user", "-score"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} on {self.challenge_id}: {self.score:.3f}"
+
+
+class LeaderboardEntry(models.Model):
+    """Best attempt per user and challenge, maintained on every attempt."""
+    challenge = models.ForeignKey(
+        "core.Challenge",
+        on_delete=models.CASCADE,
+        related_name="leaderboard_entries",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="leaderboard_entries",
+    )
+    attempt = models.ForeignKey(
+        Attempt,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    score = models.FloatField()
+    # Score bucket counted in LeaderboardBucket; see challenge.leaderboard
+    bucket = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["challenge", "user"], name="unique_leaderboard_user"),
+        ]
+        indexes = [
+            models.Index(fields=["challenge", "-score", "user"]),
+            models.Index(fields=["challenge", "bucket", "-score"]),
+        ]
+
+
+class LeaderboardBucket(models.Model):
+    """Number of leaderboard entries per challenge and score bucket."""
+    challenge = models.ForeignKey(
+        "core.Challenge",
+        on_delete=models.CASCADE,
+        related_name="leaderboard_buckets",
+    )
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["challenge", "bucket"],
+                name="unique_leaderboard_bucket"),
+        ]
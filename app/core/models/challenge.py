@@ -2,6 +2,9 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from django.conf import settings
 
+from audio import FEATURE_SCHEMA_VERSION, flatten_features
+from .fields import FeatureVectorField
+
 
 def validate_wav_url(url):
     """Ensure the provided sound file is a '.wav' file."""
@@ -10,9 +13,17 @@ def validate_wav_url(url):
 
 
 def validate_sound_features(value):
-    """Ensure sound_features contains exactly 5 elements"""
-    if not isinstance(value, list) or len(value) != 5:
-        raise ValidationError("Sound Features must be a list with exactly 5 elements.")
+    """Ensure sound_features holds 4 scalars and 13 MFCCs"""
+    try:
+        flatten_features(value)
+    except (ValueError, TypeError, IndexError):
+        raise ValidationError(
+            "Sound Features must be a list with exactly 5 elements.")
+
+
+def current_feature_version():
+    """Feature schema version of newly extracted sound features"""
+    return FEATURE_SCHEMA_VERSION
 
 
 def validate_levels(value):
@@ -25,6 +36,15 @@ def validate_levels(value):
 
 
 class Challenge(models.Model):
+    SCORING_MEAN = "mean"
+    SCORING_ALIGNED = "aligned"
+    SCORING_MELODIC = "melodic"
+    SCORING_CHOICES = [
+        (SCORING_MEAN, "Feature means"),
+        (SCORING_ALIGNED, "Time-aligned frames"),
+        (SCORING_MELODIC, "Time-aligned frames and pitch contour"),
+    ]
+
     id = models.AutoField(primary_key=True, blank=False, null=False)
     name = models.CharField(max_length=255, null=False, blank=False)
     created_by = models.ForeignKey(
@@ -33,11 +53,20 @@ class Challenge(models.Model):
         related_name="created_challenges",
         null=False, blank=False,
     )
-    created_at = models.DateTimeField(auto_now_add=True, null=False, blank=False)
+    created_at = models.DateTimeField(
+        auto_now_add=True, null=False, blank=False)
     updated_at = models.DateTimeField(auto_now=True, null=False, blank=False)
-    sound_url = models.URLField(validators=[validate_wav_url], null=False, blank=False)
-    sound_features = models.JSONField(validators=[validate_sound_features], null=False, blank=False)
-    levels = models.JSONField(default=list, validators=[validate_levels], null=False, blank=False)
+    sound_url = models.URLField(
+        validators=[validate_wav_url], null=False, blank=False)
+    sound_features = FeatureVectorField(
+        validators=[validate_sound_features], null=False, blank=False)
+    sound_features_version = models.PositiveSmallIntegerField(
+        default=current_feature_version)
+    sound_hash = models.CharField(max_length=64, blank=True, default="")
+    scoring_mode = models.CharField(
+        max_length=16, choices=SCORING_CHOICES, default=SCORING_MEAN)
+    levels = models.JSONField(
+        default=list, validators=[validate_levels], null=False, blank=False)
     invited_users = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         related_name="invited_challenges",
@@ -48,3 +77,9 @@ class Challenge(models.Model):
         related_name="joined_challenges",
         blank=False
     )
+
+    @property
+    def aligned_scoring(self):
+        """Whether takes are scored by aligning frames with the reference"""
+        return self.scoring_mode in (
+            self.SCORING_ALIGNED, self.SCORING_MELODIC)
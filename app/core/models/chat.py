@@ -1,13 +1,24 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+
 class Room(models.Model):
     name = models.CharField(max_length=100, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by chat.room_stats on every insert, so listing rooms
+    # never touches the message table
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_email = models.CharField(max_length=100, blank=True)
+    last_message_content = models.TextField(blank=True)
 
     def __str__(self):
         return self.name
 
+
 class Message(models.Model):
     room = models.ForeignKey(
         Room,
@@ -21,10 +32,19 @@ class Message(models.Model):
     )
     email = models.CharField(max_length=100)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the message is sent, or when it is written in write-behind
+    # mode, so rows flushed late never sort before a catch-up cursor
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    # Assigned when the message is built, so broadcasts and the history
+    # ring can name it before the row (and its pk) exists
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination of a room's history
+            models.Index(fields=['room', 'timestamp', 'id']),
+        ]
 
     def __str__(self):
-        return f"{self.email}: {self.content[:50]}"
\ No newline at end of file
+        return f"{self.email}: {self.content[:50]}"
@@ -0,0 +1,45 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from audio import VECTOR_BYTES, pack_features, unpack_features
+
+
+class FeatureVectorField(models.BinaryField):
+    """Feature vector stored as a float32 blob, read as a NumPy view"""
+
+    description = "Packed float32 audio feature vector"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("max_length", VECTOR_BYTES)
+        super().__init__(*args, **kwargs)
+
+    def get_default(self):
+        # An empty blob is not a vector; leave a missing value as NULL
+        if not self.has_default():
+            return None
+        return super().get_default()
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return unpack_features(value)
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        if isinstance(value, str):
+            # Base64 text from fixtures and serialized dumps
+            value = super().to_python(value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return unpack_features(value)
+        try:
+            return unpack_features(pack_features(value))
+        except (ValueError, TypeError, IndexError):
+            raise ValidationError("Sound Features must be a list with "
+                                  "4 values and 13 MFCCs.")
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is not None and \
+                not isinstance(value, (bytes, bytearray, memoryview)):
+            value = pack_features(value)
+        return super().get_db_prep_value(value, connection, prepared)
@@ -0,0 +1,48 @@
+import uuid
+
+from django.db import models
+from django.conf import settings
+
+
+class ScoringJob(models.Model):
+    """Audio work queued to the scoring pool, polled by the client."""
+    KIND_CHALLENGE = "challenge"
+    KIND_VOICE = "voice"
+    KIND_BATCH = "batch"
+    KIND_CHOICES = [
+        (KIND_CHALLENGE, "Challenge creation"),
+        (KIND_VOICE, "Voice scoring"),
+        (KIND_BATCH, "Batch voice scoring"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="scoring_jobs",
+    )
+    challenge = models.ForeignKey(
+        "core.Challenge",
+        on_delete=models.CASCADE,
+        related_name="scoring_jobs",
+        null=True, blank=True,
+    )
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
@@ -23,43 +23,56 @@ class SoundPack(models.Model):
         upload_to="sound_packs/images/", null=True, blank=True)
 
     # Own Sounds (exactly 10) with images
-    sound_1 = models.FileField(validators=[validate_wav_file],
+    sound_1 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_1_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_2 = models.FileField(validators=[validate_wav_file],
+    sound_2 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_2_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_3 = models.FileField(validators=[validate_wav_file],
+    sound_3 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_3_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_4 = models.FileField(validators=[validate_wav_file],
+    sound_4 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_4_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_5 = models.FileField(validators=[validate_wav_file],
+    sound_5 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_5_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_6 = models.FileField(validators=[validate_wav_file],
+    sound_6 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_6_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_7 = models.FileField(validators=[validate_wav_file],
+    sound_7 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_7_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_8 = models.FileField(validators=[validate_wav_file],
+    sound_8 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_8_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_9 = models.FileField(validators=[validate_wav_file],
+    sound_9 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_9_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
-    sound_10 = models.FileField(validators=[validate_wav_file],
+    sound_10 = models.FileField(
+        validators=[validate_wav_file],
         upload_to="sound_packs/sounds/", null=False, blank=False)
     sound_10_image = models.ImageField(
         upload_to="sound_packs/sounds_thumbnails/", null=True, blank=True)
+
+    # Features and waveform peaks per sound field, filled in on upload
+    sound_analysis = models.JSONField(default=dict, blank=True)
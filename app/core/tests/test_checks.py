@@ -0,0 +1,32 @@
+"""
+Test deployment system checks.
+"""
+from django.test import SimpleTestCase, override_settings
+
+from core.checks import check_admission_cache
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+SHARED = {'default': {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class AdmissionCacheCheckTests(SimpleTestCase):
+    """Test the admission cache must be shared between processes"""
+
+    @override_settings(CACHES=LOCMEM, WEB_CONCURRENCY=1)
+    def test_local_cache_with_one_process(self):
+        """Test a per-process cache is fine for a single process"""
+        self.assertEqual(check_admission_cache(None), [])
+
+    @override_settings(CACHES=LOCMEM, WEB_CONCURRENCY=4)
+    def test_local_cache_with_several_processes(self):
+        """Test a per-process cache is an error with several processes"""
+        errors = check_admission_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(CACHES=SHARED, WEB_CONCURRENCY=4)
+    def test_shared_cache_with_several_processes(self):
+        """Test other cache backends pass with several processes"""
+        self.assertEqual(check_admission_cache(None), [])
@@ -1,13 +1,22 @@
 """
 Test custom Django management commands.
 """
+import io
+import os
+import struct
+import tempfile
+import wave
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from audio import FEATURE_SCHEMA_VERSION, get_frame_store, nest_features
+from core.models import Challenge
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +41,114 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.asset_called_with(databases=['default'])
+
+
+def write_tone_wav(path, rate=16000):
+    """Write one second of a 16-bit sawtooth tone"""
+    samples = [(i * 200) % 16000 - 8000 for i in range(rate)]
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(struct.pack(f"<{rate}h", *samples))
+
+
+class RecomputeSoundFeaturesTests(TestCase):
+    """Test the recompute_sound_features command"""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        write_tone_wav(os.path.join(self.media_root.name, "tone.wav"))
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass")
+        self.stale = [0.0, 0.0, 0.0, 0.0, [0.0] * 13]
+        self.challenge = Challenge.objects.create(
+            created_by=user, name="Stale",
+            sound_url="http://testserver/static/media/tone.wav",
+            sound_features=self.stale)
+
+    def test_dry_run_reports_drift(self):
+        """Test a dry run reports drift without writing"""
+        out = io.StringIO()
+
+        call_command("recompute_sound_features", workers=1, dry_run=True,
+                     stdout=out)
+
+        self.challenge.refresh_from_db()
+        self.assertEqual(nest_features(self.challenge.sound_features),
+                         self.stale)
+        self.assertEqual(self.challenge.sound_hash, "")
+        self.assertIn("1 drifted", out.getvalue())
+
+    def test_recompute_writes_and_checkpoints(self):
+        """Test features are rewritten and the checkpoint allows resuming"""
+        checkpoint = os.path.join(self.media_root.name, "checkpoint.json")
+
+        call_command("recompute_sound_features", workers=1,
+                     checkpoint=checkpoint, stdout=io.StringIO())
+
+        self.challenge.refresh_from_db()
+        self.assertNotEqual(nest_features(self.challenge.sound_features),
+                            self.stale)
+        self.assertIsNotNone(
+            get_frame_store().load(self.challenge.sound_hash))
+        out = io.StringIO()
+        call_command("recompute_sound_features", workers=1,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertIn("for 0 challenges", out.getvalue())
+
+    def test_checkpoint_retries_failed_rows(self):
+        """Test rows that failed before the last written one are retried"""
+        checkpoint = os.path.join(self.media_root.name, "checkpoint.json")
+        missing = Challenge.objects.create(
+            created_by=self.challenge.created_by, name="Missing",
+            sound_url="http://testserver/static/media/late.wav",
+            sound_features=self.stale)
+        Challenge.objects.create(
+            created_by=self.challenge.created_by, name="After",
+            sound_url="http://testserver/static/media/tone.wav",
+            sound_features=self.stale)
+
+        call_command("recompute_sound_features", workers=1,
+                     checkpoint=checkpoint, stdout=io.StringIO(),
+                     stderr=io.StringIO())
+        missing.refresh_from_db()
+        self.assertEqual(missing.sound_hash, "")
+
+        write_tone_wav(os.path.join(self.media_root.name, "late.wav"))
+        out = io.StringIO()
+        call_command("recompute_sound_features", workers=1,
+                     checkpoint=checkpoint, stdout=out)
+
+        self.assertIn("for 1 challenges", out.getvalue())
+        missing.refresh_from_db()
+        self.assertNotEqual(missing.sound_hash, "")
+        out = io.StringIO()
+        call_command("recompute_sound_features", workers=1,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertIn("for 0 challenges", out.getvalue())
+
+    def test_recompute_stale_only(self):
+        """Test --stale skips challenges already at the current version"""
+        self.challenge.sound_features_version = 0
+        self.challenge.save()
+        current = Challenge.objects.create(
+            created_by=self.challenge.created_by, name="Current",
+            sound_url="http://testserver/static/media/tone.wav",
+            sound_features=self.stale)
+
+        out = io.StringIO()
+        call_command("recompute_sound_features", workers=1, stale=True,
+                     stdout=out)
+
+        self.assertIn("for 1 challenges", out.getvalue())
+        self.challenge.refresh_from_db()
+        current.refresh_from_db()
+        self.assertEqual(self.challenge.sound_features_version,
+                         FEATURE_SCHEMA_VERSION)
+        self.assertEqual(current.sound_hash, "")
@@ -0,0 +1,54 @@
+"""
+Token authentication for websocket connections.
+
+The REST API authenticates with DRF tokens, so sockets do too. Browsers
+cannot set headers on a websocket handshake, so the token is passed as
+``?token=<key>``; other clients may send ``Authorization: Token <key>``
+instead. Sockets without a valid token keep whatever user the session
+middleware found, usually AnonymousUser.
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from rest_framework.authtoken.models import Token
+
+
+def token_key(scope):
+    """Return the token key a handshake carries, or None"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin1').partition(' ')
+            if keyword.lower() == 'token' and key.strip():
+                return key.strip()
+    return None
+
+
+@database_sync_to_async
+def get_token_user(key):
+    """Return the active user owning token ``key``, or None"""
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Set scope['user'] from the handshake's API token, if any"""
+
+    async def __call__(self, scope, receive, send):
+        key = token_key(scope)
+        if key is not None:
+            user = await get_token_user(key)
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
+
+
+def TokenAuthMiddlewareStack(inner):
+    """Session authentication, overridden by an API token when one is sent"""
+    return AuthMiddlewareStack(TokenAuthMiddleware(inner))
@@ -0,0 +1,125 @@
+"""
+Feature and waveform analysis of SoundPack sounds.
+
+Each of the ten sounds is analysed once, in the audio pool, when a pack
+is created or a sound is replaced. The result is stored on
+``SoundPack.sound_analysis`` keyed by field name, and the sound's frame
+matrix and landmark fingerprints go to the frame store under its content
+hash. Challenges
+built on a pack sound reuse them instead of decoding the WAV again.
+"""
+import logging
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+
+from audio import (
+    FEATURE_SCHEMA_VERSION, content_hash, frame_features, get_frame_store,
+    landmark_hashes, load_audio, summarize_features, trim_silence,
+)
+from audio.pool import submit, when_done
+from audio.waveform import waveform_peaks
+from core.models import SoundPack
+
+logger = logging.getLogger(__name__)
+
+SOUND_FIELDS = [f"sound_{i}" for i in range(1, 11)]
+
+
+def analyze_sound(path):
+    """Return the stored analysis for one WAV file"""
+    try:
+        sampling_rate, signal = load_audio(path)
+        voiced = trim_silence(signal, sampling_rate)
+        matrix = frame_features(voiced, sampling_rate)
+        digest = content_hash(path)
+        store = get_frame_store()
+        store.save(digest, matrix)
+        store.save_prints(digest, *landmark_hashes(voiced, sampling_rate))
+        return {
+            "version": FEATURE_SCHEMA_VERSION,
+            "digest": digest,
+            "duration": len(signal) / sampling_rate,
+            "features": summarize_features(matrix),
+            "peaks": waveform_peaks(signal, settings.SOUND_PACK_PEAK_COUNT),
+        }
+    except Exception as e:
+        return {"version": FEATURE_SCHEMA_VERSION, "error": str(e)}
+
+
+def analyze_sounds(paths):
+    """Analyse ``{field: (name, path)}``; pool entry point"""
+    analysis = {}
+    for field, (name, path) in paths.items():
+        analysis[field] = dict(analyze_sound(path), name=name)
+    return analysis
+
+
+def pending_sounds(pack):
+    """Return ``{field: (name, path)}`` for sounds without fresh analysis"""
+    stored = pack.sound_analysis or {}
+    pending = {}
+    for field in SOUND_FIELDS:
+        sound = getattr(pack, field)
+        if not sound:
+            continue
+        entry = stored.get(field, {})
+        if entry.get("name") == sound.name \
+                and entry.get("version") == FEATURE_SCHEMA_VERSION:
+            continue
+        pending[field] = (sound.name, sound.path)
+    return pending
+
+
+def save_analysis(pack_id, analysis):
+    """Merge fresh analysis into the pack, skipping replaced sounds"""
+    pack = SoundPack.objects.filter(pk=pack_id).first()
+    if pack is None:
+        return
+    stored = dict(pack.sound_analysis or {})
+    for field, entry in analysis.items():
+        # The sound may have been replaced again while this one ran
+        if getattr(pack, field).name == entry["name"]:
+            stored[field] = entry
+    SoundPack.objects.filter(pk=pack_id).update(sound_analysis=stored)
+
+
+def schedule_analysis(pack):
+    """Analyse new or replaced sounds in the audio pool
+
+    Always off the request, whatever AUDIO_SCORING_MODE is: ten sounds
+    take far longer to decode and fingerprint than an admin upload
+    should wait.
+    """
+    pending = pending_sounds(pack)
+    if not pending:
+        return
+
+    def on_done(future):
+        close_old_connections()
+        try:
+            save_analysis(pack.pk, future.result())
+        except Exception:
+            logger.exception("Sound pack %s analysis failed", pack.pk)
+        finally:
+            close_old_connections()
+
+    when_done(submit(analyze_sounds, pending), on_done)
+
+
+def stored_sound_features(name):
+    """Return stored features for a pack sound stored as ``name``, or None"""
+    query = Q()
+    for field in SOUND_FIELDS:
+        query |= Q(**{field: name})
+    for pack in SoundPack.objects.filter(query).only(
+            "sound_analysis", *SOUND_FIELDS):
+        for field in SOUND_FIELDS:
+            entry = (pack.sound_analysis or {}).get(field, {})
+            if getattr(pack, field).name == name \
+                    and entry.get("name") == name \
+                    and entry.get("version") == FEATURE_SCHEMA_VERSION \
+                    and "features" in entry:
+                return entry["features"]
+    return None
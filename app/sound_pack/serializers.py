@@ -6,4 +6,4 @@ class SoundPackSerializer(serializers.ModelSerializer):
     class Meta:
         model = SoundPack
         fields = '__all__'
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at', 'sound_analysis']
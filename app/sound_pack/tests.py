@@ -1,5 +1,7 @@
 """Test SoundPack API"""
 
+from concurrent.futures import Future
+from unittest.mock import patch
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -9,7 +11,11 @@ from core.models import SoundPack
 from django.core.files.uploadedfile import SimpleUploadedFile
 from decimal import Decimal
 from PIL import Image
+from sound_pack.analysis import stored_sound_features
 import io
+import math
+import struct
+import wave
 
 SOUNDPACK_LIST_URL = reverse("sound_pack:sound-packs")
 ADMIN_SOUNDPACK_LIST_URL = reverse("sound_pack:admin-sound-packs")
@@ -38,6 +44,20 @@ def create_soundpack(**params):
     return SoundPack.objects.create(**params)
 
 
+def generate_tone_wav(seconds=1, freq=440.0, rate=16000, amplitude=8000):
+    """Generate a mono 16-bit sine tone WAV, clipped at full scale"""
+    buffer = io.BytesIO()
+    samples = [max(-32768, min(32767, int(
+        amplitude * math.sin(2 * math.pi * freq * i / rate))))
+        for i in range(int(seconds * rate))]
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+    return buffer.getvalue()
+
+
 def payload(**params):
     """Generate a valid image for testing"""
     image = Image.new("RGB", (100, 100), color="red")
@@ -46,22 +66,23 @@ def payload(**params):
     image_io.seek(0)
 
     """Test Payload"""
+    sound = generate_tone_wav(seconds=0.5)
     base_payload = {
         "name": "Test Pack",
         "is_free": False,
         "price": 9.99,
         "pack_image": SimpleUploadedFile("image.png", image_io.read(),
                                          content_type="image/png"),
-        "sound_1": SimpleUploadedFile("sound1.wav", b"dummy sound"),
-        "sound_2": SimpleUploadedFile("sound2.wav", b"dummy sound"),
-        "sound_3": SimpleUploadedFile("sound3.wav", b"dummy sound"),
-        "sound_4": SimpleUploadedFile("sound4.wav", b"dummy sound"),
-        "sound_5": SimpleUploadedFile("sound5.wav", b"dummy sound"),
-        "sound_6": SimpleUploadedFile("sound6.wav", b"dummy sound"),
-        "sound_7": SimpleUploadedFile("sound7.wav", b"dummy sound"),
-        "sound_8": SimpleUploadedFile("sound8.wav", b"dummy sound"),
-        "sound_9": SimpleUploadedFile("sound9.wav", b"dummy sound"),
-        "sound_10": SimpleUploadedFile("sound10.wav", b"dummy sound"),
+        "sound_1": SimpleUploadedFile("sound1.wav", sound),
+        "sound_2": SimpleUploadedFile("sound2.wav", sound),
+        "sound_3": SimpleUploadedFile("sound3.wav", sound),
+        "sound_4": SimpleUploadedFile("sound4.wav", sound),
+        "sound_5": SimpleUploadedFile("sound5.wav", sound),
+        "sound_6": SimpleUploadedFile("sound6.wav", sound),
+        "sound_7": SimpleUploadedFile("sound7.wav", sound),
+        "sound_8": SimpleUploadedFile("sound8.wav", sound),
+        "sound_9": SimpleUploadedFile("sound9.wav", sound),
+        "sound_10": SimpleUploadedFile("sound10.wav", sound),
     }
     base_payload.update(**params)
     return base_payload
@@ -105,6 +126,18 @@ class PublicSoundPackApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class InlineExecutor:
+    """Run audio pool submissions synchronously"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
 class AdminSoundPackApiTests(TestCase):
     """Test admin-only access to modifying SoundPack API"""
 
@@ -113,6 +146,16 @@ class AdminSoundPackApiTests(TestCase):
             email="admin@example.com", password="adminpass")
         self.client = APIClient()
         self.client.force_authenticate(user=self.admin_user)
+        # Run the pool's sound analysis inline so results can be checked
+        for target, kwargs in (
+                ("sound_pack.analysis.close_old_connections", {}),
+                ("audio.pool.get_executor",
+                 {"return_value": InlineExecutor()}),
+                ("audio.pool.get_result_executor",
+                 {"return_value": InlineExecutor()})):
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
 
     def test_create_soundpack_admin(self):
         """Test admin can create a SoundPack"""
@@ -121,6 +164,47 @@ class AdminSoundPackApiTests(TestCase):
             ADMIN_SOUNDPACK_LIST_URL, pLoad, format="multipart")
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
 
+    def test_create_soundpack_stores_analysis(self):
+        """Test sounds are analysed on upload and reusable by challenges"""
+        pLoad = payload(sound_1=SimpleUploadedFile(
+            "tone.wav", generate_tone_wav()))
+        res = self.client.post(
+            ADMIN_SOUNDPACK_LIST_URL, pLoad, format="multipart")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        soundpack = SoundPack.objects.get(id=res.data["id"])
+        tone = soundpack.sound_analysis["sound_1"]
+        self.assertEqual(len(tone["features"]), 5)
+        self.assertEqual(len(tone["peaks"]), 200)
+        self.assertEqual(len(soundpack.sound_analysis["sound_2"]["peaks"]),
+                         200)
+        self.assertEqual(stored_sound_features(soundpack.sound_1.name),
+                         tone["features"])
+
+    def test_create_soundpack_analyses_loud_sounds(self):
+        """Test mastered sounds at full scale are analysed, not rejected"""
+        pLoad = payload(sound_1=SimpleUploadedFile(
+            "loud.wav", generate_tone_wav(amplitude=80000)))
+        res = self.client.post(
+            ADMIN_SOUNDPACK_LIST_URL, pLoad, format="multipart")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        soundpack = SoundPack.objects.get(id=res.data["id"])
+        loud = soundpack.sound_analysis["sound_1"]
+        self.assertNotIn("error", loud)
+        self.assertEqual(len(loud["features"]), 5)
+
+    def test_create_soundpack_rejects_invalid_wav(self):
+        """Test sounds that are not RIFF/WAVE are rejected while uploading"""
+        pLoad = payload(sound_3=SimpleUploadedFile(
+            "sound3.wav", b"ID3 not really a wav"))
+        res = self.client.post(
+            ADMIN_SOUNDPACK_LIST_URL, pLoad, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["field"], "sound_3")
+        self.assertFalse(SoundPack.objects.exists())
+
     def test_update_soundpack_admin(self):
         """Test admin can update an existing SoundPack"""
         soundpack = create_soundpack(name="Original Pack", is_free=True)
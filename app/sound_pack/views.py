@@ -1,6 +1,8 @@
 from rest_framework import viewsets, authentication, permissions
 from core.models import SoundPack
 from .serializers import SoundPackSerializer
+from audio.uploads import WavUploadMixin
+from .analysis import SOUND_FIELDS, schedule_analysis
 
 
 class SoundPackViewSet(viewsets.ReadOnlyModelViewSet):
@@ -10,8 +12,16 @@ class SoundPackViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
 
-class AdminSoundPackViewSet(viewsets.ModelViewSet):
+class AdminSoundPackViewSet(WavUploadMixin, viewsets.ModelViewSet):
     queryset = SoundPack.objects.all()
     serializer_class = SoundPackSerializer
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAdminUser]
+    wav_upload_fields = dict.fromkeys(
+        ['create', 'update', 'partial_update'], SOUND_FIELDS)
+
+    def perform_create(self, serializer):
+        schedule_analysis(serializer.save())
+
+    def perform_update(self, serializer):
+        schedule_analysis(serializer.save())